@@ -0,0 +1,58 @@
+"""
+Time the vectorized exam statistics on synthetic marks.
+
+    python benchmarks/analytics_1m.py --marks 1000000
+    python benchmarks/analytics_1m.py --marks 200000 --from-db   # include the values_list load
+"""
+import argparse
+import time
+
+import numpy as np
+
+from common import seed, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--marks', type=int, default=1000000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--from-db', action='store_true', help='seed SQLite and time ExamMarks.for_exam() as well')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from dashboard.analytics import ExamMarks, exam_statistics
+    from dashboard.models import Exam
+
+    if args.from_db:
+        seed(args.marks // args.subjects, num_subjects=args.subjects, exam_types=['quarterly'], batches=args.batches)
+        exam = Exam.objects.get(exam_type='quarterly')
+        start = time.perf_counter()
+        data = ExamMarks.for_exam(exam)
+        print(f'load {len(data)} marks with one query: {(time.perf_counter() - start) * 1000:.0f} ms')
+    else:
+        rng = np.random.default_rng(42)
+        students = np.arange(args.marks // args.subjects).repeat(args.subjects)
+        data = ExamMarks(
+            students,
+            np.tile(np.arange(args.subjects), len(students) // args.subjects),
+            [f'Subject {i}' for i in range(args.subjects)],
+            students % args.batches,
+            [f'Batch {i}' for i in range(args.batches)],
+            rng.integers(0, 101, len(students)),
+        )
+
+    for include_z_scores in (False, True):
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            exam_statistics(data, include_z_scores=include_z_scores)
+            timings.append(time.perf_counter() - start)
+        label = 'statistics + z-scores' if include_z_scores else 'statistics'
+        print(f'{label} over {len(data)} marks: best {min(timings) * 1000:.0f} ms, '
+              f'median {sorted(timings)[len(timings) // 2] * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Compare the WSGI deployment (sync views) with the ASGI deployment (async
+views with concurrent queries) at equal worker counts.
+
+Needs gunicorn and uvicorn, which are not project dependencies:
+
+    pip install gunicorn uvicorn
+    python benchmarks/asgi_vs_wsgi.py --students 2000 --workers 2 --concurrency 16
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from common import ROOT, load_test, login_cookie, print_table, seed, setup_django, wait_for_port
+
+PATHS = [
+    '/dashboard/',
+    '/ranking/?exam_type=quarterly',
+    '/ranking/?exam_type=midterm',
+    '/progress/?exam_type=model&sort_by=marks',
+]
+
+
+def run_server(name, command, port, args, cookie):
+    env = dict(os.environ)
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port('127.0.0.1', port)
+        # Warm up each worker before measuring.
+        load_test('127.0.0.1', port, PATHS, args.concurrency, 2, headers={'Cookie': cookie})
+        result = load_test('127.0.0.1', port, PATHS, args.concurrency, args.duration, headers={'Cookie': cookie})
+    finally:
+        process.terminate()
+        process.wait()
+    result['server'] = name
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    setup_django()
+    marks = seed(args.students)
+    cookie = login_cookie()
+    print(f'Seeded {args.students} students, {marks} marks; {args.workers} workers, '
+          f'{args.concurrency} clients, {args.duration:.0f}s per server')
+
+    results = [
+        run_server('wsgi (gunicorn, sync views)', [
+            sys.executable, '-m', 'gunicorn', 'student_progress.wsgi:application',
+            '--workers', str(args.workers), '--bind', f'127.0.0.1:{args.port}',
+        ], args.port, args, cookie),
+        run_server('asgi (uvicorn, async views)', [
+            sys.executable, '-m', 'uvicorn', 'student_progress.asgi:application',
+            '--workers', str(args.workers), '--port', str(args.port + 1), '--no-access-log',
+        ], args.port + 1, args, cookie),
+    ]
+    print_table(results, ['server', 'requests', 'rps', 'p50_ms', 'p95_ms', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database (STUDENT_PROGRESS_DB), never
+against the project's db.sqlite3.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import http.client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(db_path=None, settings_module='student_progress.settings'):
+    """
+    Point Django at a benchmark database, configure it and create the schema.
+    Returns the database path.
+    """
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='spms-bench-'), 'bench.sqlite3')
+    os.environ['STUDENT_PROGRESS_DB'] = db_path
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import django
+    from django.core.management import call_command
+    django.setup()
+    call_command('migrate', verbosity=0)
+    return db_path
+
+
+def seed(num_students, num_subjects=8, exam_types=None, batches=10, seed_value=42):
+    """
+    Fill the benchmark database with students and a mark for every
+    (student, exam, subject) cell, with dashboard.perf.synthetic (imported
+    here, once Django is set up). Returns the number of marks created.
+    """
+    from dashboard.perf.synthetic import EXAM_TYPES, seed_synthetic_data
+
+    return seed_synthetic_data(num_students, num_subjects, exam_types or EXAM_TYPES, batches, seed_value)
+
+
+def login_cookie(username='bench', password='bench-pass-123'):
+    """
+    Create a staff user and a session for it; return the Cookie header value
+    """
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+
+    user, _ = User.objects.get_or_create(username=username, defaults={'is_staff': True})
+    user.set_password(password)
+    user.save()
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def wait_for_port(host, port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request('HEAD', '/')
+            conn.getresponse().read()
+            conn.close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'Server on {host}:{port} did not start within {timeout}s')
+
+
+def load_test(host, port, paths, concurrency, duration, headers=None):
+    """
+    Hit the paths round-robin from `concurrency` keep-alive client threads for
+    `duration` seconds. Returns a dict with requests/s, p50/p95 latency (ms)
+    and the number of non-2xx/304 responses.
+    """
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        local, local_errors, i = [], 0, offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers or {})
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(concurrency)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'errors': errors[0],
+    }
+
+
+def print_table(rows, columns):
+    widths = [max(len(str(column)), *(len(f'{row[column]:.1f}' if isinstance(row[column], float) else str(row[column])) for row in rows)) for column in columns]
+    print('  '.join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    for row in rows:
+        cells = []
+        for column, width in zip(columns, widths):
+            value = row[column]
+            cells.append((f'{value:.1f}' if isinstance(value, float) else str(value)).ljust(width))
+        print('  '.join(cells))
@@ -0,0 +1,56 @@
+"""
+Time bulk roster enrollment against the one-at-a-time registration path.
+
+    python benchmarks/import_students.py --students 50000
+    python benchmarks/import_students.py --students 50000 --baseline 0   # skip the per-row baseline
+
+Invites are rendered and "sent" through the in-memory mail backend.
+"""
+import argparse
+import io
+import time
+
+from common import setup_django
+
+
+def roster(count, start=0):
+    yield 'full_name,email,roll_number,class_batch,date_of_birth\n'
+    for i in range(start, start + count):
+        yield f'Student {i:06d},student{i}@example.com,R{i:06d},Batch {i % 20},2010-01-{i % 28 + 1:02d}\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--no-invites', action='store_true')
+    parser.add_argument('--baseline', type=int, default=100, help='rows to enroll through StudentRegistrationForm')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from dashboard.enrollment import import_roster, read_roster
+    from dashboard.forms import StudentRegistrationForm
+
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+    if args.baseline:
+        start = time.perf_counter()
+        for i in range(args.baseline):
+            form = StudentRegistrationForm({
+                'username': f'baseline{i}', 'password1': 'Zq7-walnut-harbor', 'password2': 'Zq7-walnut-harbor',
+                'full_name': f'Baseline {i}', 'email': f'baseline{i}@example.com', 'roll_number': f'B{i:06d}',
+                'class_batch': 'Baseline', 'date_of_birth': '2010-01-01',
+            })
+            form.is_valid()
+            form.save()
+        per_row = (time.perf_counter() - start) / args.baseline
+        print(f'registration form: {per_row * 1000:.1f} ms/student, '
+              f'~{per_row * args.students / 60:.0f} min for {args.students}')
+
+    report = import_roster(read_roster(io.StringIO(''.join(roster(args.students)))), invite=not args.no_invites)
+    print(f'import_roster: {report.created} students, {report.invites_sent} invites, '
+          f'{report.skipped} skipped in {report.seconds:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
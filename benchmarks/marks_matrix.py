@@ -0,0 +1,82 @@
+"""
+Compare the memory and read time of MarksMatrix with model instances.
+
+    python benchmarks/marks_matrix.py --students 25000 --subjects 8
+
+Loads one exam's marks as ProgressSheet instances, as values_list tuples
+and as a MarksMatrix, measuring the memory each holds with tracemalloc,
+then times exam statistics built from a cold and a cached matrix.
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from common import print_table, seed, setup_django
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=25000)
+    parser.add_argument('--subjects', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+    from dashboard.analytics import exam_statistics
+    from dashboard.matrix import MarksMatrix, marks_matrix
+    from dashboard.models import Exam, ProgressSheet
+
+    marks = seed(args.students, num_subjects=args.subjects, exam_types=['quarterly'])
+    exam = Exam.objects.get(exam_type='quarterly')
+    print(f'{marks} marks for {args.students} students')
+
+    rows = []
+    loaders = {
+        'ProgressSheet instances': lambda: list(ProgressSheet.objects.filter(exam=exam)),
+        'values_list tuples': lambda: list(ProgressSheet.objects.filter(exam=exam).values_list(
+            'student_id', 'subject__name', 'student__class_batch', 'marks',
+        )),
+        'MarksMatrix': lambda: MarksMatrix.for_exam(exam),
+    }
+    for label, loader in loaders.items():
+        result, size, seconds = measure(loader)
+        if isinstance(result, MarksMatrix):
+            # tracemalloc also counts the query rows freed during the build.
+            size = result.nbytes
+        rows.append({
+            'held as': label,
+            'bytes/mark': size / marks,
+            'MiB per 1M marks': size * 1000000 / marks / 2 ** 20,
+            'load ms': seconds * 1000,
+        })
+        del result
+    print_table(rows, ['held as', 'bytes/mark', 'MiB per 1M marks', 'load ms'])
+
+    timings = {'cold (query + build)': [], 'cached matrix': []}
+    for _ in range(args.repeat):
+        cache.clear()
+        for label in timings:
+            start = time.perf_counter()
+            exam_statistics(marks_matrix(exam).exam_marks())
+            timings[label].append(time.perf_counter() - start)
+    print_table(
+        [{'exam statistics': label, 'best ms': min(values) * 1000} for label, values in timings.items()],
+        ['exam statistics', 'best ms'],
+    )
+
+
+if __name__ == '__main__':
+    main()
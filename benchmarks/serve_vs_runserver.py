@@ -0,0 +1,71 @@
+"""
+Compare `manage.py serve` (pre-forked workers) with `manage.py runserver`
+on a loopback port.
+
+    python benchmarks/serve_vs_runserver.py --students 2000 --workers 4 --threads 4 --concurrency 16
+
+runserver is one process with a thread per connection and autoreload off;
+serve runs --workers processes of --threads threads each, forked from a
+master that loaded the application first.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from common import ROOT, load_test, login_cookie, print_table, seed, setup_django, wait_for_port
+
+PATHS = [
+    '/dashboard/',
+    '/students/',
+    '/ranking/?exam_type=quarterly',
+    '/progress/?exam_type=midterm&sort_by=marks',
+    '/trends/',
+]
+
+
+def run_server(name, command, port, args, cookie):
+    process = subprocess.Popen(
+        command, cwd=ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port('127.0.0.1', port)
+        # Warm up (and, for serve, reach every worker) before measuring.
+        load_test('127.0.0.1', port, PATHS, args.concurrency, 2, headers={'Cookie': cookie})
+        result = load_test('127.0.0.1', port, PATHS, args.concurrency, args.duration, headers={'Cookie': cookie})
+    finally:
+        process.terminate()
+        process.wait()
+    result['server'] = name
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--port', type=int, default=8775)
+    args = parser.parse_args()
+
+    setup_django()
+    marks = seed(args.students)
+    cookie = login_cookie()
+    print(f'Seeded {args.students} students, {marks} marks; {args.concurrency} clients, '
+          f'{args.duration:.0f}s per server')
+
+    manage = [sys.executable, os.path.join(ROOT, 'manage.py')]
+    results = [
+        run_server('runserver', [*manage, 'runserver', '--noreload', f'127.0.0.1:{args.port}'], args.port, args, cookie),
+        run_server(f'serve ({args.workers} workers x {args.threads} threads)', [
+            *manage, 'serve', '--bind', f'127.0.0.1:{args.port + 1}',
+            '--workers', str(args.workers), '--threads', str(args.threads),
+        ], args.port + 1, args, cookie),
+    ]
+    print_table(results, ['server', 'requests', 'rps', 'p50_ms', 'p95_ms', 'errors'])
+
+
+if __name__ == '__main__':
+    main()
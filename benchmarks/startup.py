@@ -0,0 +1,98 @@
+"""
+Measure the start-up cost of each entry point with python -X importtime.
+
+    python benchmarks/startup.py --repeat 5 --show refresh_grades
+
+Each entry point (django.setup(), the WSGI and ASGI applications, loading
+the URLconf as the first request does, and every management command up to
+its --help) starts in a fresh interpreter, with student_progress.settings
+and with the lean student_progress.settings_cli profile. Reported: the
+median wall time, the import time summed over all modules, the number of
+modules imported and whether NumPy was among them. --show lists the
+slowest imports of one entry point.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import ROOT, print_table
+
+PROFILES = ['student_progress.settings', 'student_progress.settings_cli']
+
+SETUP = 'import django; django.setup()'
+
+# Entry points served only with the full settings.
+WEB_ENTRY_POINTS = {
+    'wsgi': 'import student_progress.wsgi',
+    'asgi': 'import student_progress.asgi',
+    'urlconf': SETUP + '; from django.urls import get_resolver; get_resolver().url_patterns',
+}
+
+
+def commands():
+    directory = os.path.join(ROOT, 'dashboard', 'management', 'commands')
+    return sorted(name[:-3] for name in os.listdir(directory) if name.endswith('.py') and not name.startswith('_'))
+
+
+def parse_importtime(stderr):
+    """(module, self µs, cumulative µs) for each import, in the order finished"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(own), int(cumulative)))
+    return imports
+
+
+def measure(argv, settings_module):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', *argv], cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - start
+    if result.returncode:
+        raise RuntimeError(f'{" ".join(argv)} failed:\n{result.stderr[-2000:]}')
+    return wall, parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=3, help='runs per entry point (median wall time)')
+    parser.add_argument('--show', metavar='ENTRY', help='list the slowest imports of this entry point')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    entry_points = [(name, ['-c', code], PROFILES[:1]) for name, code in WEB_ENTRY_POINTS.items()]
+    entry_points.insert(0, ('setup', ['-c', SETUP], PROFILES))
+    entry_points += [(name, ['manage.py', name, '--help'], PROFILES) for name in commands()]
+
+    rows = []
+    for name, argv, profiles in entry_points:
+        for settings_module in profiles:
+            walls = []
+            for _ in range(args.repeat):
+                wall, imports = measure(argv, settings_module)
+                walls.append(wall)
+            rows.append({
+                'entry point': name,
+                'settings': settings_module.rsplit('.', 1)[1],
+                'wall ms': statistics.median(walls) * 1000,
+                'import ms': sum(own for _, own, _ in imports) / 1000,
+                'modules': len(imports),
+                'numpy': 'yes' if any(module == 'numpy' for module, _, _ in imports) else 'no',
+            })
+            if name == args.show:
+                print(f'\nSlowest imports of {name} ({settings_module}), cumulative ms:')
+                for module, _, cumulative in sorted(imports, key=lambda row: row[2], reverse=True)[:args.top]:
+                    print(f'  {cumulative / 1000:8.1f}  {module}')
+    print()
+    print_table(rows, ['entry point', 'settings', 'wall ms', 'import ms', 'modules', 'numpy'])
+
+
+if __name__ == '__main__':
+    main()
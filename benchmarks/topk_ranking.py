@@ -0,0 +1,63 @@
+"""
+Compare top-K ranking with ranking the whole cohort.
+
+    python benchmarks/topk_ranking.py --students 100000 --top 10 50
+
+Strategies: the full window-function ranking, loading every average and
+sorting in Python, a heap over every average (heapq) and
+ranking.top_students(), which pushes ORDER BY ... LIMIT k into SQLite.
+"""
+import argparse
+import heapq
+import time
+
+from common import print_table, seed, setup_django
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--subjects', type=int, default=5)
+    parser.add_argument('--top', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    from dashboard.ranking import cohort_scores, partitioned_ranking, top_students
+
+    start = time.perf_counter()
+    marks = seed(args.students, num_subjects=args.subjects, exam_types=['quarterly'])
+    print(f'seeded {marks} marks for {args.students} students in {time.perf_counter() - start:.1f} s')
+
+    def key(row):
+        return (-row['avg_score'], row['student__full_name'], row['student_id'])
+
+    rows = []
+    for k in args.top:
+        strategies = {
+            'window rank, all rows': lambda: list(partitioned_ranking('quarterly'))[:k],
+            'python sort, all rows': lambda: sorted(cohort_scores('quarterly')[0], key=key)[:k],
+            'heap over all averages': lambda: heapq.nsmallest(k, cohort_scores('quarterly')[0], key=key),
+            'top_students (LIMIT k)': lambda: top_students('quarterly', k),
+        }
+        baseline = None
+        for name, func in strategies.items():
+            seconds, result = best_of(args.repeat, func)
+            ids = [row['student_id'] for row in result][:k]
+            if baseline is None:
+                baseline = ids
+            rows.append({'k': k, 'strategy': name, 'best ms': seconds * 1000, 'same top k': ids == baseline})
+    print_table(rows, ['k', 'strategy', 'best ms', 'same top k'])
+
+
+if __name__ == '__main__':
+    main()
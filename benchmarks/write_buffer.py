@@ -0,0 +1,96 @@
+"""
+Compare direct mark saves with the write-behind buffer under concurrency.
+
+    python benchmarks/write_buffer.py --teachers 8 --writes 500 --window 0.2
+
+Each teacher thread enters marks for random cells of one exam, either
+saving each one (update_or_create, as the form does, with its signals) or
+queueing it in a MarkWriteBuffer. The clock stops once every write is in
+the database, so the buffered run includes its final flush.
+"""
+import argparse
+import random
+import threading
+import time
+
+from common import print_table, seed, setup_django
+
+
+def run(teachers, writes, cells, write):
+    """Seconds taken and the number of writes that failed"""
+    from django.db import OperationalError
+
+    failed = []
+
+    def teacher(seed_value):
+        from django.db import connection
+        rng = random.Random(seed_value)
+        try:
+            for _ in range(writes):
+                student_id, exam_id, subject_id = rng.choice(cells)
+                try:
+                    write(student_id, exam_id, subject_id, rng.randint(0, 100))
+                except OperationalError:
+                    # SQLite: "database is locked" once the busy timeout runs out.
+                    failed.append(1)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=teacher, args=(i,)) for i in range(teachers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(failed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--teachers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=500, help='writes per teacher')
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--window', type=float, default=0.2, help='buffer window in seconds')
+    args = parser.parse_args()
+
+    setup_django()
+    from dashboard.models import ProgressSheet
+    from dashboard.writebuffer import MarkWriteBuffer
+
+    seed(args.students, num_subjects=5, exam_types=['quarterly'])
+    cells = list(ProgressSheet.objects.values_list('student_id', 'exam_id', 'subject_id'))
+    total = args.teachers * args.writes
+    print(f'{args.teachers} teachers x {args.writes} writes over {len(cells)} cells')
+
+    def save(student_id, exam_id, subject_id, marks):
+        ProgressSheet.objects.update_or_create(
+            student_id=student_id, exam_id=exam_id, subject_id=subject_id, defaults={'marks': marks},
+        )
+
+    buffer = MarkWriteBuffer(args.window)
+
+    def buffered(student_id, exam_id, subject_id, marks):
+        buffer.add(student_id, exam_id, subject_id, marks)
+
+    direct_seconds, direct_failed = run(args.teachers, args.writes, cells, save)
+    buffered_seconds, buffered_failed = run(args.teachers, args.writes, cells, buffered)
+    start = time.perf_counter()
+    buffer.flush()
+    buffered_seconds += time.perf_counter() - start
+
+    rows = []
+    for label, seconds, failed in (
+        ('save each write', direct_seconds, direct_failed),
+        (f'buffer ({args.window:g} s window)', buffered_seconds, buffered_failed),
+    ):
+        rows.append({
+            'strategy': label,
+            'seconds': seconds,
+            'failed': failed,
+            'stored writes/s': (total - failed) / seconds,
+        })
+    print_table(rows, ['strategy', 'seconds', 'failed', 'stored writes/s'])
+
+
+if __name__ == '__main__':
+    main()
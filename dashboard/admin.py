@@ -1,29 +1,271 @@
-from django.contrib import admin
+import csv
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, Exists, F, OuterRef, Value
+from django.db.models.functions import Greatest, Least
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import versioning
 from .models import Student, Subject, Exam, ProgressSheet
+from .signals import marks_bulk_changed
+
+
+def estimated_row_count(model, using):
+    """
+    Row count of the model's table from the database's planner statistics,
+    or None where there are none (e.g. SQLite before ANALYZE)
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+        elif connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone() is None:
+                return None
+            # The first number of each index's stat is the table's row count.
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # PostgreSQL reports -1 for tables that were never analyzed.
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for large tables: an unfiltered changelist takes its count
+    from table statistics instead of a full COUNT(*). Filtered lists, and
+    tables estimated below the threshold, are counted exactly.
+    """
+    threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
+
+
+class Echo:
+    """File-like object for csv.writer that hands each row back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(filename, header, rows):
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(lines(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class MarksBandFilter(admin.SimpleListFilter):
+    """Fixed 10-mark bands, so the filter needs no SELECT DISTINCT over marks"""
+    title = 'marks'
+    parameter_name = 'marks_band'
+
+    def lookups(self, request, model_admin):
+        return [(str(low), f'{low}-{low + 9 if low < 90 else 100}') for low in range(0, 100, 10)]
+
+    def queryset(self, request, queryset):
+        # Not str.isdigit(), which accepts digits int() rejects ('²').
+        if self.value() is None or not (self.value().isascii() and self.value().isdecimal()):
+            return queryset
+        low = int(self.value())
+        return queryset.filter(marks__gte=low, marks__lte=low + 9 if low < 90 else 100)
+
+
+class StudentActionForm(helpers.ActionForm):
+    class_batch = forms.CharField(required=False, max_length=50, label='Class/Batch')
+
+
+class ProgressSheetActionForm(helpers.ActionForm):
+    marks = forms.IntegerField(required=False, label='Marks')
+    exam = forms.ModelChoiceField(Exam.objects.order_by('date'), required=False, label='Exam')
+
+
+def action_value(modeladmin, request, name):
+    form = modeladmin.action_form(request.POST)
+    form.is_valid()
+    value = form.cleaned_data.get(name)
+    if value in (None, ''):
+        modeladmin.message_user(request, f'Enter a value for "{form.fields[name].label}" next to the action.', messages.ERROR)
+        return None
+    return value
 
-# Register your models here.
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ['full_name', 'email', 'roll_number', 'class_batch', 'is_verified', 'created_at']
-    list_filter = ['class_batch', 'is_verified', 'created_at']
+    list_display = ['full_name', 'email', 'roll_number', 'class_batch', 'is_verified', 'is_active', 'created_at']
+    list_filter = ['is_active', 'class_batch', 'is_verified', 'created_at']
     search_fields = ['full_name', 'email', 'roll_number']
     ordering = ['full_name']
+    raw_id_fields = ['user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = StudentActionForm
+    actions = ['move_class_batch', 'mark_verified', 'archive', 'restore', 'export_csv']
+
+    def get_actions(self, request):
+        # Deleting cascades through every mark row by row; archive instead
+        # and let purge_archived_students delete in batches.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def move_class_batch(self, request, queryset):
+        class_batch = action_value(self, request, 'class_batch')
+        if class_batch is None:
+            return
+        updated = queryset.update(class_batch=class_batch, updated_at=timezone.now())
+        versioning.bump_version(versioning.STUDENTS)
+        self.message_user(request, f'Moved {updated} students to {class_batch}.', messages.SUCCESS)
+    move_class_batch.short_description = 'Move selected students to the class/batch entered'
+
+    def mark_verified(self, request, queryset):
+        updated = queryset.filter(is_verified=False).update(is_verified=True, updated_at=timezone.now())
+        versioning.bump_version(versioning.STUDENTS)
+        self.message_user(request, f'Marked {updated} students as verified.', messages.SUCCESS)
+    mark_verified.short_description = 'Mark selected students as verified'
+
+    def archive(self, request, queryset):
+        archived = queryset.filter(is_active=True).archive()
+        self.message_user(request, f'Archived {archived} students.', messages.SUCCESS)
+    archive.short_description = 'Archive selected students'
+
+    def restore(self, request, queryset):
+        restored = queryset.filter(is_active=False).restore()
+        self.message_user(request, f'Restored {restored} students.', messages.SUCCESS)
+    restore.short_description = 'Restore selected archived students'
+
+    def export_csv(self, request, queryset):
+        fields = ['roll_number', 'full_name', 'email', 'class_batch', 'date_of_birth', 'is_verified']
+        rows = queryset.order_by('roll_number').values_list(*fields).iterator(chunk_size=2000)
+        return stream_csv('students.csv', fields, rows)
+    export_csv.short_description = 'Export selected students as CSV'
+
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
 
+
 @admin.register(Exam)
 class ExamAdmin(admin.ModelAdmin):
-    list_display = ['name', 'exam_type', 'date']
-    list_filter = ['exam_type', 'date']
+    list_display = ['name', 'exam_type', 'academic_year', 'date', 'is_archived']
+    list_filter = ['is_archived', 'academic_year', 'exam_type', 'date']
+    search_fields = ['name', 'exam_type', 'academic_year']
+    # Archiving moves marks between tables; run the archive_term command.
+    readonly_fields = ['is_archived']
     ordering = ['-date']
 
+
 @admin.register(ProgressSheet)
 class ProgressSheetAdmin(admin.ModelAdmin):
-    list_display = ['student', 'exam', 'subject', 'marks', 'created_at']
-    list_filter = ['exam', 'subject', 'marks']
+    list_display = ['student', 'exam', 'subject', 'marks', 'updated_at']
+    list_filter = ['exam', 'subject', MarksBandFilter, 'updated_at']
+    list_select_related = ['student', 'exam', 'subject']
     search_fields = ['student__full_name', 'student__roll_number']
-    ordering = ['student__full_name', 'exam__date']
+    # Served by the updated_at index; sorting every row by student name and
+    # exam date on each page view does not scale.
+    ordering = ['-updated_at']
+    autocomplete_fields = ['student', 'exam', 'subject']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    action_form = ProgressSheetActionForm
+    actions = ['set_marks', 'adjust_marks', 'move_to_exam', 'export_csv']
+
+    def _exam_ids(self, queryset):
+        return list(queryset.order_by().values_list('exam_id', flat=True).distinct())
+
+    def _students(self, queryset):
+        """The (exam_id, student_id) pairs of the selected entries"""
+        return set(queryset.order_by().values_list('exam_id', 'student_id').distinct())
+
+    def set_marks(self, request, queryset):
+        marks = action_value(self, request, 'marks')
+        if marks is None:
+            return
+        if not 0 <= marks <= 100:
+            self.message_user(request, 'Marks must be between 0 and 100.', messages.ERROR)
+            return
+        students = self._students(queryset)
+        updated = queryset.update(marks=marks, updated_at=timezone.now())
+        marks_bulk_changed({exam_id for exam_id, student_id in students}, students)
+        self.message_user(request, f'Set marks to {marks} on {updated} entries.', messages.SUCCESS)
+    set_marks.short_description = 'Re-mark: set selected entries to the marks entered'
+
+    def adjust_marks(self, request, queryset):
+        delta = action_value(self, request, 'marks')
+        if delta is None:
+            return
+        students = self._students(queryset)
+        updated = queryset.update(
+            marks=Greatest(Least(F('marks') + Value(delta), Value(100)), Value(0)),
+            updated_at=timezone.now(),
+        )
+        marks_bulk_changed({exam_id for exam_id, student_id in students}, students)
+        self.message_user(request, f'Adjusted marks by {delta:+d} (kept within 0-100) on {updated} entries.', messages.SUCCESS)
+    adjust_marks.short_description = 'Re-mark: add the marks entered (negative to subtract)'
+
+    def move_to_exam(self, request, queryset):
+        exam = action_value(self, request, 'exam')
+        if exam is None:
+            return
+        if queryset.order_by().values('student', 'subject').annotate(rows=Count('id')).filter(rows__gt=1).exists():
+            self.message_user(
+                request, 'The selection has several entries for the same student and subject; move them one exam at a time.',
+                messages.ERROR,
+            )
+            return
+        exam_ids = self._exam_ids(queryset)
+        # Entries whose student already has marks for the subject in the
+        # target exam would break the unique constraint; leave them be.
+        clash = ProgressSheet.all_objects.filter(student=OuterRef('student'), subject=OuterRef('subject'), exam=exam)
+        movable = queryset.exclude(exam=exam).exclude(Exists(clash))
+        students = self._students(movable)
+        updated = movable.update(exam=exam, updated_at=timezone.now())
+        students |= {(exam.id, student_id) for exam_id, student_id in students}
+        marks_bulk_changed(exam_ids + [exam.id], students)
+        skipped = queryset.count() - updated
+        message = f'Moved {updated} entries to {exam.name}.'
+        if skipped:
+            message += f' Skipped {skipped} already in that exam or with marks there.'
+        self.message_user(request, message, messages.SUCCESS if updated else messages.WARNING)
+    move_to_exam.short_description = 'Move selected entries to the exam chosen'
+
+    def export_csv(self, request, queryset):
+        header = ['roll_number', 'student', 'class_batch', 'exam_type', 'exam', 'subject', 'marks', 'updated_at']
+        rows = queryset.order_by('student__roll_number', 'exam__date', 'subject__name').values_list(
+            'student__roll_number', 'student__full_name', 'student__class_batch',
+            'exam__exam_type', 'exam__name', 'subject__name', 'marks', 'updated_at',
+        ).iterator(chunk_size=2000)
+        return stream_csv('progress.csv', header, rows)
+    export_csv.short_description = 'Export selected entries as CSV'
@@ -0,0 +1,201 @@
+"""
+Vectorized exam statistics.
+
+The marks of an exam are loaded with one ``values_list`` query into NumPy
+arrays; every statistic is then computed per group (subject, class/batch,
+or both) with sorting and ``bincount`` rather than Python loops.
+"""
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+
+from .models import ProgressSheet
+
+PERCENTILES = (10, 25, 50, 75, 90)
+HISTOGRAM_BINS = np.arange(0, 101, 10)
+NUM_VALUES = 101  # marks are integers 0..100
+
+
+def pass_mark():
+    return getattr(settings, 'DASHBOARD_PASS_MARK', 40)
+
+
+def factorize(values):
+    """
+    Return (codes, labels) so that labels[codes] == values
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64, count=len(values))
+    return codes, list(index)
+
+
+class ExamMarks:
+    """
+    Column arrays for every mark of one exam
+    """
+    def __init__(self, student_ids, subject_codes, subjects, batch_codes, class_batches, marks):
+        self.student_ids = student_ids
+        self.subject_codes = subject_codes
+        self.subjects = subjects
+        self.batch_codes = batch_codes
+        self.class_batches = class_batches
+        self.marks = marks
+
+    @classmethod
+    def for_exam(cls, exam):
+        rows = ProgressSheet.objects.filter(exam=exam).values_list(
+            'student_id', 'subject__name', 'student__class_batch', 'marks',
+        )
+        return cls.from_rows(list(rows))
+
+    @classmethod
+    def from_rows(cls, rows):
+        # Column-wise itemgetter is several times faster than zip(*rows).
+        student_ids, subjects, class_batches, marks = (list(map(itemgetter(i), rows)) for i in range(4))
+        subject_codes, subject_labels = factorize(subjects)
+        batch_codes, batch_labels = factorize(class_batches)
+        return cls(
+            np.asarray(student_ids, dtype=np.int64),
+            subject_codes,
+            subject_labels,
+            batch_codes,
+            batch_labels,
+            np.asarray(marks, dtype=np.int64),
+        )
+
+    def __len__(self):
+        return len(self.marks)
+
+
+def group_statistics(marks, codes, num_groups, threshold=None):
+    """
+    Statistics of marks per group code (0 .. num_groups - 1), as a dict of
+    arrays indexed by group.
+
+    Marks are integers in 0..100, so order statistics come from a per-group
+    count of each mark value instead of sorting.
+    """
+    if threshold is None:
+        threshold = pass_mark()
+    counts = np.bincount(codes, minlength=num_groups)
+    safe_counts = np.maximum(counts, 1)
+
+    value_counts = np.bincount(
+        codes * NUM_VALUES + marks, minlength=num_groups * NUM_VALUES,
+    ).reshape(num_groups, NUM_VALUES)
+    values = np.arange(NUM_VALUES)
+    sums = value_counts @ values
+    means = sums / safe_counts
+    variances = (value_counts @ (values ** 2)) / safe_counts - means ** 2
+    stddevs = np.sqrt(np.maximum(variances, 0))
+    passed = value_counts[:, threshold:].sum(axis=1) if threshold < NUM_VALUES else np.zeros(num_groups)
+
+    # cumulative[g, v] = number of marks <= v in group g; the k-th smallest
+    # mark (0-based) is the number of values whose cumulative count is <= k.
+    cumulative = np.cumsum(value_counts, axis=1)
+    last = np.maximum(counts - 1, 0)
+
+    def order_statistic(k):
+        return (cumulative <= k[:, None]).sum(axis=1)
+
+    percentiles = {}
+    for pct in PERCENTILES:
+        position = last * (pct / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        fraction = position - lower
+        low_values = order_statistic(lower)
+        high_values = order_statistic(np.ceil(position).astype(np.int64))
+        percentiles[pct] = low_values + (high_values - low_values) * fraction
+    present = counts > 0
+    minimums = np.where(present, order_statistic(np.zeros(num_groups, dtype=np.int64)), np.nan)
+    maximums = np.where(present, order_statistic(last), np.nan)
+
+    num_bins = len(HISTOGRAM_BINS) - 1
+    bin_of_value = np.minimum(values // 10, num_bins - 1)
+    histograms = np.zeros((num_groups, num_bins), dtype=np.int64)
+    np.add.at(histograms.T, bin_of_value, value_counts.T)
+
+    return {
+        'count': counts,
+        'mean': means,
+        'stddev': stddevs,
+        'min': minimums,
+        'max': maximums,
+        'median': percentiles[50],
+        'percentiles': percentiles,
+        'pass_rate': passed / safe_counts,
+        'histogram': histograms,
+    }
+
+
+def z_scores(marks, codes, stats):
+    """
+    Each mark's standard score within its group
+    """
+    stddevs = stats['stddev'][codes]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = (marks - stats['mean'][codes]) / stddevs
+    return np.where(stddevs > 0, scores, 0.0)
+
+
+def _rows(stats, labels):
+    rows = []
+    for i, label in enumerate(labels):
+        if not stats['count'][i]:
+            continue
+        rows.append({
+            'group': label,
+            'count': int(stats['count'][i]),
+            'mean': round(float(stats['mean'][i]), 2),
+            'median': round(float(stats['median'][i]), 2),
+            'stddev': round(float(stats['stddev'][i]), 2),
+            'min': float(stats['min'][i]),
+            'max': float(stats['max'][i]),
+            'percentiles': {f'p{pct}': round(float(values[i]), 2) for pct, values in stats['percentiles'].items()},
+            'pass_rate': round(float(stats['pass_rate'][i]), 4),
+            'histogram': stats['histogram'][i].tolist(),
+        })
+    return rows
+
+
+def exam_statistics(exam_marks, include_z_scores=False):
+    """
+    Statistics for one exam overall, per subject, per class/batch and per
+    (class/batch, subject), as JSON-ready dicts
+    """
+    data = exam_marks
+    subjects = data.subjects
+    num_subjects = len(subjects)
+    num_batches = len(data.class_batches)
+
+    overall = group_statistics(data.marks, np.zeros(len(data), dtype=np.int64), 1)
+    by_subject = group_statistics(data.marks, data.subject_codes, num_subjects)
+    by_batch = group_statistics(data.marks, data.batch_codes, num_batches)
+    pair_codes = data.batch_codes * num_subjects + data.subject_codes
+    by_pair = group_statistics(data.marks, pair_codes, num_batches * num_subjects)
+    pair_labels = [
+        {'class_batch': batch, 'subject': subject}
+        for batch in data.class_batches
+        for subject in subjects
+    ]
+
+    result = {
+        'pass_mark': pass_mark(),
+        'histogram_bins': HISTOGRAM_BINS.tolist(),
+        'overall': _rows(overall, ['all'])[0] if len(data) else None,
+        'by_subject': _rows(by_subject, subjects),
+        'by_class_batch': _rows(by_batch, data.class_batches),
+        'by_class_batch_subject': _rows(by_pair, pair_labels),
+    }
+    if include_z_scores:
+        # A student's z-score is the mean of their per-subject z-scores.
+        scores = z_scores(data.marks, data.subject_codes, by_subject)
+        student_ids, student_codes = np.unique(data.student_ids, return_inverse=True)
+        totals = np.bincount(student_codes, weights=scores, minlength=len(student_ids))
+        counts = np.bincount(student_codes, minlength=len(student_ids))
+        result['student_z_scores'] = {
+            str(int(student_id)): round(float(total / count), 3)
+            for student_id, total, count in zip(student_ids, totals, counts)
+        }
+    return result
@@ -0,0 +1,333 @@
+"""
+Read-only JSON API (version 1) for the mobile app.
+
+Every list endpoint runs a single ``.values()`` query per page, so the cost
+does not depend on the page size, and rows are serialized without building
+model instances.
+"""
+import base64
+import binascii
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_GET
+
+from . import reference
+from .matrix import statistics_for
+from .models import Student, Subject, Exam, ProgressSheet
+from .ranking import PARTITIONS, SCORES, partitioned_ranking
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Public field name -> ORM lookup, per resource. Only these can be requested
+# through ?fields=.
+STUDENT_FIELDS = {
+    'id': 'id',
+    'full_name': 'full_name',
+    'email': 'email',
+    'roll_number': 'roll_number',
+    'class_batch': 'class_batch',
+    'date_of_birth': 'date_of_birth',
+    'is_verified': 'is_verified',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+SUBJECT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+}
+
+EXAM_FIELDS = {
+    'id': 'id',
+    'exam_type': 'exam_type',
+    'name': 'name',
+    'date': 'date',
+}
+
+PROGRESS_FIELDS = {
+    'id': 'id',
+    'student': 'student_id',
+    'student_name': 'student__full_name',
+    'roll_number': 'student__roll_number',
+    'exam': 'exam_id',
+    'exam_type': 'exam__exam_type',
+    'subject': 'subject_id',
+    'subject_name': 'subject__name',
+    'marks': 'marks',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+}
+
+RANKING_FIELDS = {
+    'rank': None,
+    'student': 'student_id',
+    'full_name': 'student__full_name',
+    'roll_number': 'student__roll_number',
+    'class_batch': 'student__class_batch',
+    'avg_score': 'avg_score',
+    'total_marks': 'total_marks',
+    'num_subjects': 'num_subjects',
+}
+
+GPA_RANKING_FIELDS = dict(RANKING_FIELDS, gpa='gpa')
+
+SUBJECT_RANKING_FIELDS = {
+    'rank': None,
+    'student': 'student_id',
+    'full_name': 'student__full_name',
+    'roll_number': 'student__roll_number',
+    'class_batch': 'student__class_batch',
+    'subject': 'subject_id',
+    'subject_name': 'subject__name',
+    'marks': 'marks',
+}
+
+
+class APIError(Exception):
+    """
+    Raised for bad request parameters; rendered as a JSON error body
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _msgpack_default(value):
+    return value.isoformat()
+
+
+def encode(data, fmt):
+    """
+    Return (body, content_type) for data in the requested format
+    """
+    if fmt == 'msgpack':
+        if msgpack is None:
+            raise APIError('msgpack encoding is not available.', status=406)
+        return msgpack.packb(data, default=_msgpack_default, use_bin_type=True), 'application/msgpack'
+    if orjson is not None:
+        return orjson.dumps(data), 'application/json'
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')), 'application/json'
+
+
+def _response_format(request):
+    fmt = request.GET.get('format')
+    if fmt:
+        return fmt
+    if 'application/msgpack' in request.META.get('HTTP_ACCEPT', ''):
+        return 'msgpack'
+    return 'json'
+
+
+def api_view(view_func):
+    """
+    Wrap an API view: GET only, session authentication, error handling,
+    content negotiation and gzip compression
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        fmt = _response_format(request)
+        try:
+            if not request.user.is_authenticated:
+                raise APIError('Authentication credentials were not provided.', status=401)
+            data = view_func(request, *args, **kwargs)
+            status = 200
+        except APIError as exc:
+            data = {'error': exc.message}
+            status = exc.status
+        try:
+            body, content_type = encode(data, fmt)
+        except APIError as exc:
+            body, content_type = encode({'error': exc.message}, 'json')
+            status = exc.status
+        return HttpResponse(body, content_type=content_type, status=status)
+    return gzip_page(require_GET(_wrapped_view))
+
+
+def select_fields(request, available):
+    """
+    Return the {name: lookup} map for the ?fields= sparse fieldset
+    """
+    requested = request.GET.get('fields')
+    if not requested:
+        return dict(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise APIError(f"Unknown field(s): {', '.join(unknown)}")
+    return {name: available[name] for name in names}
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise APIError('limit must be an integer.')
+    if limit < 1:
+        raise APIError('limit must be positive.')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(str(position).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(request):
+    cursor = request.GET.get('cursor')
+    if not cursor:
+        return None
+    try:
+        value = int(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('ascii'))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise APIError('Invalid cursor.')
+    # Cursors are primary keys or row offsets, never negative.
+    if value < 0:
+        raise APIError('Invalid cursor.')
+    return value
+
+
+def rows(queryset, fields):
+    """
+    Serialize a queryset through .values(), renaming lookups to field names
+    """
+    lookups = list(fields.values())
+    names = list(fields)
+    return [
+        {name: row[lookup] for name, lookup in zip(names, lookups)}
+        for row in queryset.values(*lookups)
+    ]
+
+
+def keyset_page(request, queryset, fields):
+    """
+    Return one page ordered by primary key, fetched with a single query.
+
+    The cursor is the last id of the previous page, so deep pages cost the
+    same as the first one.
+    """
+    limit = page_size(request)
+    after = decode_cursor(request)
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    fields = dict(fields)
+    if 'id' not in fields:
+        # The cursor needs the id; fetch it and drop it from the output.
+        fields['__cursor'] = 'id'
+    results = rows(queryset.order_by('pk')[:limit + 1], fields)
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(last.get('id', last.get('__cursor')))
+    for result in results:
+        result.pop('__cursor', None)
+    return {'results': results, 'next': next_cursor}
+
+
+@api_view
+def student_list_api(request):
+    """List students, optionally filtered by class_batch"""
+    students = Student.objects.all()
+    class_batch = request.GET.get('class_batch')
+    if class_batch:
+        students = students.filter(class_batch=class_batch)
+    return keyset_page(request, students, select_fields(request, STUDENT_FIELDS))
+
+
+@api_view
+def subject_list_api(request):
+    """List subjects"""
+    return keyset_page(request, Subject.objects.all(), select_fields(request, SUBJECT_FIELDS))
+
+
+@api_view
+def exam_list_api(request):
+    """List exams"""
+    return keyset_page(request, Exam.objects.all(), select_fields(request, EXAM_FIELDS))
+
+
+@api_view
+def progress_list_api(request):
+    """List marks, filtered by exam_type, student, exam or subject"""
+    progress_sheets = ProgressSheet.objects.all()
+    exam_type = request.GET.get('exam_type')
+    if exam_type:
+        progress_sheets = progress_sheets.filter(exam__exam_type=exam_type)
+    for param in ('student', 'exam', 'subject'):
+        value = request.GET.get(param)
+        if value:
+            # Not str.isdigit(), which accepts digits int() rejects ('²').
+            if not (value.isascii() and value.isdecimal()):
+                raise APIError(f'{param} must be an id.')
+            progress_sheets = progress_sheets.filter(**{f'{param}_id': int(value)})
+    return keyset_page(request, progress_sheets, select_fields(request, PROGRESS_FIELDS))
+
+
+@api_view
+def ranking_api(request):
+    """
+    Rank students by average marks for one exam type (by GPA with
+    ?score=gpa), or by subject marks with ?partition=subject or
+    ?subject=<id>. ?partition=class_batch ranks within each class/batch;
+    ?class_batch= narrows the cohort.
+
+    Uses a single query with a window function; the cursor is the row offset.
+    """
+    exam_type = request.GET.get('exam_type', 'quarterly')
+    partition = request.GET.get('partition', '')
+    if partition not in PARTITIONS:
+        raise APIError(f"partition must be one of: {', '.join(name for name in PARTITIONS if name)}.")
+    subject = request.GET.get('subject') or None
+    if subject is not None and not (subject.isascii() and subject.isdecimal()):
+        raise APIError('subject must be a subject id.')
+    score = request.GET.get('score', 'avg_score')
+    if score not in SCORES:
+        raise APIError(f"score must be one of: {', '.join(SCORES)}.")
+    by_subject = subject is not None or 'subject' in partition
+    if by_subject:
+        fields = select_fields(request, SUBJECT_RANKING_FIELDS)
+    else:
+        fields = select_fields(request, GPA_RANKING_FIELDS if score == 'gpa' else RANKING_FIELDS)
+    limit = page_size(request)
+    offset = decode_cursor(request) or 0
+    ranked = partitioned_ranking(
+        exam_type, partition, class_batch=request.GET.get('class_batch'), subject=subject, score=score,
+    )
+    page = list(ranked[offset:offset + limit + 1])
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(offset + limit)
+    results = [{name: row[lookup or name] for name, lookup in fields.items()} for row in page]
+    return {'exam_type': exam_type, 'partition': partition, 'results': results, 'next': next_cursor}
+
+
+@api_view
+def analytics_api(request):
+    """
+    Mark statistics for one exam; ?z_scores=1 adds per-student z-scores
+    """
+    exam_type = request.GET.get('exam_type', 'quarterly')
+    exam = reference.exam_of_type(exam_type)
+    if exam is None:
+        raise APIError('Unknown exam type.', status=404)
+    include_z_scores = request.GET.get('z_scores') in ('1', 'true')
+    statistics = statistics_for(exam, include_z_scores=include_z_scores)
+    statistics['exam'] = {'id': exam.id, 'exam_type': exam.exam_type, 'name': exam.name}
+    return statistics
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class DashboardConfig(AppConfig):
     name = 'dashboard'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from . import metrics, signals  # noqa: F401
+
+        connection_created.connect(metrics.install_query_timer, dispatch_uid='dashboard_query_timer')
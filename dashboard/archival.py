@@ -0,0 +1,101 @@
+"""
+Term archival.
+
+Once a term is over its marks are only read for history. archive_term()
+first marks the term's exams archived, which takes them off every hot
+path at once: Exam.objects and ProgressSheet.objects only see open terms,
+and lookups by exam type find the next year's exam. It then streams the
+marks into ArchivedProgressSheet in batches. Each batch is copied and
+deleted in its own transaction, so memory and lock time stay bounded,
+and a run that is interrupted can simply be repeated.
+
+Django does not manage native table partitioning; a separate archive
+table gives the same effect (a small hot table, history on demand) on
+every backend.
+"""
+import time
+
+from django.db import transaction
+
+from . import reference
+from .models import Exam, ProgressSheet, ArchivedProgressSheet
+from .retention import BATCH_SIZE, raw_delete
+from .signals import marks_bulk_changed
+
+ARCHIVED_FIELDS = ('pk', 'student_id', 'exam_id', 'subject_id', 'marks', 'created_at', 'updated_at')
+
+
+class ArchiveReport:
+    """Outcome of one archive_term() run"""
+
+    def __init__(self):
+        self.exams = 0
+        self.moved = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+
+def archive_exam(exam, batch_size=BATCH_SIZE, pause=0, report=None):
+    """Move one exam's marks to ArchivedProgressSheet; returns the report"""
+    report = report or ArchiveReport()
+    if not exam.is_archived:
+        Exam.all_objects.filter(pk=exam.pk).update(is_archived=True)
+        exam.is_archived = True
+        # update() sends no post_save signal; the exam leaves the open ones.
+        reference.invalidate()
+    # Moved rows are deleted, so every batch is simply the first rows left.
+    marks = ProgressSheet.all_objects.filter(exam=exam).order_by().values_list(*ARCHIVED_FIELDS)
+    while True:
+        batch = list(marks[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            ArchivedProgressSheet.objects.bulk_create([
+                ArchivedProgressSheet(
+                    student_id=student_id, exam_id=exam_id, subject_id=subject_id,
+                    marks=value, created_at=created_at, updated_at=updated_at,
+                )
+                for pk, student_id, exam_id, subject_id, value, created_at, updated_at in batch
+            ], ignore_conflicts=True)
+            report.moved += raw_delete(ProgressSheet, [row[0] for row in batch])
+        report.batches += 1
+        if pause:
+            time.sleep(pause)
+    report.exams += 1
+    marks_bulk_changed([exam.id])
+    return report
+
+
+def archive_term(academic_year, exam_types=None, batch_size=BATCH_SIZE, pause=0):
+    """
+    Archive the academic year's exams (or only those of the given types);
+    returns an ArchiveReport
+    """
+    started = time.perf_counter()
+    report = ArchiveReport()
+    exams = Exam.all_objects.filter(academic_year=academic_year).order_by('date')
+    if exam_types:
+        exams = exams.filter(exam_type__in=exam_types)
+    for exam in exams:
+        archive_exam(exam, batch_size, pause, report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def archived_years():
+    """Academic years with archived exams, newest first"""
+    return reference.local.get('archived_years', lambda: list(
+        Exam.all_objects.filter(is_archived=True).order_by('-academic_year')
+        .values_list('academic_year', flat=True).distinct()
+    ))
+
+
+def progress_history(academic_year=None):
+    """
+    Archived marks with related data, for reading history; the same shape
+    as ProgressSheet.objects.select_related('student', 'exam', 'subject')
+    """
+    history = ArchivedProgressSheet.objects.select_related('student', 'exam', 'subject')
+    if academic_year:
+        history = history.filter(exam__academic_year=academic_year)
+    return history
@@ -0,0 +1,132 @@
+"""
+Async variants of the read-heavy views, served by the ASGI application.
+
+Each view starts its independent queries at once and waits for all of them,
+so a page costs roughly its slowest query instead of the sum of all of them.
+The WSGI deployment keeps using the synchronous views in views.py.
+"""
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.shortcuts import render
+
+from .archival import archived_years
+from .conditional import conditional_page, progress_validator, ranking_validator
+from . import reference
+from .models import Student
+from .views import (
+    recent_progress_entries, latest_exam_leaders, exam_type_choices, progress_sheets_for, ranking_filters, ranking_rows,
+    ranking_context, class_batch_choices, subject_choices,
+)
+
+
+def _run_query(func, *args):
+    try:
+        return func(*args)
+    finally:
+        # Worker threads hold their own connection; release it according to
+        # CONN_MAX_AGE, the same way request_finished does for views.
+        close_old_connections()
+
+
+async def run_queries(*calls):
+    """
+    Run independent (func, *args) query calls concurrently and return their
+    results in order.
+
+    Calls run on separate worker threads, each with its own database
+    connection. With DASHBOARD_CONCURRENT_QUERIES = False they run one after
+    another on the request's connection instead.
+    """
+    if not getattr(settings, 'DASHBOARD_CONCURRENT_QUERIES', True):
+        return [await sync_to_async(func)(*args) for func, *args in calls]
+    return await asyncio.gather(*(
+        sync_to_async(_run_query, thread_sensitive=False)(func, *args)
+        for func, *args in calls
+    ))
+
+
+def async_login_required(view_func):
+    """
+    login_required for coroutine views; the user is loaded off the event loop
+    """
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+async def render_async(request, template_name, context):
+    # Rendering may touch the session (messages), so keep it on the request
+    # thread.
+    return await sync_to_async(render)(request, template_name, context)
+
+
+@async_login_required
+async def dashboard_view(request):
+    """Main dashboard view"""
+    total_students, total_exams, total_subjects, recent_progress, (leaders_exam, leaders) = await run_queries(
+        (Student.objects.count,),
+        (lambda: len(reference.exams()),),
+        (lambda: len(reference.subjects()),),
+        (recent_progress_entries,),
+        (latest_exam_leaders,),
+    )
+    context = {
+        'total_students': total_students,
+        'total_exams': total_exams,
+        'total_subjects': total_subjects,
+        'recent_progress': recent_progress,
+        'leaders_exam': leaders_exam,
+        'leaders': leaders,
+        'live_updates': True,
+    }
+    return await render_async(request, 'dashboard/dashboard.html', context)
+
+
+@async_login_required
+@conditional_page(progress_validator)
+async def progress_sheet_view(request):
+    """View to manage student progress sheets"""
+    exam_type = request.GET.get('exam_type', '')
+    sort_by = request.GET.get('sort_by', 'student__full_name')
+    academic_year = request.GET.get('academic_year', '')
+    progress_sheets, exams, academic_years = await run_queries(
+        (lambda: list(progress_sheets_for(exam_type, sort_by, academic_year)),),
+        (reference.exams,),
+        (archived_years,),
+    )
+    context = {
+        'progress_sheets': progress_sheets,
+        'exams': exams,
+        'academic_years': academic_years,
+        'selected_exam_type': exam_type,
+        'selected_academic_year': academic_year,
+        'sort_by': sort_by,
+    }
+    return await render_async(request, 'dashboard/progress_sheet.html', context)
+
+
+@async_login_required
+@conditional_page(ranking_validator)
+async def ranking_view(request):
+    """View to display student rankings, overall or within class/batch and subject"""
+    filters = ranking_filters(request)
+    rankings, exam_types, class_batches, subjects = await run_queries(
+        (ranking_rows, filters),
+        (exam_type_choices,),
+        (class_batch_choices,),
+        (subject_choices,),
+    )
+    context = ranking_context(filters, rankings, exam_types, class_batches, subjects)
+    # The event feed carries overall rank changes by average only.
+    overall = not any(filters[name] for name in ('partition', 'class_batch', 'subject', 'top'))
+    context['live_updates'] = overall and filters['score'] == 'avg_score'
+    return await render_async(request, 'dashboard/ranking.html', context)
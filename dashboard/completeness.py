@@ -0,0 +1,103 @@
+"""
+Completeness of mark entry before results are published.
+
+Every active student is expected to have a mark in every subject for each
+open exam. The number of marks entered per exam is kept in
+ExamCompleteness: the ProgressSheet signal receivers add and subtract one
+per row, bulk changes (which send no signals) recount their exams
+through signals.marks_bulk_changed(), and archiving or restoring students
+moves the counters by their marks per exam. The overview therefore costs a few
+small queries however many marks there are. The missing cells themselves
+are listed for one exam and class/batch at a time with a single anti-join.
+"""
+from django.db import connection
+from django.db.models import Count, F
+from django.utils import timezone
+
+from . import reference
+from .models import Student, Subject, Exam, ProgressSheet, ExamCompleteness
+
+
+def recount(exam_ids):
+    """Recount the marks entered for the exams with one grouped query"""
+    exam_ids = list(exam_ids)
+    counts = dict(
+        ProgressSheet.objects.filter(exam_id__in=exam_ids).order_by()
+        .values_list('exam_id').annotate(entered=Count('id'))
+    )
+    now = timezone.now()
+    for exam_id in exam_ids:
+        entered = counts.get(exam_id, 0)
+        if ExamCompleteness.objects.filter(exam_id=exam_id).update(entered=entered, updated_at=now):
+            continue
+        if Exam.all_objects.filter(pk=exam_id).exists():
+            ExamCompleteness.objects.get_or_create(exam_id=exam_id, defaults={'entered': entered})
+
+
+def marks_entered(exam_id, delta):
+    """
+    Add delta to the exam's counter, recounting if an entry finds none yet;
+    removals leave a missing counter to be recounted when next read, as the
+    exam itself may be on its way out
+    """
+    updated = ExamCompleteness.objects.filter(exam_id=exam_id).update(
+        entered=F('entered') + delta, updated_at=timezone.now(),
+    )
+    if not updated and delta > 0:
+        recount([exam_id])
+
+
+def completeness_overview():
+    """
+    Entered, expected and missing mark counts for every open exam, from the
+    counters; exams without one yet are counted once
+    """
+    exams = reference.exams()
+    counters = dict(ExamCompleteness.objects.filter(exam__in=exams).values_list('exam_id', 'entered'))
+    uncounted = [exam.id for exam in exams if exam.id not in counters]
+    if uncounted:
+        recount(uncounted)
+        counters.update(ExamCompleteness.objects.filter(exam__in=uncounted).values_list('exam_id', 'entered'))
+    expected = Student.objects.count() * len(reference.subjects())
+    rows = []
+    for exam in exams:
+        entered = counters.get(exam.id, 0)
+        rows.append({
+            'exam': exam,
+            'entered': entered,
+            'expected': expected,
+            'missing': max(expected - entered, 0),
+            'percent': round(100 * entered / expected, 1) if expected else 100.0,
+        })
+    return rows
+
+
+def missing_cells(exam, class_batch=None):
+    """
+    (student, subject) pairs without a mark for the exam, optionally in
+    one class/batch: every active student crossed with every subject,
+    less the cells that have a ProgressSheet row, in one query
+    """
+    quote = connection.ops.quote_name
+    student = quote(Student._meta.db_table)
+    subject = quote(Subject._meta.db_table)
+    progress = quote(ProgressSheet._meta.db_table)
+    sql = f'''
+        SELECT st.{quote('id')}, st.{quote('full_name')}, st.{quote('roll_number')}, st.{quote('class_batch')},
+               su.{quote('id')}, su.{quote('name')}
+        FROM {student} st CROSS JOIN {subject} su
+        WHERE st.{quote('is_active')} = %s
+          {f"AND st.{quote('class_batch')} = %s" if class_batch else ''}
+          AND NOT EXISTS (
+              SELECT 1 FROM {progress} p
+              WHERE p.{quote('student_id')} = st.{quote('id')}
+                AND p.{quote('exam_id')} = %s
+                AND p.{quote('subject_id')} = su.{quote('id')}
+          )
+        ORDER BY st.{quote('class_batch')}, st.{quote('full_name')}, st.{quote('id')}, su.{quote('name')}
+    '''
+    params = [True] + ([class_batch] if class_batch else []) + [exam.id]
+    columns = ('student_id', 'full_name', 'roll_number', 'class_batch', 'subject_id', 'subject')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import condition
+
+from . import versioning
+from .models import Student, ProgressSheet, ArchivedProgressSheet, ExamResult
+
+
+def progress_validator(request, default_exam_type=''):
+    """
+    Freshness data for pages built from progress sheets (one aggregate query),
+    and from the exams and subjects in their filters (the reference version)
+    """
+    academic_year = request.GET.get('academic_year')
+    if academic_year:
+        # Archived marks change only when archive_term moves rows in.
+        progress_sheets = ArchivedProgressSheet.objects.filter(exam__academic_year=academic_year)
+        marks_updated = Max('archived_at')
+    else:
+        progress_sheets = ProgressSheet.objects.all()
+        marks_updated = Max('updated_at')
+    exam_type = request.GET.get('exam_type', default_exam_type)
+    if exam_type:
+        progress_sheets = progress_sheets.filter(exam__exam_type=exam_type)
+    data = progress_sheets.aggregate(
+        marks_updated=marks_updated,
+        students_updated=Max('student__updated_at'),
+        rows=Count('id'),
+    )
+    data['reference'] = versioning.get_version(versioning.REFERENCE)
+    return data
+
+
+def ranking_validator(request):
+    """
+    Freshness data for the ranking page, which defaults to quarterly exams;
+    GPA rankings also depend on the stored results and the grading scheme
+    """
+    data = progress_validator(request, default_exam_type='quarterly')
+    if request.GET.get('score') == 'gpa':
+        results = ExamResult.objects.filter(exam__exam_type=request.GET.get('exam_type', 'quarterly'))
+        data.update(results.aggregate(results_updated=Max('updated_at'), results=Count('id')))
+        data['grading'] = repr(getattr(settings, 'DASHBOARD_GRADING', None))
+    return data
+
+
+def student_validator(request):
+    """
+    Freshness data for the student list (one aggregate query)
+    """
+    return Student.objects.aggregate(
+        students_updated=Max('updated_at'),
+        rows=Count('id'),
+    )
+
+
+def _has_messages(request):
+    # A page showing queued flash messages differs from the cached copy;
+    # len() does not mark them as shown.
+    return len(get_messages(request)) > 0
+
+
+def _get_validator(request, validator):
+    # condition() asks for the ETag and Last-Modified separately; share the
+    # single aggregate query between them.
+    if not hasattr(request, '_page_validator'):
+        request._page_validator = validator(request)
+    return request._page_validator
+
+
+def _etag(request, validator):
+    data = _get_validator(request, validator)
+    key = repr((
+        request.path,
+        sorted(request.GET.lists()),
+        request.user.pk,
+        sorted(data.items()),
+    ))
+    return hashlib.md5(key.encode('utf-8')).hexdigest()
+
+
+def _last_modified(request, validator):
+    data = _get_validator(request, validator)
+    timestamps = [value for key, value in data.items() if key.endswith('_updated') and value]
+    return max(timestamps) if timestamps else None
+
+
+def conditional_page(validator):
+    """
+    Answer 304 Not Modified when the validator data for the page is unchanged.
+
+    The view body (queries, context, template render) only runs when the
+    client's cached copy is stale. Responses are marked private and must be
+    revalidated, since pages are rendered per user. Works for both sync and
+    async views.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            return _async_conditional_page(validator, view_func)
+
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: _etag(request, validator),
+            last_modified_func=lambda request, *args, **kwargs: _last_modified(request, validator),
+        )(view_func)
+
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if _has_messages(request):
+                response = view_func(request, *args, **kwargs)
+            else:
+                response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return _wrapped_view
+    return decorator
+
+
+def _async_conditional_page(validator, view_func):
+    # Same contract as condition(), with the validator query run off the
+    # event loop.
+    @wraps(view_func)
+    async def _wrapped_view(request, *args, **kwargs):
+        etag = last_modified = None
+        if request.method in ('GET', 'HEAD') and await sync_to_async(_has_messages)(request):
+            response = await view_func(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        if request.method in ('GET', 'HEAD'):
+            await sync_to_async(_get_validator)(request, validator)
+            etag = '"%s"' % _etag(request, validator)
+            last_modified = _last_modified(request, validator)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified and int(last_modified.timestamp()),
+        )
+        if response is None:
+            response = await view_func(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            if last_modified and not response.has_header('Last-Modified'):
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            response.setdefault('ETag', etag)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    return _wrapped_view
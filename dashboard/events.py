@@ -0,0 +1,146 @@
+"""
+In-process publish/subscribe for live dashboard updates.
+
+Model signals (see signals.py) publish events once per change; every
+connected client receives the same event object through its own queue, so
+the number of database queries does not grow with the number of clients.
+Only clients connected to this process see its events.
+"""
+import asyncio
+import threading
+
+PROGRESS_TOPIC = 'progress'
+RESET = 'reset'
+
+
+def ranking_topic(exam_type):
+    return f'ranking:{exam_type}'
+
+
+class Subscription:
+    """
+    A client's queue of (event, data) pairs. Iterate it with ``async for``.
+    """
+    def __init__(self, broker, topic, loop, maxsize):
+        self.broker = broker
+        self.topic = topic
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, item):
+        # Runs on the subscriber's event loop.
+        if self.queue.full():
+            # The client can't keep up; drop what it missed and tell it to
+            # reload instead of sending a partial history.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            item = (RESET, {})
+        self.queue.put_nowait(item)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class EventBroker:
+    """
+    Topic-based fan-out to asyncio subscribers, safe to publish from any
+    thread (signal handlers run on request threads)
+    """
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._rank_snapshots = {}
+
+    def subscribe(self, topic):
+        subscription = Subscription(self, topic, asyncio.get_event_loop(), self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.topic, set())
+            subscribers.discard(subscription)
+            if not subscribers:
+                self._subscriptions.pop(subscription.topic, None)
+                if subscription.topic.startswith('ranking:'):
+                    self._rank_snapshots.pop(subscription.topic, None)
+
+    def has_subscribers(self, topic):
+        return bool(self._subscriptions.get(topic))
+
+    def has_any_subscribers(self):
+        return bool(self._subscriptions)
+
+    def publish(self, topic, event, data):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(topic, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, (event, data))
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                self.unsubscribe(subscription)
+
+    def ensure_rank_snapshot(self, exam_type):
+        """
+        Record the current ranking as the baseline for rank-change events.
+        Runs a query; call it through sync_to_async from async code.
+        """
+        topic = ranking_topic(exam_type)
+        with self._lock:
+            if topic in self._rank_snapshots:
+                return
+        snapshot = _rank_snapshot(exam_type)
+        with self._lock:
+            self._rank_snapshots.setdefault(topic, snapshot)
+
+    def publish_rank_changes(self, exam_type):
+        """
+        Recompute the ranking once and publish the rows whose rank or score
+        changed. Does nothing when nobody is watching this exam type.
+        """
+        topic = ranking_topic(exam_type)
+        if not self.has_subscribers(topic):
+            return
+        current = _rank_snapshot(exam_type)
+        with self._lock:
+            previous = self._rank_snapshots.get(topic, {})
+            self._rank_snapshots[topic] = current
+        changed = [row for student_id, row in current.items() if previous.get(student_id) != row]
+        removed = [student_id for student_id in previous if student_id not in current]
+        if changed or removed:
+            self.publish(topic, 'ranks', {
+                'exam_type': exam_type,
+                'changed': sorted(changed, key=lambda row: row['rank']),
+                'removed': removed,
+            })
+
+
+def _rank_snapshot(exam_type):
+    # Imported here: signals imports this module at every start.
+    from .ranking import ranked_students
+
+    snapshot = {}
+    for row in ranked_students(exam_type):
+        snapshot[row['student_id']] = {
+            'rank': row['rank'],
+            'student': row['student_id'],
+            'full_name': row['student__full_name'],
+            'roll_number': row['student__roll_number'],
+            'class_batch': row['student__class_batch'],
+            'avg_score': round(row['avg_score'], 2),
+            'total_marks': row['total_marks'],
+            'num_subjects': row['num_subjects'],
+        }
+    return snapshot
+
+
+broker = EventBroker()
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from . import reference
 from .models import Student, Subject, Exam, ProgressSheet
 
 
@@ -76,6 +77,16 @@ class ProgressSheetForm(forms.ModelForm):
             'marks': forms.NumberInput(attrs={'min': 0, 'max': 100})
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The models' default managers include archived students and terms.
+        self.fields['student'].queryset = Student.objects.all()
+        self.fields['exam'].queryset = Exam.objects.all()
+        # Offered from the reference cache; the querysets still validate.
+        for name, objects in (('exam', reference.exams()), ('subject', reference.subjects())):
+            field = self.fields[name]
+            field.choices = [('', field.empty_label)] + [(obj.pk, field.label_from_instance(obj)) for obj in objects]
+
 
 class ExamForm(forms.ModelForm):
     """
@@ -83,7 +94,7 @@ class ExamForm(forms.ModelForm):
     """
     class Meta:
         model = Exam
-        fields = ['exam_type', 'name', 'date']
+        fields = ['exam_type', 'name', 'date', 'academic_year']
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'}),
         }
@@ -95,4 +106,14 @@ class SubjectForm(forms.ModelForm):
     """
     class Meta:
         model = Subject
-        fields = ['name']
\ No newline at end of file
+        fields = ['name']
+
+
+class StudentImportForm(forms.Form):
+    """
+    Form for uploading a roster CSV
+    """
+    roster = forms.FileField(
+        help_text='UTF-8 CSV with a header row: full_name, email, roll_number, class_batch, date_of_birth (YYYY-MM-DD) and optionally username.'
+    )
+    send_invites = forms.BooleanField(required=False, initial=True, label='Email set-your-password invites')
@@ -0,0 +1,203 @@
+"""
+Letter grades, grade points and GPAs from raw marks.
+
+The scheme comes from the DASHBOARD_GRADING setting:
+
+    DASHBOARD_GRADING = {
+        # (lowest mark, grade, grade points), any order
+        'BANDS': [(90, 'A+', 10), (80, 'A', 9), ..., (0, 'F', 0)],
+        # Subjects graded on their own table, by subject name
+        'SUBJECT_BANDS': {'Physical Education': [(50, 'Pass', 5), (0, 'Fail', 0)]},
+        # Credit weights by subject name; others weigh 1
+        'WEIGHTS': {'Mathematics': 2},
+    }
+
+A student's GPA for an exam is the weighted mean of their grade points,
+sum(points * weight) / sum(weight), over the subjects they have marks in.
+
+Grades are applied to a whole exam at once over its MarksMatrix, a
+vectorised lookup per subject column, and stored in ExamResult so ranking
+by GPA is a plain indexed read. The rows follow the marks: a single mark
+saved or deleted refreshes its student's row, bulk changes refresh the
+rows of the students they touched, or whole exams when they do not say
+(see signals), and the refresh_grades command rebuilds them all after the
+scheme changes.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+from django.utils import timezone
+
+from .matrix import MISSING, MarksMatrix, marks_matrix
+from .models import Exam, ExamResult, ProgressSheet
+
+# Students per query in refresh_students(), below SQLite's historical limit
+# of 999 parameters.
+STUDENT_BATCH = 500
+
+DEFAULT_BANDS = [
+    (90, 'A+', 10),
+    (80, 'A', 9),
+    (70, 'B+', 8),
+    (60, 'B', 7),
+    (50, 'C', 6),
+    (40, 'D', 5),
+    (0, 'F', 0),
+]
+
+
+class BandTable:
+    """Bands sorted by their lowest mark, as arrays for np.searchsorted"""
+
+    def __init__(self, bands):
+        bands = sorted(bands)
+        if not bands or bands[0][0] > 0:
+            raise ValueError('Grade bands must start at 0 marks.')
+        self.minimums = np.array([band[0] for band in bands])
+        self.grades = [band[1] for band in bands]
+        self.points = np.array([band[2] for band in bands], dtype=np.float64)
+
+    def band_indices(self, marks):
+        return np.searchsorted(self.minimums, marks, side='right') - 1
+
+    def grade(self, marks):
+        """(grade, points) for one mark"""
+        i = int(self.band_indices(marks))
+        return self.grades[i], float(self.points[i])
+
+
+class GradingScheme:
+
+    def __init__(self, bands=None, subject_bands=None, weights=None):
+        self.default = BandTable(bands or DEFAULT_BANDS)
+        self.subject_bands = {subject: BandTable(table) for subject, table in (subject_bands or {}).items()}
+        self.weights = dict(weights or {})
+
+    @classmethod
+    def from_settings(cls):
+        config = getattr(settings, 'DASHBOARD_GRADING', {})
+        return cls(config.get('BANDS'), config.get('SUBJECT_BANDS'), config.get('WEIGHTS'))
+
+    def bands(self):
+        """(subject or None, band table) pairs, subject tables first"""
+        return [*self.subject_bands.items(), (None, self.default)]
+
+    def table(self, subject):
+        return self.subject_bands.get(subject, self.default)
+
+    def weight(self, subject):
+        return self.weights.get(subject, 1)
+
+    def grade(self, subject, marks):
+        """(grade, points) for one mark in a subject"""
+        return self.table(subject).grade(marks)
+
+    def grade_expression(self):
+        """
+        A CASE expression for each mark's grade, to annotate a queryset of
+        ProgressSheet or ArchivedProgressSheet rows
+        """
+        whens = []
+        for subject, table in self.bands():
+            only = {'subject__name': subject} if subject is not None else {}
+            for minimum, grade in reversed(list(zip(table.minimums.tolist(), table.grades))):
+                whens.append(When(marks__gte=minimum, then=Value(grade), **only))
+        return Case(*whens, output_field=CharField())
+
+    def points(self, matrix):
+        """Grade points for every mark of a MarksMatrix, NaN where missing"""
+        points = np.full(matrix.marks.shape, np.nan)
+        present = matrix.marks != MISSING
+        for j, subject in enumerate(matrix.subjects):
+            table = self.table(subject)
+            column = matrix.marks[:, j]
+            rows = present[:, j]
+            points[rows, j] = table.points[table.band_indices(column[rows])]
+        return points
+
+    def gpas(self, matrix):
+        """Per-student GPA array for a MarksMatrix"""
+        points = self.points(matrix)
+        weights = np.array([self.weight(subject) for subject in matrix.subjects], dtype=np.float64)
+        present = ~np.isnan(points)
+        weight_sums = (present * weights).sum(axis=1)
+        weighted = np.where(present, points, 0) @ weights
+        return weighted / np.maximum(weight_sums, np.finfo(np.float64).tiny)
+
+
+def exam_results(exam_id, matrix, scheme=None):
+    """Unsaved ExamResult rows for every student in the matrix"""
+    scheme = scheme or GradingScheme.from_settings()
+    totals, counts, averages = matrix.student_scores()
+    gpas = scheme.gpas(matrix)
+    return [
+        ExamResult(
+            student_id=int(student_id), exam_id=exam_id, total_marks=int(total),
+            num_subjects=int(count), avg_score=float(average), gpa=round(float(gpa), 4),
+        )
+        for student_id, total, count, average, gpa in zip(matrix.student_ids, totals, counts, averages, gpas)
+        if count
+    ]
+
+
+def refresh_exams(exam_ids, scheme=None):
+    """
+    Rebuild the results of whole exams, each from its (cached) MarksMatrix
+    in one DELETE and one bulk INSERT; archived exams are left without any
+    """
+    scheme = scheme or GradingScheme.from_settings()
+    for exam in Exam.all_objects.filter(pk__in=list(exam_ids)):
+        results = exam_results(exam.id, marks_matrix(exam), scheme) if not exam.is_archived else []
+        with transaction.atomic():
+            ExamResult.all_objects.filter(exam=exam).delete()
+            ExamResult.all_objects.bulk_create(results, batch_size=500)
+
+
+def _students_results(exam_id, student_ids, scheme=None):
+    """Unsaved ExamResult rows of some students, from their marks"""
+    rows = list(ProgressSheet.objects.filter(exam_id=exam_id, student_id__in=student_ids).values_list(
+        'student_id', 'subject__name', 'student__class_batch', 'marks',
+    ))
+    return exam_results(exam_id, MarksMatrix.from_rows(rows), scheme) if rows else []
+
+
+def refresh_students(pairs, scheme=None):
+    """
+    Rebuild the results of (exam_id, student_id) pairs after a bulk change
+    to some of their marks: per exam and STUDENT_BATCH students, one query
+    for their marks, one DELETE and one bulk INSERT
+    """
+    scheme = scheme or GradingScheme.from_settings()
+    students = {}
+    for exam_id, student_id in pairs:
+        students.setdefault(exam_id, set()).add(student_id)
+    for exam_id, student_ids in students.items():
+        student_ids = sorted(student_ids)
+        for start in range(0, len(student_ids), STUDENT_BATCH):
+            batch = student_ids[start:start + STUDENT_BATCH]
+            results = _students_results(exam_id, batch, scheme)
+            with transaction.atomic():
+                ExamResult.all_objects.filter(exam_id=exam_id, student_id__in=batch).delete()
+                ExamResult.all_objects.bulk_create(results, batch_size=500)
+
+
+def refresh_student(exam_id, student_id, scheme=None):
+    """Rebuild one student's result after one of their marks changed"""
+    results = _students_results(exam_id, [student_id], scheme)
+    if not results:
+        ExamResult.all_objects.filter(exam_id=exam_id, student_id=student_id).delete()
+        return
+    result = results[0]
+    fields = {name: getattr(result, name) for name in ('total_marks', 'num_subjects', 'avg_score', 'gpa')}
+    if not ExamResult.all_objects.filter(exam_id=exam_id, student_id=student_id).update(
+        updated_at=timezone.now(), **fields
+    ):
+        result.save()
+
+
+def refresh_all(scheme=None):
+    """Rebuild the results of every open exam, e.g. after the scheme changed"""
+    exam_ids = list(Exam.objects.values_list('pk', flat=True))
+    refresh_exams(exam_ids, scheme)
+    return len(exam_ids)
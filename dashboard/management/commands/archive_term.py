@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.archival import archive_term
+from dashboard.models import Exam
+from dashboard.retention import BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Move a closed academic year's marks from the progress sheet to the archive table, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('academic_year', help='Academic year to archive, e.g. 2025 or 2025-26')
+        parser.add_argument(
+            '--exam-type', action='append', choices=[value for value, label in Exam.EXAM_TYPES], dest='exam_types',
+            help='Only archive exams of this type (may be repeated)',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows moved per transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        if not Exam.all_objects.filter(academic_year=options['academic_year']).exists():
+            raise CommandError(f"No exams in academic year {options['academic_year']}.")
+        report = archive_term(
+            options['academic_year'],
+            exam_types=options['exam_types'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {report.exams} exams, moving {report.moved} marks '
+            f'in {report.batches} batches ({report.seconds:.2f}s)'
+        ))
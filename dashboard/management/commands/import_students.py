@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.enrollment import BATCH_SIZE, import_roster, read_roster
+
+
+class Command(BaseCommand):
+    help = 'Enroll students from a roster CSV (full_name, email, roll_number, class_batch, date_of_birth[, username])'
+
+    def add_arguments(self, parser):
+        parser.add_argument('roster', help='Path to the roster CSV (UTF-8)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per chunk and transaction')
+        parser.add_argument('--no-invites', action='store_true', help='Do not email set-your-password invites')
+        parser.add_argument('--base-url', help='Site URL for invite links (default: DASHBOARD_BASE_URL)')
+
+    def handle(self, *args, **options):
+        try:
+            roster = open(options['roster'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'Cannot open roster: {e}')
+        with roster:
+            report = import_roster(
+                read_roster(roster),
+                batch_size=options['batch_size'],
+                invite=not options['no_invites'],
+                base_url=options['base_url'],
+            )
+
+        for line, message in report.errors:
+            self.stdout.write(f'Line {line}: {message}')
+        if report.skipped > len(report.errors):
+            self.stdout.write(f'... and {report.skipped - len(report.errors)} more skipped rows')
+        if report.invites_failed:
+            self.stdout.write(self.style.WARNING(f'Could not send {report.invites_failed} invite(s)'))
+        summary = (
+            f'Enrolled {report.created} students, skipped {report.skipped}, '
+            f'sent {report.invites_sent} invites in {report.seconds:.2f}s'
+        )
+        if report.aborted:
+            raise CommandError(f'{report.aborted} Stopped early. {summary}')
+        self.stdout.write(self.style.SUCCESS(summary))
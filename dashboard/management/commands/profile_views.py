@@ -0,0 +1,108 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from dashboard.perf.profiler import DEFAULT_URLS, profile_urls, read_urls, write_report
+from dashboard.perf.synthetic import EXAM_TYPES, seed_synthetic_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay GET requests through the test client under a profiler and report hot functions, '
+        'SQL by fingerprint, duplicate queries and query plans'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url_file', nargs='?',
+            help='File of paths (one per line) or an access log; defaults to the main pages',
+        )
+        parser.add_argument('--url', action='append', dest='urls', default=[], help='A path to replay (may be repeated)')
+        parser.add_argument('--user', help='Username to log in as; defaults to the first superuser')
+        parser.add_argument(
+            '--synthetic', type=int, metavar='STUDENTS',
+            help='Replay against a throwaway database seeded with this many students instead of the real one',
+        )
+        parser.add_argument('--repeat', type=int, default=1, help='Times to replay the list')
+        parser.add_argument('--profiler', choices=['cprofile', 'pyinstrument'], default='cprofile')
+        parser.add_argument('--no-explain', action='store_false', dest='explain', help='Skip EXPLAIN')
+        parser.add_argument('--top', type=int, default=25, help='Statements and functions to report')
+        parser.add_argument('--output', help='Write the report here: .html for HTML, anything else for JSON')
+
+    def handle(self, *args, **options):
+        urls = list(options['urls'])
+        if options['url_file']:
+            with open(options['url_file'], encoding='utf-8') as file:
+                urls.extend(read_urls(file))
+        urls = urls or DEFAULT_URLS
+        if options['profiler'] == 'pyinstrument':
+            try:
+                import pyinstrument  # noqa: F401
+            except ImportError:
+                raise CommandError('--profiler pyinstrument needs `pip install pyinstrument`.')
+
+        # Lets the test client in (ALLOWED_HOSTS) and keeps mail in memory.
+        try:
+            setup_test_environment()
+            set_up = True
+        except RuntimeError:
+            # Already set up: running under the test runner.
+            set_up = False
+        old_name = None
+        try:
+            if options['synthetic']:
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                marks = seed_synthetic_data(options['synthetic'], num_subjects=6, exam_types=EXAM_TYPES[:2])
+                self.stdout.write(f"Seeded {options['synthetic']} students and {marks} marks")
+            # Logging in and the requests write sessions and last_login;
+            # roll them back so the real database is left as it was.
+            with transaction.atomic():
+                report = profile_urls(
+                    urls,
+                    user=self.get_user(options['user'], create=bool(options['synthetic'])),
+                    repeat=options['repeat'],
+                    profiler=options['profiler'],
+                    explain_queries=options['explain'],
+                    top=options['top'],
+                )
+                transaction.set_rollback(True)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            if set_up:
+                teardown_test_environment()
+
+        self.write_summary(report)
+        if options['output']:
+            write_report(report, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def get_user(self, username, create):
+        if create:
+            return User.objects.get_or_create(
+                username=username or 'profiler', defaults={'is_superuser': True, 'is_staff': True},
+            )[0]
+        users = User.objects.filter(is_active=True)
+        user = users.filter(username=username).first() if username else users.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError(f'No active user {username!r}.' if username else 'No superuser to log in as; pass --user.')
+        return user
+
+    def write_summary(self, report):
+        self.stdout.write('\nRequests (ms, SQL ms, queries):')
+        for request in sorted(report['requests'], key=lambda request: request['ms'], reverse=True):
+            self.stdout.write(
+                f"  {request['ms']:9.2f} {request['sql_ms']:9.2f} {request['queries']:5d}  {request['status']} {request['url']}"
+            )
+        self.stdout.write('\nStatements by total time:')
+        for statement in report['statements'][:10]:
+            scans = f"  [full scan: {'; '.join(statement['full_scans'])}]" if statement['full_scans'] else ''
+            self.stdout.write(f"  {statement['ms']:9.2f} ms x{statement['count']:<5d} {statement['fingerprint'][:120]}{scans}")
+        if report['duplicates']:
+            self.stdout.write(self.style.WARNING('\nDuplicate queries within a request:'))
+            for duplicate in report['duplicates'][:10]:
+                self.stdout.write(f"  x{duplicate['count']:<5d} {duplicate['url']}  {duplicate['fingerprint'][:100]}")
+        if report['functions']:
+            self.stdout.write('\nHot functions (own ms):')
+            for function in report['functions'][:10]:
+                self.stdout.write(f"  {function['own_ms']:9.2f} {function['calls']:8d}  {function['function']}")
@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.retention import BATCH_SIZE, RETENTION, purge_archived_students
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete archived students, their marks and accounts, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=RETENTION.days, metavar='DAYS',
+            help='Only purge students archived at least this many days ago',
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows per DELETE statement')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--older-than must be at least 0 and --batch-size at least 1.')
+        report = purge_archived_students(
+            older_than=datetime.timedelta(days=options['older_than']),
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Purged {report.students} students, {report.marks} marks and {report.users} accounts '
+            f'in {report.batches} batches ({report.seconds:.2f}s)'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the graded results (GPAs) of every open exam, e.g. after DASHBOARD_GRADING changes'
+
+    def handle(self, *args, **options):
+        from dashboard.grading import refresh_all
+
+        exams = refresh_all()
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the results of {exams} exams'))
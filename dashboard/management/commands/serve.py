@@ -0,0 +1,49 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.server import serve
+
+
+class Command(BaseCommand):
+    help = (
+        'Serve the site with pre-forked worker processes (reload with SIGHUP, stop with SIGTERM); '
+        'see dashboard/server.py'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bind', default='127.0.0.1:8000', help='host:port to listen on')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1, help='Worker processes (default: one per CPU)',
+        )
+        parser.add_argument('--threads', type=int, default=4, help='Requests served at once by each worker')
+        parser.add_argument(
+            '--max-requests', type=int, default=0, help='Replace a worker after this many requests (0: never)',
+        )
+        parser.add_argument(
+            '--max-requests-jitter', type=int, default=0,
+            help='Add up to this many requests to --max-requests per worker, so they restart apart',
+        )
+        parser.add_argument(
+            '--graceful-timeout', type=float, default=30,
+            help='Seconds workers get to finish their requests on shutdown',
+        )
+
+    def handle(self, *args, **options):
+        for option in ('workers', 'threads'):
+            if options[option] < 1:
+                raise CommandError(f'--{option} must be at least 1.')
+        if ':' not in options['bind']:
+            raise CommandError('--bind must be host:port.')
+        self.stdout.write(
+            f"Serving on http://{options['bind']}/ with {options['workers']} workers "
+            f"of {options['threads']} threads (pid {os.getpid()})"
+        )
+        self.stdout.flush()
+        serve(
+            options['bind'],
+            workers=options['workers'],
+            threads=options['threads'],
+            max_requests=options['max_requests'],
+            max_requests_jitter=options['max_requests_jitter'],
+            graceful_timeout=options['graceful_timeout'],
+        )
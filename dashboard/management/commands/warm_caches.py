@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from dashboard.models import Exam
+from dashboard.warmup import warm_caches
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the cached marks matrices, statistics and trends ahead of the first requests; '
+        'other processes share them only with a shared cache backend'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--exam-type', action='append', choices=[value for value, label in Exam.EXAM_TYPES], dest='exam_types',
+            help='Only warm exams of this type (may be repeated); the trends are skipped',
+        )
+        parser.add_argument('--threads', type=int, help='Artifacts built at once (default: DASHBOARD_WARMUP)')
+        parser.add_argument('--every', type=float, metavar='SECONDS', help='Keep warming at this interval')
+
+    def handle(self, *args, **options):
+        if options['threads'] is not None and options['threads'] < 1:
+            raise CommandError('--threads must be at least 1.')
+        while True:
+            started = time.perf_counter()
+            timings = warm_caches(options['exam_types'], options['threads'])
+            for timing in timings:
+                line = f"  {timing['artifact']:<20} {timing['seconds'] * 1000:8.1f} ms"
+                if timing['error']:
+                    self.stdout.write(self.style.ERROR(f"{line}  {timing['error']}"))
+                else:
+                    self.stdout.write(line)
+            failed = sum(1 for timing in timings if timing['error'])
+            summary = f'Warmed {len(timings) - failed} cached artifacts in {time.perf_counter() - started:.2f}s'
+            self.stdout.write(self.style.ERROR(f'{summary}, {failed} failed') if failed else self.style.SUCCESS(summary))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,129 @@
+"""
+Compact per-exam marks matrix.
+
+For one exam, marks form a dense students x subjects grid of integers
+0..100, so they are held as a uint8 NumPy matrix (MISSING where a student
+has no mark) with sorted student ids for rows and subject names for
+columns: about 1 byte per mark plus a few bytes per student, where model
+instances cost kilobytes each. The matrix is built from one values_list
+query and cached per exam and data version, so repeated analytics and
+leaderboard reads skip the marks table entirely.
+"""
+from operator import itemgetter
+
+import numpy as np
+from django.core.cache import cache
+
+from . import metrics, versioning
+from .analytics import ExamMarks, exam_statistics, factorize, pass_mark
+from .models import ProgressSheet
+
+MISSING = 255  # marks are 0..100, so this never collides
+CACHE_TIMEOUT = 60 * 60
+
+
+class MarksMatrix:
+    """
+    marks[i, j] is the mark of student_ids[i] in subjects[j]; class_batches
+    [batch_codes[i]] is the student's class/batch
+    """
+    def __init__(self, student_ids, subjects, batch_codes, class_batches, marks):
+        self.student_ids = student_ids
+        self.subjects = subjects
+        self.batch_codes = batch_codes
+        self.class_batches = class_batches
+        self.marks = marks
+
+    @classmethod
+    def for_exam(cls, exam):
+        rows = ProgressSheet.objects.filter(exam=exam).values_list(
+            'student_id', 'subject__name', 'student__class_batch', 'marks',
+        )
+        return cls.from_rows(list(rows))
+
+    @classmethod
+    def from_rows(cls, rows):
+        student_ids, subjects, class_batches, marks = (list(map(itemgetter(i), rows)) for i in range(4))
+        # AutoField ids are 32-bit.
+        student_ids, row_codes = np.unique(np.asarray(student_ids, dtype=np.int32), return_inverse=True)
+        subject_labels = sorted(set(subjects))
+        column = {subject: i for i, subject in enumerate(subject_labels)}
+        column_codes = np.fromiter((column[subject] for subject in subjects), dtype=np.int64, count=len(subjects))
+        row_batch_codes, batch_labels = factorize(class_batches)
+        batch_codes = np.zeros(len(student_ids), dtype=np.uint16)
+        batch_codes[row_codes] = row_batch_codes
+        matrix = np.full((len(student_ids), len(subject_labels)), MISSING, dtype=np.uint8)
+        matrix[row_codes, column_codes] = marks
+        return cls(student_ids, subject_labels, batch_codes, batch_labels, matrix)
+
+    def __len__(self):
+        """Number of marks held"""
+        return int(np.count_nonzero(self.marks != MISSING))
+
+    @property
+    def nbytes(self):
+        return self.marks.nbytes + self.student_ids.nbytes + self.batch_codes.nbytes
+
+    def row(self, student_id):
+        """The student's row index, or None"""
+        i = int(np.searchsorted(self.student_ids, student_id))
+        return i if i < len(self.student_ids) and self.student_ids[i] == student_id else None
+
+    def exam_marks(self):
+        """The marks as ExamMarks columns, for analytics.exam_statistics()"""
+        present = self.marks != MISSING
+        rows, columns = np.nonzero(present)
+        return ExamMarks(
+            self.student_ids[rows].astype(np.int64),
+            columns,
+            self.subjects,
+            self.batch_codes[rows].astype(np.int64),
+            self.class_batches,
+            self.marks[present].astype(np.int64),
+        )
+
+    def student_scores(self):
+        """Per-student (total, number of subjects, average) arrays"""
+        present = self.marks != MISSING
+        totals = np.where(present, self.marks, 0).sum(axis=1, dtype=np.int64)
+        counts = present.sum(axis=1)
+        return totals, counts, totals / np.maximum(counts, 1)
+
+    def top(self, k):
+        """
+        Row indices of the k best averages and every student level with the
+        k-th, best first
+        """
+        averages = self.student_scores()[2]
+        if k < len(averages):
+            # argpartition finds the k-th best without sorting the cohort.
+            cutoff = averages[np.argpartition(-averages, k - 1)[k - 1]]
+            selected = np.flatnonzero(averages >= cutoff)
+        else:
+            selected = np.arange(len(averages))
+        return selected[np.argsort(-averages[selected], kind='stable')]
+
+
+def _cache_key(exam, artifact='matrix'):
+    versions = versioning.get_versions(versioning.MARKS, versioning.STUDENTS)
+    return f"dashboard:{artifact}:{exam.id}:{versions['marks']}:{versions['students']}"
+
+
+def marks_matrix(exam):
+    """The exam's MarksMatrix, cached until marks or students change"""
+    key = _cache_key(exam)
+    matrix = metrics.cache_lookup('matrix', cache.get(key))
+    if matrix is None:
+        matrix = MarksMatrix.for_exam(exam)
+        cache.set(key, matrix, versioning.cache_timeout(CACHE_TIMEOUT))
+    return matrix
+
+
+def statistics_for(exam, include_z_scores=False):
+    """exam_statistics() of the exam, cached like its MarksMatrix"""
+    key = _cache_key(exam, f"statistics:{pass_mark()}:{'z' if include_z_scores else ''}")
+    statistics = metrics.cache_lookup('statistics', cache.get(key))
+    if statistics is None:
+        statistics = exam_statistics(marks_matrix(exam).exam_marks(), include_z_scores=include_z_scores)
+        cache.set(key, statistics, versioning.cache_timeout(CACHE_TIMEOUT))
+    return statistics
@@ -0,0 +1,450 @@
+"""
+Prometheus metrics.
+
+Counters, gauges and histograms live in an in-process registry guarded by
+one lock. /metrics serves them in the Prometheus text format (0.0.4).
+
+With several worker processes, set DASHBOARD_METRICS_DIR to a directory
+they share: each process writes a snapshot of its registry there (at most
+once per FLUSH_INTERVAL, after a request, and at exit) and /metrics adds up
+the snapshots of every process, so any worker can answer the scrape.
+Snapshot files are named by pid and a token drawn by each process, so a
+process reusing a pid does not overwrite the snapshot of the one before.
+At each scrape the snapshots of processes that have exited are folded into
+one archive file and deleted: their counters and histograms are kept, so
+totals do not go backwards when a worker is recycled, and their gauges
+are dropped.
+"""
+import atexit
+import glob
+import hmac
+import json
+import math
+import os
+import secrets
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds between snapshot writes of one process.
+FLUSH_INTERVAL = 1.0
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# In DASHBOARD_METRICS_DIR: the values of exited processes, and the lock
+# taken to merge them.
+ARCHIVE = 'archive.json'
+LOCK = '.lock'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.registry.values[self.name][key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            values[key] = values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            values = self.registry.values[self.name]
+            # Per-bucket (not cumulative) counts, then sum and count.
+            state = values.get(key)
+            if state is None:
+                state = values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}
+        self._flushed = 0.0
+        self._pid = self._token = None
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics[metric.name] = metric
+        self.values[metric.name] = {}
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _identity(self):
+        pid = os.getpid()
+        if pid != self._pid:
+            # First use in this process (forked workers inherit the registry).
+            self._pid, self._token = pid, secrets.token_hex(4)
+        return pid, self._token
+
+    def snapshot(self):
+        """This process's values as JSON-ready data"""
+        pid, token = self._identity()
+        with self.lock:
+            return {
+                'pid': pid,
+                'token': token,
+                'values': {
+                    name: [[list(key), value] for key, value in values.items()]
+                    for name, values in self.values.items()
+                },
+            }
+
+    def clear(self):
+        with self.lock:
+            for values in self.values.values():
+                values.clear()
+
+    def flush(self, force=False):
+        """Write this process's snapshot to DASHBOARD_METRICS_DIR, if set"""
+        directory = metrics_dir()
+        now = time.monotonic()
+        if directory is None or (not force and now - self._flushed < FLUSH_INTERVAL):
+            return
+        self._flushed = now
+        write_snapshot(directory, self.snapshot())
+
+    def collect(self):
+        """{name: {labels: value}} added up over every process"""
+        own = self.snapshot()
+        merged = {name: {} for name in self.metrics}
+        self._merge(merged, own['values'])
+        directory = metrics_dir()
+        if directory is None:
+            return merged
+        with _locked(directory):
+            self._compact(directory, snapshot_name(own))
+            archive = _read_json(os.path.join(directory, ARCHIVE))
+            if archive is not None:
+                self._merge(merged, archive['values'])
+            for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+                snapshot = _read_json(path)
+                if snapshot is not None and os.path.basename(path) != snapshot_name(own):
+                    self._merge(merged, snapshot['values'])
+        return merged
+
+    def _merge(self, merged, values, gauges=True):
+        for name, samples in values.items():
+            metric = self.metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not gauges):
+                continue
+            target = merged[name]
+            for key, value in samples:
+                key = tuple(key)
+                if metric.kind == 'histogram':
+                    previous = target.get(key)
+                    target[key] = value if previous is None else [a + b for a, b in zip(previous, value)]
+                else:
+                    target[key] = target.get(key, 0) + value
+
+    def _compact(self, directory, own_name):
+        """Fold the snapshots of exited processes into the archive; with the lock held"""
+        by_pid = {}
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            pid = os.path.basename(path)[len('metrics-'):].split('-', 1)[0]
+            try:
+                by_pid.setdefault(int(pid), []).append((os.path.getmtime(path), path))
+            except (ValueError, OSError):
+                continue
+        exited = []
+        for pid, files in by_pid.items():
+            # A pid runs one process at a time: only its latest file can
+            # belong to a live process.
+            files.sort()
+            if pid == os.getpid():
+                exited.extend(path for _, path in files if os.path.basename(path) != own_name)
+                continue
+            exited.extend(path for _, path in files[:-1])
+            if not _alive(pid):
+                exited.append(files[-1][1])
+        if not exited:
+            return
+        archived = {name: {} for name in self.metrics}
+        archive = _read_json(os.path.join(directory, ARCHIVE))
+        if archive is not None:
+            self._merge(archived, archive['values'])
+        for path in exited:
+            snapshot = _read_json(path)
+            if snapshot is not None:
+                self._merge(archived, snapshot['values'], gauges=False)
+        _write_json(directory, ARCHIVE, {'values': {
+            name: [[list(key), value] for key, value in values.items()] for name, values in archived.items()
+        }})
+        for path in exited:
+            os.remove(path)
+
+    def exposition(self):
+        """Every metric in the Prometheus text format"""
+        merged = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {_escape_help(metric.documentation)}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(merged[name].items()):
+                labels = list(zip(metric.labelnames, key))
+                if metric.kind != 'histogram':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, math.inf), value):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(labels + [("le", le)])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(value[-2])}')
+                lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')) for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _escape_help(text):
+    return text.replace('\\', r'\\').replace('\n', r'\n')
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def metrics_dir():
+    return getattr(settings, 'DASHBOARD_METRICS_DIR', None)
+
+
+def snapshot_name(snapshot):
+    return f"metrics-{snapshot['pid']}-{snapshot['token']}.json"
+
+
+def write_snapshot(directory, snapshot):
+    """Replace the process's snapshot file atomically"""
+    _write_json(directory, snapshot_name(snapshot), snapshot)
+
+
+def _write_json(directory, name, data):
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(dir=directory, prefix='.metrics-', suffix='.tmp')
+    with os.fdopen(fd, 'w') as file:
+        json.dump(data, file)
+    os.replace(path, os.path.join(directory, name))
+
+
+def _read_json(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        # Missing, or removed while listing.
+        return None
+
+
+@contextmanager
+def _locked(directory):
+    # Imported here: fcntl is Unix-only, and this module is imported at
+    # every start.
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+        import msvcrt
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK), 'a+') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        else:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+registry = Registry()
+atexit.register(registry.flush, force=True)
+
+REQUEST_LATENCY = registry.histogram(
+    'dashboard_request_duration_seconds', 'Time to respond to a request, by route', ['route', 'method'],
+)
+REQUESTS = registry.counter(
+    'dashboard_requests_total', 'Responses by route and status code', ['route', 'method', 'status'],
+)
+REQUEST_QUERIES = registry.histogram(
+    'dashboard_db_queries_per_request', 'Database queries run by one request, by route', ['route'],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_QUERIES = registry.counter('dashboard_db_queries_total', 'Database queries run, by route', ['route'])
+DB_SECONDS = registry.counter(
+    'dashboard_db_query_seconds_total', 'Time spent in database queries, by route', ['route'],
+)
+CACHE_REQUESTS = registry.counter(
+    'dashboard_cache_requests_total', 'Reads of cached data by cache and result (hit or miss)', ['cache', 'result'],
+)
+EMAIL_QUEUE = registry.gauge('dashboard_email_queue_depth', 'Emails handed to the mail backend and not yet sent')
+OTP_SEND_LATENCY = registry.histogram(
+    'dashboard_otp_send_duration_seconds', 'Time to send a verification OTP email, by result', ['result'],
+)
+WARMUP_SECONDS = registry.histogram(
+    'dashboard_cache_warmup_seconds', 'Time to warm a cached artifact (exam or trends)', ['artifact'],
+)
+
+
+class QueryTimer:
+    """A request's query count and time, added to from any thread"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.seconds += seconds
+            self.count += 1
+
+
+# The QueryTimer of the request being served (set by MetricsMiddleware).
+# Context variables follow the async views' queries onto their worker
+# threads, since sync_to_async copies the context.
+request_queries = ContextVar('dashboard_request_queries', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """execute_wrapper adding each statement to the request's QueryTimer"""
+    queries = request_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.add(time.perf_counter() - start)
+
+
+def install_query_timer(connection, **kwargs):
+    """Wrap a connection with time_query; a connection_created receiver"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+def cache_lookup(cache_name, value):
+    """Count a cache read as a hit or a miss and return the value"""
+    CACHE_REQUESTS.inc(cache=cache_name, result='miss' if value is None else 'hit')
+    return value
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; with DASHBOARD_METRICS_TOKEN set it needs
+    an Authorization: Bearer <token> header
+    """
+    token = getattr(settings, 'DASHBOARD_METRICS_TOKEN', None)
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and not hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.exposition(), content_type=CONTENT_TYPE)
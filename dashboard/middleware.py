@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection
+
+from . import metrics
+from .writebuffer import PENDING_WRITES, await_own_writes
+
+
+class ASGIURLConfMiddleware:
+    """
+    Route requests served by the ASGI application through
+    settings.ASYNC_ROOT_URLCONF, which swaps in the async views
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.urlconf = getattr(settings, 'ASYNC_ROOT_URLCONF', None)
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark this instance as a coroutine function for the handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        self.process_request(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        self.process_request(request)
+        return await self.get_response(request)
+
+    def process_request(self, request):
+        if self.urlconf and isinstance(request, ASGIRequest):
+            request.urlconf = self.urlconf
+
+
+class WriteBufferMiddleware:
+    """
+    Read-your-writes for buffered mark entry: a session's first read after
+    writing waits until its writes are in the database
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if self.has_pending_writes(request):
+            await_own_writes(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if await sync_to_async(self.has_pending_writes)(request):
+            await sync_to_async(await_own_writes)(request)
+        return await self.get_response(request)
+
+    def has_pending_writes(self, request):
+        return request.method in ('GET', 'HEAD') and PENDING_WRITES in request.session
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency, status and database queries by route
+    (the URL pattern, so student ids do not each get a series). Queries are
+    timed on every connection (see metrics.time_query), so those the async
+    views run on worker threads count toward their request as well.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        # A connection opened before the app was ready.
+        metrics.install_query_timer(connection)
+        start = time.perf_counter()
+        queries = metrics.QueryTimer()
+        token = metrics.request_queries.set(queries)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        queries = metrics.QueryTimer()
+        token = metrics.request_queries.set(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.request_queries.reset(token)
+        self.record(request, response, time.perf_counter() - start, queries)
+        return response
+
+    def record(self, request, response, seconds, queries):
+        match = request.resolver_match
+        route = '/' + match.route if match is not None and match.route else 'unmatched'
+        metrics.REQUEST_LATENCY.observe(seconds, route=route, method=request.method)
+        metrics.REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        metrics.REQUEST_QUERIES.observe(queries.count, route=route)
+        metrics.DB_QUERIES.inc(queries.count, route=route)
+        metrics.DB_SECONDS.inc(queries.seconds, route=route)
+        metrics.registry.flush()
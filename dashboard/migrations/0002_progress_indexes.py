@@ -0,0 +1,25 @@
+# Generated by Django 3.0 on 2026-10-19 11:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='progresssheet',
+            index=models.Index(fields=['exam', 'updated_at'], name='dashboard_p_exam_id_098765_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progresssheet',
+            index=models.Index(fields=['updated_at'], name='dashboard_p_updated_073496_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['updated_at'], name='dashboard_s_updated_4e7224_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_progress_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['full_name'], name='dashboard_s_full_na_58063d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['class_batch'], name='dashboard_s_class_b_286b64_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['created_at'], name='dashboard_s_created_be66d3_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_student_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='progresssheet',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelOptions(
+            name='student',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='progresssheet',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='student',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='is_active',
+            field=models.BooleanField(default=True),
+        ),
+    ]
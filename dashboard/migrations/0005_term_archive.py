@@ -0,0 +1,91 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.manager
+
+
+def fill_academic_year(apps, schema_editor):
+    from dashboard.models import academic_year_for
+
+    Exam = apps.get_model('dashboard', 'Exam')
+    for exam in Exam._default_manager.filter(academic_year=''):
+        exam.academic_year = academic_year_for(exam.date)
+        exam.save(update_fields=['academic_year'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0004_student_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedProgressSheet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marks', models.IntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='exam',
+            options={'default_manager_name': 'all_objects'},
+        ),
+        migrations.AlterModelManagers(
+            name='exam',
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='academic_year',
+            field=models.CharField(blank=True, help_text='e.g. 2026 or 2026-27; worked out from the date if left blank', max_length=9),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='is_archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_academic_year, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='exam',
+            name='exam_type',
+            field=models.CharField(choices=[('quarterly', 'Quarterly'), ('midterm', 'Midterm'), ('model', 'Model'), ('end_term', 'End-Term')], max_length=20),
+        ),
+        migrations.AlterUniqueTogether(
+            name='exam',
+            unique_together={('academic_year', 'exam_type')},
+        ),
+        migrations.AddConstraint(
+            model_name='exam',
+            constraint=models.UniqueConstraint(condition=models.Q(is_archived=False), fields=('exam_type',), name='dashboard_exam_one_open_per_type'),
+        ),
+        migrations.AddField(
+            model_name='archivedprogresssheet',
+            name='exam',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.exam'),
+        ),
+        migrations.AddField(
+            model_name='archivedprogresssheet',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.student'),
+        ),
+        migrations.AddField(
+            model_name='archivedprogresssheet',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.subject'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedprogresssheet',
+            index=models.Index(fields=['exam', 'student'], name='dashboard_a_exam_id_be2001_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='archivedprogresssheet',
+            unique_together={('student', 'exam', 'subject')},
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 3.1.14 on 2026-10-19 11:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0005_term_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamCompleteness',
+            fields=[
+                ('exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='dashboard.exam')),
+                ('entered', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.1.14 on 2026-10-19 12:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0006_exam_completeness'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_marks', models.PositiveIntegerField()),
+                ('num_subjects', models.PositiveSmallIntegerField()),
+                ('avg_score', models.FloatField()),
+                ('gpa', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.exam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='dashboard.student')),
+            ],
+            options={
+                'default_manager_name': 'all_objects',
+            },
+            managers=[
+                ('all_objects', django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='examresult',
+            index=models.Index(fields=['exam', '-gpa'], name='dashboard_e_exam_id_c2cb33_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='examresult',
+            unique_together={('student', 'exam')},
+        ),
+    ]
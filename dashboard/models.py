@@ -1,38 +1,138 @@
+from django.conf import settings
 from django.db import models
+from django.db.models import Count
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db import transaction
+from django.utils import timezone
+
+from . import versioning
+
+
+class StudentQuerySet(models.QuerySet):
+
+    def archive(self):
+        """
+        Soft-delete the students with a few UPDATEs instead of loading every
+        mark to cascade. Their marks drop out of rankings and statistics at
+        once and are purged later by the purge_archived_students command.
+        """
+        return self._set_active(False)
+
+    def restore(self):
+        """Undo archive() for students whose marks have not been purged yet"""
+        return self._set_active(True)
+
+    def _set_active(self, active):
+        from . import completeness, grading
+        from .signals import marks_shown_or_hidden
+
+        now = timezone.now()
+        # Only students changing state move the counters.
+        changing = self.filter(is_active=not active)
+        selected = changing.values('pk')
+        marks = ProgressSheet.all_objects.filter(student__in=selected, exam__is_archived=False).order_by()
+        counts = dict(marks.values_list('exam_id').annotate(entered=Count('id')))
+        restored = list(marks.values_list('exam_id', 'student_id').distinct()) if active and counts else []
+        with transaction.atomic(using=self.db):
+            # Archived students cannot log in. Users go first: archiving
+            # changes which rows an active-only queryset selects.
+            User.objects.filter(student__in=selected).update(is_active=active)
+            updated = changing.update(is_active=active, archived_at=None if active else now, updated_at=now)
+            for exam_id, entered in counts.items():
+                completeness.marks_entered(exam_id, entered if active else -entered)
+        versioning.bump_version(versioning.STUDENTS)
+        # ExamResult.objects hides archived students' results, so archiving
+        # leaves them be; a whole-exam rebuild meanwhile drops them, so
+        # restoring rebuilds the restored students' own.
+        if restored:
+            grading.refresh_students(restored)
+        marks_shown_or_hidden(counts)
+        return updated
+
+
+class ActiveStudentManager(models.Manager.from_queryset(StudentQuerySet)):
+    """
+    Students who have not been archived
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_active=True)
+
+
+def academic_year_for(date):
+    """
+    Label of the academic year a date falls in: '2026' for calendar years,
+    '2026-27' when DASHBOARD_ACADEMIC_YEAR_START_MONTH is later than January
+    """
+    start_month = getattr(settings, 'DASHBOARD_ACADEMIC_YEAR_START_MONTH', 1)
+    if start_month == 1:
+        return str(date.year)
+    start = date.year if date.month >= start_month else date.year - 1
+    return f'{start}-{(start + 1) % 100:02d}'
+
+
+class CurrentExamManager(models.Manager):
+    """
+    Exams of terms that have not been archived
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(is_archived=False)
+
+
+class ActiveProgressManager(models.Manager):
+    """
+    Marks of students who have not been archived, in terms that have not
+    been archived
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(student__is_active=True, exam__is_archived=False)
+
 
-# # Create your models here.
-# from django.db import models
-# from django.contrib.auth.models import User
-#
 class Student(models.Model):
-    user = models.OneToOneField(User, on_delete=models.CASCADE)
+    """
+    Model for storing student information
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
     full_name = models.CharField(max_length=100)
-    roll_number = models.CharField(max_length=10, unique=True)
-    class_batch = models.CharField(max_length=50)
+    email = models.EmailField(unique=True)
+    roll_number = models.CharField(max_length=20, unique=True)
+    class_batch = models.CharField(max_length=50, verbose_name="Class/Batch")
     date_of_birth = models.DateField()
+    is_verified = models.BooleanField(default=False)
+    otp = models.CharField(max_length=6, blank=True, null=True)
+    is_active = models.BooleanField(default=True)
+    archived_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Application code reads active students through `objects`; the
+    # unfiltered default manager keeps uniqueness checks, the admin and
+    # related lookups seeing archived rows too.
+    all_objects = StudentQuerySet.as_manager()
+    objects = ActiveStudentManager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        indexes = [
+            models.Index(fields=['updated_at']),
+            # Admin ordering and list filters.
+            models.Index(fields=['full_name']),
+            models.Index(fields=['class_batch']),
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return self.full_name
 
-# class Student(models.Model):
-#     """
-#     Model for storing student information
-#     """
-#     user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True)
-#     full_name = models.CharField(max_length=100)
-#     email = models.EmailField(unique=True)
-#     roll_number = models.CharField(max_length=20, unique=True)
-#     class_batch = models.CharField(max_length=50, verbose_name="Class/Batch")
-#     date_of_birth = models.DateField()
-#     is_verified = models.BooleanField(default=False)
-#     otp = models.CharField(max_length=6, blank=True, null=True)
-#     created_at = models.DateTimeField(auto_now_add=True)
-#     updated_at = models.DateTimeField(auto_now=True)
-
-    # def __str__(self):
-    #     return self.full_name
+    def archive(self):
+        """Soft-delete the student; see StudentQuerySet.archive()"""
+        Student.all_objects.filter(pk=self.pk).archive()
+        self.refresh_from_db(fields=['is_active', 'archived_at', 'updated_at'])
+
+    def restore(self):
+        Student.all_objects.filter(pk=self.pk).restore()
+        self.refresh_from_db(fields=['is_active', 'archived_at', 'updated_at'])
 
 class Subject(models.Model):
     """
@@ -54,13 +154,43 @@ class Exam(models.Model):
         ('end_term', 'End-Term'),
     ]
     
-    exam_type = models.CharField(max_length=20, choices=EXAM_TYPES, unique=True)
+    exam_type = models.CharField(max_length=20, choices=EXAM_TYPES)
     name = models.CharField(max_length=50)
     date = models.DateField()
+    academic_year = models.CharField(max_length=9, blank=True, help_text='e.g. 2026 or 2026-27; worked out from the date if left blank')
+    # Archived exams have had their marks moved to ArchivedProgressSheet.
+    is_archived = models.BooleanField(default=False)
+
+    all_objects = models.Manager()
+    objects = CurrentExamManager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        unique_together = ('academic_year', 'exam_type')
+        constraints = [
+            # Exams are looked up by type throughout; only the current
+            # term's exam of each type may be open. MySQL ignores conditional
+            # constraints, so clean() (model forms, the admin) and seeding,
+            # which skips types already open, check it as well.
+            models.UniqueConstraint(
+                fields=['exam_type'], condition=models.Q(is_archived=False), name='dashboard_exam_one_open_per_type',
+            ),
+        ]
     
     def __str__(self):
         return self.name
 
+    def clean(self):
+        if not self.is_archived and Exam.objects.filter(exam_type=self.exam_type).exclude(pk=self.pk).exists():
+            raise ValidationError({
+                'exam_type': 'This term already has an exam of this type. Archive the previous academic year first.',
+            })
+
+    def save(self, *args, **kwargs):
+        if not self.academic_year:
+            self.academic_year = academic_year_for(self.date)
+        super().save(*args, **kwargs)
+
 class ProgressSheet(models.Model):
     """
     Model for storing student progress/marks for each exam
@@ -73,9 +203,80 @@ class ProgressSheet(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    all_objects = models.Manager()
+    objects = ActiveProgressManager()
     
     class Meta:
+        default_manager_name = 'all_objects'
         unique_together = ('student', 'exam', 'subject')
+        indexes = [
+            models.Index(fields=['exam', 'updated_at']),
+            models.Index(fields=['updated_at']),
+        ]
     
     def __str__(self):
         return f"{self.student.full_name} - {self.exam.name} - {self.subject.name}: {self.marks}"
+
+class ArchivedProgressSheet(models.Model):
+    """
+    Marks of archived terms, moved out of ProgressSheet by archive_term so
+    the hot table only holds the current term
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    marks = models.IntegerField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('student', 'exam', 'subject')
+        indexes = [
+            models.Index(fields=['exam', 'student']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.full_name} - {self.exam.name} - {self.subject.name}: {self.marks}"
+
+
+class ExamCompleteness(models.Model):
+    """
+    Number of marks entered for an exam's active students, kept up to date
+    by signal receivers so completeness never needs a full count
+    """
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, primary_key=True)
+    entered = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.exam.name}: {self.entered} marks entered"
+
+
+class ExamResult(models.Model):
+    """
+    A student's graded result for an exam, summarising their marks with the
+    DASHBOARD_GRADING scheme; kept up to date by dashboard.grading
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
+    total_marks = models.PositiveIntegerField()
+    num_subjects = models.PositiveSmallIntegerField()
+    avg_score = models.FloatField()
+    gpa = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    all_objects = models.Manager()
+    objects = ActiveProgressManager()
+
+    class Meta:
+        default_manager_name = 'all_objects'
+        unique_together = ('student', 'exam')
+        indexes = [
+            # Ranking by GPA reads an exam's rows best first.
+            models.Index(fields=['exam', '-gpa']),
+        ]
+
+    def __str__(self):
+        return f"{self.student.full_name} - {self.exam.name}: GPA {self.gpa:.2f}"
@@ -0,0 +1,6 @@
+"""
+Development tooling for finding slow views and queries: SQL fingerprints
+and query plans (sql), replaying URLs under a profiler (profiler, used by
+the profile_views command) and seeding synthetic data for it and the
+benchmarks (synthetic)
+"""
@@ -0,0 +1,136 @@
+"""
+Duplicate-query (N+1) detection.
+
+    with nplusone(threshold=2, raise_error=True):
+        client.get('/ranking/')
+
+records every statement run on the connection, grouped by fingerprint
+(see sql.fingerprint), and flags a shape run more than `threshold` times:
+the same query issued once per row, typically from a loop or a template
+following a foreign key. Each flagged shape keeps the project stack frames
+of its first few executions, which point at the loop. With raise_error,
+leaving the block raises NPlusOneError.
+
+NPlusOneMiddleware does the same per request when DEBUG is on and
+DASHBOARD_NPLUSONE_THRESHOLD is set, logging each offending request (or
+raising with DASHBOARD_NPLUSONE_RAISE). It watches the request's own
+connection, so requests served by the async views, whose queries run on
+worker threads, pass through unchecked.
+"""
+import asyncio
+import logging
+import os
+import traceback
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .sql import fingerprint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 2
+
+# Executions of each shape whose stacks are kept.
+STACKS_KEPT = 3
+
+# Frames shown per stack, innermost last.
+FRAMES_KEPT = 6
+
+_PROJECT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_PERF = os.path.dirname(os.path.abspath(__file__))
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def project_frames(stack):
+    """The frames of a stack in project code, outside this package"""
+    return [
+        frame for frame in stack
+        if frame.filename.startswith(_PROJECT) and not frame.filename.startswith(_PERF)
+        and 'site-packages' not in frame.filename
+    ][-FRAMES_KEPT:]
+
+
+class nplusone:
+    """
+    Context manager counting statements by fingerprint on one connection;
+    see the module docstring
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, raise_error=False, using=DEFAULT_DB_ALIAS, label=''):
+        self.threshold = threshold
+        self.raise_error = raise_error
+        self.using = using
+        self.label = label
+        self.counts = Counter()
+        self.examples = {}
+        self.stacks = {}
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        self.counts[shape] += 1
+        self.examples.setdefault(shape, sql)
+        stacks = self.stacks.setdefault(shape, [])
+        if len(stacks) < STACKS_KEPT:
+            stacks.append(project_frames(traceback.extract_stack()[:-1]))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connections[self.using].execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._wrapper.__exit__(exc_type, exc_value, tb)
+        if exc_type is None and self.raise_error and self.offenders:
+            raise NPlusOneError(self.describe())
+
+    @property
+    def offenders(self):
+        """(shape, count) of the shapes run more than threshold times, most first"""
+        return [(shape, count) for shape, count in self.counts.most_common() if count > self.threshold]
+
+    def describe(self):
+        lines = [f"{len(self.offenders)} repeated queries{f' in {self.label}' if self.label else ''}:"]
+        for shape, count in self.offenders:
+            lines.append(f'  {count}x {shape}')
+            for frame in self.stacks[shape][0]:
+                lines.append(f'      {os.path.relpath(frame.filename, _PROJECT)}:{frame.lineno} in {frame.name}')
+        return '\n'.join(lines)
+
+
+class NPlusOneMiddleware:
+    """
+    Flags requests that run one query shape more than
+    DASHBOARD_NPLUSONE_THRESHOLD times; development only (DEBUG)
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.threshold = getattr(settings, 'DASHBOARD_NPLUSONE_THRESHOLD', None)
+        if not settings.DEBUG or not self.threshold:
+            raise MiddlewareNotUsed
+        self.raise_error = getattr(settings, 'DASHBOARD_NPLUSONE_RAISE', False)
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark this instance as a coroutine function for the handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.get_response(request)
+        label = f'{request.method} {request.get_full_path()}'
+        with nplusone(self.threshold, raise_error=self.raise_error, label=label) as detector:
+            response = self.get_response(request)
+        if detector.offenders:
+            logger.warning(detector.describe())
+            response['X-Repeated-Queries'] = str(sum(count for _, count in detector.offenders))
+        return response
@@ -0,0 +1,180 @@
+"""
+Replay GET requests through the Django test client under a profiler.
+
+URLs come from a file with one path per line (query strings included,
+# comments allowed) or from access-log lines, of which the "GET <path>
+HTTP/..." request is replayed. Each request's SQL is captured and grouped
+by fingerprint across the run: statements repeated within one request are
+reported as duplicates, and each distinct SELECT is EXPLAINed once so full
+table scans stand out. Python time is profiled with cProfile, or with
+pyinstrument when it is installed and asked for.
+"""
+import cProfile
+import json
+import pstats
+import re
+import time
+from collections import Counter
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.template.loader import render_to_string
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .sql import explain, fingerprint, full_scans
+
+# Pages and API calls worth profiling when no URLs are given.
+DEFAULT_URLS = [
+    '/dashboard/',
+    '/students/',
+    '/students/?search=Student',
+    '/progress/',
+    '/progress/?exam_type=quarterly&sort_by=marks',
+    '/ranking/?exam_type=quarterly',
+    '/ranking/?exam_type=quarterly&partition=class_batch',
+    '/ranking/?exam_type=quarterly&score=gpa&top=10',
+    '/analytics/?exam_type=quarterly',
+    '/trends/',
+    '/completeness/',
+    '/api/v1/rankings/?exam_type=quarterly',
+    '/api/v1/progress/?limit=100',
+]
+
+_LOG_REQUEST = re.compile(r'"GET (\S+) HTTP/[\d.]+"')
+
+
+def read_urls(lines):
+    """Paths to replay from a URL list or access log"""
+    urls = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = _LOG_REQUEST.search(line)
+        if match:
+            urls.append(match.group(1))
+        elif line.startswith('/'):
+            urls.append(line.split()[0])
+    return urls
+
+
+class ProfileRun:
+    """Requests, SQL statements and profile of one replay"""
+
+    def __init__(self, profiler='cprofile', explain_queries=True, using=DEFAULT_DB_ALIAS):
+        self.profiler = profiler
+        self.explain_queries = explain_queries
+        self.using = using
+        self.requests = []
+        self.statements = {}
+        self.duplicates = []
+        self._profile = cProfile.Profile() if profiler == 'cprofile' else None
+        self._pyinstrument = None
+        if profiler == 'pyinstrument':
+            # Optional: only needed for this profiler.
+            from pyinstrument import Profiler
+            self._pyinstrument = Profiler()
+
+    def replay(self, client, urls, repeat=1):
+        for _ in range(repeat):
+            for url in urls:
+                self.request(client, url)
+        return self
+
+    def request(self, client, url):
+        connection = connections[self.using]
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            if self._profile is not None:
+                self._profile.enable()
+            else:
+                self._pyinstrument.start()
+            try:
+                response = client.get(url)
+            finally:
+                if self._profile is not None:
+                    self._profile.disable()
+                else:
+                    self._pyinstrument.stop()
+            seconds = time.perf_counter() - start
+        queries = captured.captured_queries
+        sql_seconds = sum(float(query['time']) for query in queries)
+        self.requests.append({
+            'url': url,
+            'status': response.status_code,
+            'ms': round(seconds * 1000, 2),
+            'sql_ms': round(sql_seconds * 1000, 2),
+            'queries': len(queries),
+        })
+        shapes = Counter()
+        for query in queries:
+            shape = fingerprint(query['sql'])
+            shapes[shape] += 1
+            statement = self.statements.setdefault(shape, {
+                'fingerprint': shape, 'example': query['sql'], 'count': 0, 'ms': 0.0, 'urls': set(),
+            })
+            statement['count'] += 1
+            statement['ms'] += float(query['time']) * 1000
+            statement['urls'].add(url)
+        for shape, count in shapes.items():
+            if count > 1:
+                self.duplicates.append({'url': url, 'fingerprint': shape, 'count': count})
+
+    def hot_functions(self, top=25):
+        """The functions with the most time of their own, cProfile only"""
+        if self._profile is None:
+            return []
+        stats = pstats.Stats(self._profile)
+        rows = []
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f'{filename}:{line}({name})',
+                'calls': calls,
+                'own_ms': round(own * 1000, 2),
+                'cumulative_ms': round(cumulative * 1000, 2),
+            })
+        rows.sort(key=lambda row: row['own_ms'], reverse=True)
+        return rows[:top]
+
+    def report(self, top=25):
+        """The run as a JSON-serialisable dict"""
+        statements = sorted(self.statements.values(), key=lambda statement: statement['ms'], reverse=True)[:top]
+        rows = []
+        for statement in statements:
+            plan = explain(statement['example'], self.using) if self.explain_queries else None
+            rows.append({
+                **statement,
+                'ms': round(statement['ms'], 2),
+                'urls': sorted(statement['urls']),
+                'plan': plan,
+                'full_scans': full_scans(plan),
+            })
+        report = {
+            'profiler': self.profiler,
+            'requests': self.requests,
+            'statements': rows,
+            'duplicates': sorted(self.duplicates, key=lambda duplicate: duplicate['count'], reverse=True),
+            'functions': self.hot_functions(top),
+        }
+        if self._pyinstrument is not None:
+            report['profile_text'] = self._pyinstrument.output_text(unicode=False, color=False)
+        return report
+
+
+def profile_urls(urls, user=None, repeat=1, profiler='cprofile', explain_queries=True, top=25):
+    """Replay urls (logged in as user) and return the report dict"""
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    run = ProfileRun(profiler, explain_queries)
+    return run.replay(client, urls, repeat).report(top)
+
+
+def write_report(report, path):
+    """Write the report as JSON, or as HTML for a .html path"""
+    if path.endswith('.html'):
+        content = render_to_string('dashboard/perf_report.html', {'report': report})
+    else:
+        content = json.dumps(report, indent=2)
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
@@ -0,0 +1,55 @@
+"""
+SQL fingerprints and query plans.
+
+A fingerprint is a statement with its literals replaced by ? and IN lists
+collapsed, so the same query issued for different rows (the N+1 pattern)
+shares one fingerprint.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w"])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b', re.IGNORECASE)
+_PLACEHOLDER = re.compile(r'%s')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """The statement with literals and IN lists normalised to ?"""
+    sql = _STRING.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def explain(sql, using=DEFAULT_DB_ALIAS):
+    """
+    The query plan of a SELECT as lines of text (EXPLAIN QUERY PLAN on
+    SQLite), or None for other statements. sql must have its parameters
+    inlined, as in connection.queries.
+    """
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    connection = connections[using]
+    sqlite = connection.vendor == 'sqlite'
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"{'EXPLAIN QUERY PLAN' if sqlite else 'EXPLAIN'} {sql}")
+            rows = cursor.fetchall()
+    except DatabaseError as exc:
+        return [f'EXPLAIN failed: {exc}']
+    if sqlite:
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [' '.join(str(column) for column in row) for row in rows]
+
+
+def full_scans(plan):
+    """Lines of a SQLite plan that read a whole table"""
+    return [
+        line for line in plan or ()
+        if line.startswith('SCAN ') and ' USING ' not in line and not line.startswith(('SCAN (', 'SCAN CONSTANT'))
+    ]
@@ -0,0 +1,64 @@
+"""
+Synthetic data for profiling and benchmarks.
+
+One seeder for `manage.py profile_views --synthetic` and the scripts in
+benchmarks/, so the data they measure stays the same shape: every student
+gets a random mark from 20 to 100 in every subject of every exam.
+"""
+import datetime
+import random
+
+from .. import reference
+from ..models import Student, Subject, Exam, ProgressSheet, academic_year_for
+from ..signals import marks_bulk_changed
+
+EXAM_TYPES = ['quarterly', 'midterm', 'model', 'end_term']
+SUBJECTS = ['Mathematics', 'Science', 'English', 'History', 'Geography', 'Physics', 'Chemistry', 'Biology']
+
+# Marks per INSERT batch, so a million marks are never held at once.
+BATCH_SIZE = 10000
+
+
+def seed_synthetic_data(num_students, num_subjects=len(SUBJECTS), exam_types=EXAM_TYPES, batches=10, seed_value=42):
+    """
+    Fill an empty database with students and a mark for every (student,
+    exam, subject) cell, with completeness counters and results as the
+    signals would keep them; returns the number of marks
+    """
+    rng = random.Random(seed_value)
+    Subject.objects.bulk_create([Subject(name=name) for name in SUBJECTS[:num_subjects]])
+    exams = []
+    for i, exam_type in enumerate(exam_types):
+        date = datetime.date(2026, 3 * (i + 1), 15)
+        exams.append(Exam(exam_type=exam_type, name=exam_type.title(), date=date, academic_year=academic_year_for(date)))
+    Exam.objects.bulk_create(exams)
+    reference.invalidate()
+    Student.objects.bulk_create([
+        Student(
+            full_name=f'Student {i:06d}',
+            email=f'student{i}@example.com',
+            roll_number=f'R{i:06d}',
+            class_batch=f'Batch {i % batches}',
+            date_of_birth=datetime.date(2010, 1, 1),
+            is_verified=True,
+        )
+        for i in range(num_students)
+    ], batch_size=5000)
+    student_ids = list(Student.objects.values_list('pk', flat=True))
+    subject_ids = list(Subject.objects.values_list('pk', flat=True))
+    exam_ids = list(Exam.objects.values_list('pk', flat=True))
+    batch = []
+    created = 0
+    for exam_id in exam_ids:
+        for student_id in student_ids:
+            for subject_id in subject_ids:
+                batch.append(ProgressSheet(
+                    student_id=student_id, exam_id=exam_id, subject_id=subject_id, marks=rng.randint(20, 100),
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    ProgressSheet.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+    ProgressSheet.objects.bulk_create(batch)
+    marks_bulk_changed(exam_ids)
+    return created + len(batch)
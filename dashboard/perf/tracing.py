@@ -0,0 +1,284 @@
+"""
+Per-request tracing.
+
+TracingMiddleware records a trace of spans for a request: the request
+itself, the session load and save, the auth user lookup, every SQL
+statement and every template render, each with its parent so the time of
+a slow page can be attributed to a stage. Configure it with:
+
+    DASHBOARD_TRACING = {
+        'SAMPLE_RATE': 0.01,       # share of requests traced
+        'SLOW_REQUEST_MS': 500,    # requests at least this slow always are
+        'FORMAT': 'jsonl',         # or 'otlp'
+        'PATH': 'traces.jsonl',
+    }
+
+'jsonl' writes one span per line; 'otlp' writes one OTLP/JSON
+ExportTraceServiceRequest per line, the format of the OpenTelemetry file
+exporter, which a collector's otlpjsonfile receiver can read.
+
+With neither a sample rate nor a slow threshold the middleware is not
+installed at all. With only a sample rate, unsampled requests cost a
+random number. A slow threshold means recording every request, since its
+duration is only known at the end, and writing out the slow ones.
+
+Session, auth and render spans come from wrappers installed once around
+the session store, django.contrib.auth.get_user and the template backend;
+outside a trace they cost a context variable lookup. SQL spans are
+recorded on the request's own connection, so for the async views, whose
+queries run on worker threads, they are missing.
+"""
+import asyncio
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from importlib import import_module
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connection
+
+FORMATS = ('jsonl', 'otlp')
+
+SERVICE_NAME = 'student_progress'
+
+# Characters of each SQL statement kept on its span.
+STATEMENT_LENGTH = 2000
+
+_trace = ContextVar('dashboard_trace', default=None)
+_parent = ContextVar('dashboard_span', default=None)
+
+_instrumented = False
+_write_lock = threading.Lock()
+
+
+def _random_id(length):
+    return '%0*x' % (length * 2, random.getrandbits(length * 8))
+
+
+class Span:
+    __slots__ = ('name', 'span_id', 'parent_id', 'start', 'end', 'attributes')
+
+    def __init__(self, name, parent_id, attributes):
+        self.name = name
+        self.span_id = _random_id(8)
+        self.parent_id = parent_id
+        self.start = time.time_ns()
+        self.end = None
+        self.attributes = attributes
+
+    @property
+    def duration_ms(self):
+        return (self.end - self.start) / 1e6
+
+
+class Trace:
+
+    def __init__(self):
+        self.trace_id = _random_id(16)
+        self.spans = []
+
+
+class span:
+    """
+    Context manager recording a span in the current trace, a child of the
+    innermost open span; does nothing outside a trace
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+
+    def __enter__(self):
+        trace = _trace.get()
+        if trace is None:
+            return None
+        self.span = Span(self.name, _parent.get(), self.attributes)
+        trace.spans.append(self.span)
+        self._token = _parent.set(self.span.span_id)
+        return self.span
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if self.span is None:
+            return
+        self.span.end = time.time_ns()
+        if exc_type is not None:
+            self.span.attributes['error'] = exc_type.__name__
+        _parent.reset(self._token)
+
+
+def traced(name, attributes=None):
+    """Decorator recording a span around each call made inside a trace"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return func(*args, **kwargs)
+            with span(name, **(attributes(*args, **kwargs) if attributes else {})):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _template_attributes(template, *args, **kwargs):
+    return {'template': template.origin.template_name}
+
+
+def instrument():
+    """Wrap session, auth and template rendering in spans, once"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    from django.contrib import auth
+    from django.template.backends.django import Template
+
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    store.load = traced('session.load')(store.load)
+    store.save = traced('session.save')(store.save)
+    auth.get_user = traced('auth.get_user')(auth.get_user)
+    Template.render = traced('render', _template_attributes)(Template.render)
+
+
+def query_span(execute, sql, params, many, context):
+    """execute_wrapper recording each statement as a span"""
+    with span('sql', statement=sql[:STATEMENT_LENGTH], many=many):
+        return execute(sql, params, many, context)
+
+
+def span_record(trace, span):
+    return {
+        'trace_id': trace.trace_id,
+        'span_id': span.span_id,
+        'parent_id': span.parent_id,
+        'name': span.name,
+        'start': span.start,
+        'duration_ms': round(span.duration_ms, 3),
+        'attributes': span.attributes,
+    }
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def otlp_request(trace):
+    """The trace as an OTLP/JSON ExportTraceServiceRequest"""
+    spans = []
+    for span in trace.spans:
+        record = {
+            'traceId': trace.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            # SPAN_KIND_SERVER for the request, SPAN_KIND_INTERNAL below it
+            'kind': 2 if span.parent_id is None else 1,
+            'startTimeUnixNano': str(span.start),
+            'endTimeUnixNano': str(span.end),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in span.attributes.items()],
+        }
+        if span.parent_id is not None:
+            record['parentSpanId'] = span.parent_id
+        if 'error' in span.attributes:
+            record['status'] = {'code': 2}
+        spans.append(record)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+        'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+    }]}
+
+
+def export(trace, path, format='jsonl'):
+    """Append the trace to path"""
+    # Spans left open, e.g. by a streaming response, end with the trace.
+    end = max(span.end or 0 for span in trace.spans)
+    for span in trace.spans:
+        if span.end is None:
+            span.end = end
+    if format == 'otlp':
+        lines = [json.dumps(otlp_request(trace))]
+    else:
+        lines = [json.dumps(span_record(trace, span)) for span in trace.spans]
+    with _write_lock, open(path, 'a', encoding='utf-8') as file:
+        file.write(''.join(line + '\n' for line in lines))
+
+
+class TracingMiddleware:
+    """Traces sampled and slow requests; see the module docstring"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'DASHBOARD_TRACING', None) or {}
+        self.sample_rate = config.get('SAMPLE_RATE') or 0
+        self.slow_ms = config.get('SLOW_REQUEST_MS')
+        if not self.sample_rate and self.slow_ms is None:
+            raise MiddlewareNotUsed
+        self.format = config.get('FORMAT', 'jsonl')
+        if self.format not in FORMATS:
+            raise ImproperlyConfigured(f"DASHBOARD_TRACING['FORMAT'] must be one of {', '.join(FORMATS)}.")
+        self.path = os.fspath(config.get('PATH', 'traces.jsonl'))
+        self.get_response = get_response
+        instrument()
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark this instance as a coroutine function for the handler.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        sampled = self.sampled()
+        if not sampled and self.slow_ms is None:
+            return self.get_response(request)
+        trace, token, root = self.start(request)
+        try:
+            with connection.execute_wrapper(query_span):
+                response = self.get_response(request)
+        finally:
+            self.finish(trace, token, root)
+        self.record(request, response, trace, root, sampled)
+        return response
+
+    async def __acall__(self, request):
+        sampled = self.sampled()
+        if not sampled and self.slow_ms is None:
+            return await self.get_response(request)
+        trace, token, root = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(trace, token, root)
+        self.record(request, response, trace, root, sampled)
+        return response
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def start(self, request):
+        trace = Trace()
+        token = _trace.set(trace)
+        root = span('request', method=request.method, target=request.get_full_path())
+        root.__enter__()
+        return trace, token, root
+
+    def finish(self, trace, token, root):
+        root.__exit__(None, None, None)
+        _trace.reset(token)
+
+    def record(self, request, response, trace, root, sampled):
+        match = request.resolver_match
+        root.span.attributes['route'] = '/' + match.route if match is not None and match.route else 'unmatched'
+        root.span.attributes['status'] = response.status_code
+        if sampled or root.span.duration_ms >= self.slow_ms:
+            export(trace, self.path, self.format)
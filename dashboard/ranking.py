@@ -0,0 +1,168 @@
+"""
+Ranking queries shared by the API, the live event feed and the views
+"""
+from django.db.models import Avg, Count, F, Q, Sum, Window
+from django.db.models.functions import DenseRank, Rank, RowNumber
+
+from .matrix import marks_matrix
+from .models import Student, ProgressSheet, ExamResult
+
+# Ties share a rank with 'rank' (1, 1, 3) and 'dense' (1, 1, 2); 'row'
+# numbers every row (1, 2, 3).
+RANK_FUNCTIONS = {
+    'rank': Rank,
+    'dense': DenseRank,
+    'row': RowNumber,
+}
+
+PARTITIONS = {
+    '': (),
+    'class_batch': ('student__class_batch',),
+    'subject': ('subject_id',),
+    'class_batch_subject': ('student__class_batch', 'subject_id'),
+}
+
+PARTITION_CHOICES = [
+    ('', 'Overall'),
+    ('class_batch', 'Within class/batch'),
+    ('subject', 'Within subject'),
+    ('class_batch_subject', 'Within class/batch and subject'),
+]
+
+# Per-student rankings order by average marks or by GPA (see grading).
+SCORES = ('avg_score', 'gpa')
+
+SCORE_CHOICES = [
+    ('avg_score', 'By average'),
+    ('gpa', 'By GPA'),
+]
+
+STUDENT_COLUMNS = ('student_id', 'student__full_name', 'student__roll_number', 'student__class_batch')
+
+
+def cohort_scores(exam_type, class_batch=None, subject=None, by_subject=False, score='avg_score'):
+    """
+    Unordered score rows for the cohort and the expression they are ranked
+    by: per-student averages or GPAs, or per-subject marks
+    """
+    if score == 'gpa' and not (by_subject or subject):
+        # Graded results are stored a row per student, so no GROUP BY.
+        results = ExamResult.objects.filter(exam__exam_type=exam_type)
+        if class_batch:
+            results = results.filter(student__class_batch=class_batch)
+        return results.values(*STUDENT_COLUMNS, 'avg_score', 'total_marks', 'num_subjects', 'gpa'), F('gpa')
+    progress_sheets = ProgressSheet.objects.filter(exam__exam_type=exam_type)
+    if class_batch:
+        progress_sheets = progress_sheets.filter(student__class_batch=class_batch)
+    if subject:
+        progress_sheets = progress_sheets.filter(subject_id=subject)
+    if by_subject or subject:
+        return progress_sheets.values(*STUDENT_COLUMNS, 'subject_id', 'subject__name', 'marks'), F('marks')
+    rows = progress_sheets.values(*STUDENT_COLUMNS).annotate(
+        avg_score=Avg('marks'), total_marks=Sum('marks'), num_subjects=Count('id'),
+    )
+    return rows, Avg('marks')
+
+
+def partitioned_ranking(exam_type, partition='', class_batch=None, subject=None, method='rank', score='avg_score'):
+    """
+    One query ranking students for the exam type, with the rank computed by
+    a window function partitioned by class/batch and/or subject.
+
+    Without a subject partition (or subject filter) there is a row per
+    student with avg_score, total_marks and num_subjects, ranked by average
+    (or, with score='gpa', also with gpa and ranked by it); otherwise a row
+    per student and subject with marks, ranked by marks.
+    Filters narrow the cohort before ranking. Rows come ordered by
+    partition, then rank.
+    """
+    partition_by = PARTITIONS[partition]
+    rank_function = RANK_FUNCTIONS[method]
+    rows, score = cohort_scores(exam_type, class_batch, subject, by_subject='subject_id' in partition_by, score=score)
+    if 'subject_id' in partition_by:
+        partition_order = ['subject__name' if column == 'subject_id' else column for column in partition_by]
+    else:
+        partition_order = list(partition_by)
+
+    return rows.annotate(
+        rank=Window(
+            expression=rank_function(),
+            partition_by=[F(column) for column in partition_by] or None,
+            order_by=score.desc(),
+        ),
+    ).order_by(*partition_order, 'rank', 'student__full_name', 'student_id')
+
+
+def ranked_students(exam_type):
+    """
+    One grouped query: a row per student with rank, avg_score, total_marks
+    and num_subjects for the exam type, best average first
+    """
+    return partitioned_ranking(exam_type)
+
+
+def top_students(exam_type, k, class_batch=None, subject=None, with_ties=True, score='avg_score'):
+    """
+    The k best students (by average or GPA, or by marks in one subject)
+    without ranking the whole cohort: the database keeps only the top k
+    rows while it sorts (ORDER BY ... LIMIT k).
+
+    With ties, students level with the k-th row are added by a second query,
+    so the list may run past k. Ranks are competition ranks (1, 1, 3), the
+    same as partitioned_ranking().
+    """
+    rows, _ = cohort_scores(exam_type, class_batch, subject, score=score)
+    score_key = 'marks' if subject else score
+    rows = rows.order_by(f'-{score_key}', 'student__full_name', 'student_id')
+    top = list(rows[:k])
+    if with_ties and top and len(top) == k:
+        # Filtering on avg_score compares it in SQL (HAVING), where it is
+        # computed exactly as it was for the k-th row.
+        last = top[-1]
+        after_last = Q(student__full_name__gt=last['student__full_name']) | Q(
+            student__full_name=last['student__full_name'], student_id__gt=last['student_id'],
+        )
+        top.extend(rows.filter(after_last, **{score_key: last[score_key]}))
+    return competition_ranks(top, score_key)
+
+
+def competition_ranks(rows, score_key):
+    """Set each row's rank (1, 1, 3) over rows sorted best first"""
+    for position, row in enumerate(rows):
+        if position and row[score_key] == rows[position - 1][score_key]:
+            row['rank'] = rows[position - 1]['rank']
+        else:
+            row['rank'] = position + 1
+    return rows
+
+
+def exam_leaders(exam, k):
+    """
+    The rows of top_students(exam.exam_type, k), served from the exam's
+    cached MarksMatrix: only the names of the students shown are queried
+    """
+    matrix = marks_matrix(exam)
+    totals, counts, averages = matrix.student_scores()
+    selected = matrix.top(k)
+    ids = matrix.student_ids[selected].tolist()
+    students = {
+        row[0]: row[1:]
+        for row in Student.objects.filter(pk__in=ids).values_list('pk', 'full_name', 'roll_number', 'class_batch')
+    }
+    rows = []
+    for i, student_id in zip(selected, ids):
+        if student_id not in students:
+            # Archived after the matrix was built.
+            continue
+        full_name, roll_number, class_batch = students[student_id]
+        rows.append({
+            'student_id': student_id,
+            'student__full_name': full_name,
+            'student__roll_number': roll_number,
+            'student__class_batch': class_batch,
+            'avg_score': float(averages[i]),
+            'total_marks': int(totals[i]),
+            'num_subjects': int(counts[i]),
+        })
+    rows.sort(key=lambda row: (-row['avg_score'], row['student__full_name'], row['student_id']))
+    return competition_ranks(rows, 'avg_score')
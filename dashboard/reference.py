@@ -0,0 +1,112 @@
+"""
+Two-tier cache for reference data: the open exams, the subjects and the
+academic years with archived exams (archival.archived_years()).
+
+They are tiny and rarely change, yet nearly every page lists them. Reads
+go to a per-process LRU first, then to the cache backend, and only then to
+the database. Entries of both tiers are keyed by the REFERENCE data
+version, which the Exam and Subject signal receivers (and the bulk writers
+that bypass them) bump through invalidate().
+
+A process's own changes clear its LRU at once. Other processes notice a
+bumped version once their LRU entry is older than the TTL, so with a
+shared cache backend they are at most TTL seconds behind. The version is
+only shared with the cache backend, though; as a safeguard for a per-process
+backend, an LRU entry is reloaded MAX_AGE seconds after it was loaded
+whatever its version, and the backend holds entries for at most
+DASHBOARD_LOCAL_CACHE_TIMEOUT seconds (versioning.cache_timeout()):
+
+    DASHBOARD_REFERENCE_CACHE = {'TTL': 5, 'MAX_AGE': 60, 'SIZE': 32}
+
+The returned lists are shared; callers must not change them or the
+instances in them.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics, versioning
+from .models import Exam, Subject
+
+CACHE_TIMEOUT = 60 * 60
+
+DEFAULTS = {'TTL': 5, 'MAX_AGE': 60, 'SIZE': 32}
+
+
+class LocalCache:
+    """LRU of (version, value, time checked, time loaded) entries, for one process"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, loader):
+        options = {**DEFAULTS, **getattr(settings, 'DASHBOARD_REFERENCE_CACHE', {})}
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+        if entry is not None and now - entry[3] >= options['MAX_AGE']:
+            entry = None
+        if entry is not None and now - entry[2] < options['TTL']:
+            metrics.CACHE_REQUESTS.inc(cache='reference_local', result='hit')
+            return entry[1]
+        version = versioning.get_version(versioning.REFERENCE)
+        if entry is not None and entry[0] == version:
+            value, loaded = entry[1], entry[3]
+            metrics.CACHE_REQUESTS.inc(cache='reference_local', result='hit')
+        else:
+            metrics.CACHE_REQUESTS.inc(cache='reference_local', result='miss')
+            key = f'dashboard:reference:{name}:{version}'
+            value, loaded = metrics.cache_lookup('reference', cache.get(key)), now
+            if value is None:
+                value = loader()
+                cache.set(key, value, versioning.cache_timeout(CACHE_TIMEOUT))
+        with self._lock:
+            self._entries[name] = (version, value, now, loaded)
+            self._entries.move_to_end(name)
+            while len(self._entries) > options['SIZE']:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local = LocalCache()
+
+
+def invalidate():
+    """After exams or subjects change: a new version, and an empty LRU here"""
+    versioning.bump_version(versioning.REFERENCE)
+    local.clear()
+
+
+def exams():
+    """Open exams by date"""
+    return local.get('exams', lambda: list(Exam.objects.order_by('date', 'pk')))
+
+
+def subjects():
+    """Subjects by name"""
+    return local.get('subjects', lambda: list(Subject.objects.order_by('name')))
+
+
+def exam_types():
+    """Distinct types of the open exams, by date"""
+    return list(dict.fromkeys(exam.exam_type for exam in exams()))
+
+
+def exam_of_type(exam_type):
+    """The open exam of a type, or None"""
+    return next((exam for exam in exams() if exam.exam_type == exam_type), None)
+
+
+def latest_exam():
+    exams_by_date = exams()
+    return exams_by_date[-1] if exams_by_date else None
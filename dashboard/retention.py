@@ -0,0 +1,96 @@
+"""
+Purging archived students.
+
+Archiving (Student.archive()) only flags the student. Their marks are
+deleted here with raw DELETE ... WHERE id IN (...) statements of bounded
+size, each in its own short transaction, rather than through the ORM's
+cascade collector, which would load every related row into memory and
+hold one long transaction over the whole history.
+"""
+import datetime
+import time
+
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import Student, ProgressSheet, ArchivedProgressSheet, ExamResult
+
+# Keeps each IN (...) list below SQLite's historical 999 parameter limit.
+BATCH_SIZE = 500
+
+RETENTION = datetime.timedelta(days=30)
+
+
+class PurgeReport:
+    """Outcome of one purge run"""
+
+    def __init__(self):
+        self.students = 0
+        self.marks = 0
+        self.users = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+
+def raw_delete(model, ids, using=DEFAULT_DB_ALIAS, extra_where='', params=()):
+    """
+    DELETE the model's rows by primary key in one statement, bypassing
+    signals and cascades; returns the number of rows deleted
+    """
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    sql = f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} IN ({placeholders}){extra_where}'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(ids) + list(params))
+        return cursor.rowcount
+
+
+def purge_archived_students(older_than=RETENTION, batch_size=BATCH_SIZE, pause=0, using=DEFAULT_DB_ALIAS):
+    """
+    Permanently delete students archived at least `older_than` ago, with
+    their marks (current and archived terms) and user accounts; returns a
+    PurgeReport.
+
+    Works through batch_size students at a time, deleting their marks in
+    batches of batch_size rows; `pause` seconds between batches leaves
+    room for other writers on a busy database. Students restored while a
+    purge runs are left alone.
+    """
+    started = time.perf_counter()
+    report = PurgeReport()
+    cutoff = timezone.now() - older_than
+    quote = connections[using].ops.quote_name
+    still_archived = f" AND {quote(Student._meta.get_field('is_active').column)} = %s"
+    archived = Student.all_objects.using(using).filter(is_active=False, archived_at__lte=cutoff).order_by('pk')
+    last_pk = 0
+    while True:
+        students = list(archived.filter(pk__gt=last_pk).values_list('pk', 'user_id')[:batch_size])
+        if not students:
+            break
+        last_pk = students[-1][0]
+        student_ids = [pk for pk, user_id in students]
+        for model in (ProgressSheet, ArchivedProgressSheet, ExamResult):
+            marks = model._default_manager.using(using).filter(student__in=student_ids, student__is_active=False)
+            while True:
+                mark_ids = list(marks.values_list('pk', flat=True)[:batch_size])
+                if not mark_ids:
+                    break
+                with transaction.atomic(using=using):
+                    report.marks += raw_delete(model, mark_ids, using)
+                report.batches += 1
+                if pause:
+                    time.sleep(pause)
+        with transaction.atomic(using=using):
+            deleted = raw_delete(Student, student_ids, using, still_archived, [False])
+            report.students += deleted
+            if deleted:
+                user_ids = [user_id for pk, user_id in students if user_id is not None]
+                # Only accounts whose student row is gone; the remaining
+                # cascade (sessions, admin log) is small and left to the ORM.
+                orphans = User.objects.using(using).filter(pk__in=user_ids, student__isnull=True)
+                report.users += orphans.delete()[1].get(User._meta.label, 0)
+        report.batches += 1
+    report.seconds = time.perf_counter() - started
+    return report
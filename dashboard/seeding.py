@@ -0,0 +1,202 @@
+"""
+Reference data seeding for new schools.
+
+A fixture is a mapping with optional `subjects`, `exams`, `class_batches`
+and `students` lists; class_batches, when given, is the set of batches the
+students may belong to. Each model is diffed against the database with one
+query, and only the missing rows are inserted with
+bulk_create(ignore_conflicts=True), all in one transaction. Seeding is
+insert-only: rows that already exist are left as they are.
+"""
+import datetime
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from . import reference, versioning
+from .models import Student, Subject, Exam, academic_year_for
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Rows per INSERT; keeps statements well under MySQL's max_allowed_packet.
+# SQLite batches are capped further by Django itself.
+BATCH_SIZE = 1000
+
+DEFAULT_DATA = {
+    'subjects': ['Mathematics', 'Science', 'English', 'History', 'Geography', 'Physics', 'Chemistry', 'Biology'],
+    'exams': [
+        {'exam_type': 'quarterly', 'name': 'Quarterly Exam', 'date': '2026-03-15'},
+        {'exam_type': 'midterm', 'name': 'Midterm Exam', 'date': '2026-06-15'},
+        {'exam_type': 'model', 'name': 'Model Exam', 'date': '2026-09-15'},
+        {'exam_type': 'end_term', 'name': 'End-Term Exam', 'date': '2026-12-15'},
+    ],
+}
+
+STUDENT_FIELDS = ('full_name', 'email', 'roll_number', 'class_batch', 'date_of_birth')
+
+
+class SeedDataError(ValueError):
+    """The fixture is unreadable or invalid"""
+
+
+def load_fixture(path):
+    """Read a .yaml/.yml or .json fixture file"""
+    is_yaml = os.path.splitext(path)[1].lower() in ('.yaml', '.yml')
+    if is_yaml and yaml is None:
+        raise SeedDataError('Reading YAML fixtures requires PyYAML (pip install pyyaml).')
+    parse_errors = (ValueError, yaml.YAMLError) if yaml is not None else (ValueError,)
+    try:
+        with open(path, encoding='utf-8') as fixture:
+            data = yaml.safe_load(fixture) if is_yaml else json.load(fixture)
+    except OSError as e:
+        raise SeedDataError(f'Cannot open fixture: {e}')
+    except parse_errors as e:
+        raise SeedDataError(f'Cannot parse fixture: {e}')
+    if not isinstance(data, dict):
+        raise SeedDataError('The fixture must be a mapping of subjects, exams, class_batches and students.')
+    unknown = set(data) - {'subjects', 'exams', 'class_batches', 'students'}
+    if unknown:
+        raise SeedDataError(f"Unknown fixture section(s): {', '.join(sorted(unknown))}.")
+    return data
+
+
+def _date(value, where):
+    if isinstance(value, datetime.date):
+        return value
+    parsed = parse_date(str(value)) if value else None
+    if parsed is None:
+        raise SeedDataError(f'{where}: invalid date {value!r}, expected YYYY-MM-DD.')
+    return parsed
+
+
+def _require(item, fields, where):
+    if not isinstance(item, dict):
+        raise SeedDataError(f'{where}: expected a mapping.')
+    missing = [field for field in fields if item.get(field) in (None, '')]
+    if missing:
+        raise SeedDataError(f"{where}: missing {', '.join(missing)}.")
+
+
+def _unique(items, key):
+    seen = {}
+    for item in items:
+        seen.setdefault(key(item), item)
+    return list(seen.values())
+
+
+class SeedReport:
+    """Per section: (section, rows in the fixture, rows created, seconds)"""
+
+    def __init__(self):
+        self.sections = []
+        self.seconds = 0.0
+
+    def add(self, section, total, created, started):
+        self.sections.append((section, total, created, time.perf_counter() - started))
+
+
+def _seed_subjects(subjects, report):
+    started = time.perf_counter()
+    names = []
+    for i, subject in enumerate(subjects):
+        name = subject.get('name') if isinstance(subject, dict) else subject
+        if not isinstance(name, str) or not name.strip():
+            raise SeedDataError(f'subjects[{i}]: missing name.')
+        names.append(name.strip())
+    names = _unique(names, str)
+    existing = set(Subject.objects.values_list('name', flat=True))
+    new = [Subject(name=name) for name in names if name not in existing]
+    Subject.objects.bulk_create(new, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    report.add('subjects', len(names), len(new), started)
+
+
+def _seed_exams(exams, report):
+    started = time.perf_counter()
+    exam_types = dict(Exam.EXAM_TYPES)
+    for i, exam in enumerate(exams):
+        where = f'exams[{i}]'
+        _require(exam, ('exam_type', 'name', 'date'), where)
+        if exam['exam_type'] not in exam_types:
+            raise SeedDataError(f"{where}: exam_type must be one of {', '.join(exam_types)}.")
+    exams = _unique(exams, lambda exam: exam['exam_type'])
+    # One open exam per type (see Exam.Meta): types already open are skipped.
+    existing = set(Exam.objects.values_list('exam_type', flat=True))
+    new = []
+    for exam in exams:
+        if exam['exam_type'] in existing:
+            continue
+        date = _date(exam['date'], f"exams[{exam['exam_type']}]")
+        # bulk_create() skips Exam.save(), which would fill this in.
+        academic_year = str(exam.get('academic_year') or academic_year_for(date))
+        new.append(Exam(exam_type=exam['exam_type'], name=exam['name'], date=date, academic_year=academic_year))
+    Exam.objects.bulk_create(new, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    report.add('exams', len(exams), len(new), started)
+
+
+def _seed_students(students, class_batches, report):
+    started = time.perf_counter()
+    # Class/batch is a plain field on Student, not a table of its own; a
+    # class_batches list only restricts the batches students may use.
+    allowed = set(class_batches) if class_batches else None
+    for i, student in enumerate(students):
+        where = f'students[{i}]'
+        _require(student, STUDENT_FIELDS, where)
+        if allowed is not None and student['class_batch'] not in allowed:
+            raise SeedDataError(f"{where}: class_batch {student['class_batch']!r} is not listed in class_batches.")
+        try:
+            validate_email(str(student['email']).strip())
+        except ValidationError:
+            raise SeedDataError(f"{where}: invalid email {student['email']!r}.")
+    roll_numbers, emails = set(), set()
+    for roll_number, email in Student.all_objects.values_list('roll_number', 'email').iterator():
+        roll_numbers.add(roll_number)
+        emails.add(email.lower())
+
+    new = []
+    for i, student in enumerate(students):
+        roll_number, email = str(student['roll_number']), str(student['email']).strip()
+        if roll_number in roll_numbers or email.lower() in emails:
+            continue
+        roll_numbers.add(roll_number)
+        emails.add(email.lower())
+        new.append(Student(
+            full_name=student['full_name'],
+            email=email,
+            roll_number=roll_number,
+            class_batch=str(student['class_batch']),
+            date_of_birth=_date(student['date_of_birth'], f'students[{i}]'),
+            is_verified=True,
+        ))
+    Student.objects.bulk_create(new, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    report.add('students', len(students), len(new), started)
+    return bool(new)
+
+
+def seed_reference_data(data):
+    """
+    Insert the fixture's missing subjects, exams and students in one
+    transaction; returns a SeedReport
+    """
+    started = time.perf_counter()
+    report = SeedReport()
+    with transaction.atomic():
+        if data.get('subjects'):
+            _seed_subjects(data['subjects'], report)
+        if data.get('exams'):
+            _seed_exams(data['exams'], report)
+        if data.get('students'):
+            if _seed_students(data['students'], data.get('class_batches'), report):
+                # bulk_create() sends no post_save signals.
+                transaction.on_commit(lambda: versioning.bump_version(versioning.STUDENTS))
+        if any(created for section, _, created, _ in report.sections if section in ('subjects', 'exams')):
+            transaction.on_commit(reference.invalidate)
+    report.seconds = time.perf_counter() - started
+    return report
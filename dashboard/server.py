@@ -0,0 +1,280 @@
+"""
+A pre-forking WSGI server for production, run with `manage.py serve`.
+
+The master process loads the WSGI application and warms it (imports the
+URLconf and every view, compiles the templates), closes its database
+connections and freezes the garbage collector, then forks the workers.
+Copy-on-write leaves the loaded code shared between them. Each worker
+warms its caches on start (see warmup.py). Workers accept
+connections on the master's listening socket and serve each on one of
+`threads` threads; a worker only accepts when it has a free thread, so
+busy workers leave connections to idle ones.
+
+Signals to the master:
+
+    SIGHUP           graceful reload: the master re-executes itself keeping
+                     the listening socket, loads the (new) code, starts new
+                     workers and only then stops the old ones, which finish
+                     their requests first
+    SIGTERM, SIGINT  graceful shutdown
+
+With max_requests, a worker exits after that many requests (plus a random
+jitter, so workers do not all restart at once) and the master replaces it,
+which contains slow memory leaks.
+"""
+import gc
+import logging
+import os
+import random
+import selectors
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from django.db import connections
+
+from . import metrics, writebuffer
+from .warmup import start_scheduler, stop_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Set in the environment of a master re-executed on SIGHUP.
+LISTEN_FD = 'DASHBOARD_SERVE_FD'
+RETIRING = 'DASHBOARD_SERVE_RETIRING'
+
+# Seconds between checks of the master and worker loops for signals.
+POLL_INTERVAL = 0.5
+
+
+def bind(address, backlog=2048):
+    """A listening socket for 'host:port', or the one a reload inherited"""
+    fd = os.environ.pop(LISTEN_FD, None)
+    if fd is not None:
+        return socket.socket(fileno=int(fd))
+    host, _, port = address.rpartition(':')
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host.strip('[]') or '127.0.0.1', int(port)))
+    sock.listen(backlog)
+    return sock
+
+
+def preload():
+    """Load the application and everything a first request would"""
+    from django.core.wsgi import get_wsgi_application
+    from django.template import engines
+    from django.urls import get_resolver
+
+    application = get_wsgi_application()
+    get_resolver().url_patterns
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if name.endswith('.html'):
+                        engine.get_template(os.path.relpath(os.path.join(root, name), directory))
+    connections.close_all()
+    return application
+
+
+class RequestHandler(WSGIRequestHandler):
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class WorkerServer(WSGIServer):
+    """wsgiref's server around an already listening socket"""
+
+    def __init__(self, sock, application):
+        # Not TCPServer.__init__, which opens a socket of its own.
+        socketserver.BaseServer.__init__(self, sock.getsockname()[:2], RequestHandler)
+        self.socket = sock
+        host, port = sock.getsockname()[:2]
+        self.server_name = socket.getfqdn(host)
+        self.server_port = port
+        self.setup_environ()
+        self.set_app(application)
+
+
+class Worker:
+    """One forked worker: accept, serve on a thread, repeat"""
+
+    def __init__(self, sock, application, threads=1, max_requests=0):
+        self.sock = sock
+        self.server = WorkerServer(sock, application)
+        self.slots = threading.BoundedSemaphore(threads)
+        self.max_requests = max_requests
+        self.handled = 0
+        self.alive = True
+
+    def stop(self, *args):
+        self.alive = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        self.sock.setblocking(False)
+        selector = selectors.DefaultSelector()
+        selector.register(self.sock, selectors.EVENT_READ)
+        threads = []
+        while self.alive and (not self.max_requests or self.handled < self.max_requests):
+            if not self.slots.acquire(timeout=POLL_INTERVAL):
+                continue
+            try:
+                # Other workers may take the connection first.
+                connection, address = self.sock.accept() if selector.select(POLL_INTERVAL) else (None, None)
+            except (BlockingIOError, InterruptedError):
+                connection = None
+            if connection is None:
+                self.slots.release()
+                continue
+            connection.setblocking(True)
+            self.handled += 1
+            thread = threading.Thread(target=self.handle, args=(connection, address))
+            thread.start()
+            threads = [thread for thread in threads if thread.is_alive()] + [thread]
+        selector.close()
+        for thread in threads:
+            thread.join()
+
+    def handle(self, connection, address):
+        try:
+            self.server.finish_request(connection, address)
+        except Exception:
+            logger.exception('Error handling a request from %s', address)
+        finally:
+            self.server.shutdown_request(connection)
+            connections.close_all()
+            self.slots.release()
+
+
+def shutdown_worker():
+    """
+    Stop a worker's warm-up scheduler, write its buffered marks and its
+    metrics snapshot; returns 1 if any of it failed
+    """
+    status = 0
+    stop_scheduler()
+    for step in (writebuffer.flush_buffer, lambda: metrics.registry.flush(force=True)):
+        try:
+            step()
+        except Exception:
+            logger.exception('Worker %s failed to shut down cleanly', os.getpid())
+            status = 1
+    connections.close_all()
+    return status
+
+
+class Master:
+
+    def __init__(self, sock, application, workers=2, threads=1, max_requests=0, max_requests_jitter=0,
+                 graceful_timeout=30):
+        self.sock = sock
+        self.application = application
+        self.num_workers = workers
+        self.threads = threads
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.workers = set()
+        self.retiring = {int(pid) for pid in os.environ.pop(RETIRING, '').split(',') if pid}
+        self.stopping = False
+        self.reloading = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.reload)
+        # The loaded code is shared with the workers; keep the collector
+        # from touching (and so copying) its pages.
+        gc.freeze()
+        self.spawn_workers()
+        if self.retiring:
+            logger.info('Stopping the workers of the previous code: %s', sorted(self.retiring))
+            self.kill(self.retiring, signal.SIGTERM)
+        while not self.stopping:
+            if self.reloading:
+                self.reexec()
+            self.reap()
+            self.spawn_workers()
+            time.sleep(POLL_INTERVAL)
+        self.shutdown()
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def reload(self, *args):
+        self.reloading = True
+
+    def spawn_workers(self):
+        while len(self.workers) < self.num_workers:
+            jitter = random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+            pid = os.fork()
+            if pid:
+                self.workers.add(pid)
+                continue
+            status = 0
+            try:
+                random.seed()
+                start_scheduler()
+                Worker(self.sock, self.application, self.threads, self.max_requests + jitter).run()
+            except BaseException:
+                logger.exception('Worker %s failed', os.getpid())
+                status = 1
+            finally:
+                # Not the exit handlers, which the master registered too, nor
+                # the master's code further up the stack: only what this
+                # worker holds.
+                status = shutdown_worker() or status
+                os._exit(status)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            self.workers.discard(pid)
+            self.retiring.discard(pid)
+
+    def kill(self, pids, sig):
+        for pid in list(pids):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def shutdown(self):
+        """Stop every worker, after their requests or graceful_timeout"""
+        children = self.workers | self.retiring
+        self.kill(children, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout
+        while (self.workers or self.retiring) and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        self.kill(self.workers | self.retiring, signal.SIGKILL)
+        self.reap()
+
+    def reexec(self):
+        """Replace this process with a fresh one, keeping socket and workers"""
+        logger.info('Reloading')
+        os.set_inheritable(self.sock.fileno(), True)
+        os.environ[LISTEN_FD] = str(self.sock.fileno())
+        os.environ[RETIRING] = ','.join(str(pid) for pid in self.workers | self.retiring)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.execv(sys.executable, [sys.executable, *sys.argv])
+
+
+def serve(address, workers=2, threads=1, max_requests=0, max_requests_jitter=0, graceful_timeout=30):
+    sock = bind(address)
+    application = preload()
+    Master(sock, application, workers, threads, max_requests, max_requests_jitter, graceful_timeout).run()
@@ -0,0 +1,145 @@
+"""
+Model signal receivers, connected in DashboardConfig.ready()
+
+Imported at every start, so grading (and NumPy with it) is imported by
+the receivers that use it.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import completeness, reference, versioning, warmup
+from .events import PROGRESS_TOPIC, broker
+from .models import Student, Exam, ProgressSheet, Subject
+
+_pending = threading.local()
+
+
+def _schedule_rank_changes(exam_id):
+    # Many rows can change in one transaction (bulk entry, cascading
+    # deletes); recompute each affected ranking once, after commit. Every
+    # change adds a callback, but the first publishes all pending exams and
+    # the others find nothing left. After a rollback the exams stay pending
+    # until the next commit, which only costs a recomputation.
+    if getattr(_pending, 'exam_ids', None) is None:
+        _pending.exam_ids = set()
+    _pending.exam_ids.add(exam_id)
+    transaction.on_commit(_publish_rank_changes)
+
+
+def _publish_rank_changes():
+    exam_ids = getattr(_pending, 'exam_ids', None) or set()
+    _pending.exam_ids = None
+    if not exam_ids:
+        return
+    for exam_type in Exam.objects.filter(id__in=exam_ids).values_list('exam_type', flat=True):
+        broker.publish_rank_changes(exam_type)
+
+
+def marks_bulk_changed(exam_ids, students=None):
+    """
+    Signal-equivalent bookkeeping for queryset.update() and bulk_create()
+    on ProgressSheet, which send no model signals. students are the
+    (exam_id, student_id) pairs whose marks changed, if known; otherwise
+    the results of the whole exams are rebuilt.
+    """
+    versioning.bump_version(versioning.MARKS)
+    exam_ids = list(exam_ids)
+    completeness.recount(exam_ids)
+    from . import grading
+    if students is None:
+        grading.refresh_exams(exam_ids)
+    else:
+        grading.refresh_students(students)
+    _marks_changed(exam_ids)
+
+
+def marks_shown_or_hidden(exam_ids):
+    """
+    The part of marks_bulk_changed() still needed when marks drop out of
+    the active-only querysets or come back (students archived or restored),
+    whose callers move the counters themselves: a new MARKS version, a
+    warm-up and rank change events
+    """
+    versioning.bump_version(versioning.MARKS)
+    _marks_changed(list(exam_ids))
+
+
+def _marks_changed(exam_ids):
+    transaction.on_commit(warmup.trigger)
+    if broker.has_any_subscribers():
+        for exam_id in exam_ids:
+            _schedule_rank_changes(exam_id)
+
+
+def progress_event(progress):
+    return {
+        'id': progress.id,
+        'student': progress.student.full_name,
+        'exam': progress.exam.name,
+        'exam_type': progress.exam.exam_type,
+        'subject': progress.subject.name,
+        'marks': progress.marks,
+        'created_at': progress.created_at.isoformat(),
+    }
+
+
+@receiver(post_save, sender=ProgressSheet)
+def progress_saved(sender, instance, created, **kwargs):
+    if not broker.has_any_subscribers():
+        return
+    if created and broker.has_subscribers(PROGRESS_TOPIC):
+        transaction.on_commit(lambda: broker.publish(PROGRESS_TOPIC, 'progress', progress_event(instance)))
+    _schedule_rank_changes(instance.exam_id)
+
+
+@receiver(post_delete, sender=ProgressSheet)
+def progress_deleted(sender, instance, **kwargs):
+    if broker.has_any_subscribers():
+        _schedule_rank_changes(instance.exam_id)
+
+
+@receiver(post_save, sender=ProgressSheet)
+@receiver(post_delete, sender=ProgressSheet)
+def marks_changed(sender, **kwargs):
+    versioning.bump_version(versioning.MARKS)
+
+
+@receiver(post_save, sender=ProgressSheet)
+def progress_counted(sender, instance, created, **kwargs):
+    if created:
+        completeness.marks_entered(instance.exam_id, 1)
+
+
+@receiver(post_delete, sender=ProgressSheet)
+def progress_uncounted(sender, instance, **kwargs):
+    # Marks of archived students and terms were never counted.
+    if (Student.objects.filter(pk=instance.student_id).exists()
+            and Exam.objects.filter(pk=instance.exam_id).exists()):
+        completeness.marks_entered(instance.exam_id, -1)
+
+
+@receiver(post_save, sender=ProgressSheet)
+@receiver(post_delete, sender=ProgressSheet)
+def results_changed(sender, instance, **kwargs):
+    from . import grading
+    grading.refresh_student(instance.exam_id, instance.student_id)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def students_changed(sender, **kwargs):
+    versioning.bump_version(versioning.STUDENTS)
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+@receiver(post_save, sender=Subject)
+@receiver(post_delete, sender=Subject)
+def reference_changed(sender, **kwargs):
+    reference.invalidate()
+    # Again once committed: a read in between may have cached the old rows
+    # under the new version.
+    transaction.on_commit(reference.invalidate)
@@ -0,0 +1,118 @@
+"""
+Server-sent events endpoints, mounted next to Django in student_progress/asgi.py:
+
+    /events/progress/                      new progress sheet entries
+    /events/ranking/?exam_type=<type>      rank changes for one exam type
+
+Each connection is a subscription to the in-process broker in events.py.
+"""
+import asyncio
+import json
+from importlib import import_module
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.handlers.asgi import ASGIRequest
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+
+from .events import PROGRESS_TOPIC, broker, ranking_topic
+from .models import Exam
+
+PREFIX = '/events/'
+HEARTBEAT_SECONDS = 15
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'.encode('utf-8')
+
+
+def _authenticated_user(scope):
+    # Same session and user lookup as SessionMiddleware + AuthenticationMiddleware.
+    # Streams run outside the request cycle, so release the thread's
+    # connection the way request_started/request_finished would.
+    close_old_connections()
+    try:
+        request = ASGIRequest(scope, ContentFile(b''))
+        engine = import_module(settings.SESSION_ENGINE)
+        request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        user = get_user(request)
+        return user if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+async def _send_plain(send, status, body):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'text/plain; charset=utf-8')],
+    })
+    await send({'type': 'http.response.body', 'body': body.encode('utf-8')})
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _stream(subscription, send):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+    while True:
+        try:
+            event, data = await asyncio.wait_for(subscription.__anext__(), HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            await send({'type': 'http.response.body', 'body': b': heartbeat\n\n', 'more_body': True})
+            continue
+        await send({'type': 'http.response.body', 'body': format_event(event, data), 'more_body': True})
+
+
+async def sse_application(scope, receive, send):
+    """ASGI application for the /events/ endpoints"""
+    path = scope['path']
+    if scope['type'] != 'http' or scope['method'] != 'GET':
+        await _send_plain(send, 405, 'Method not allowed')
+        return
+
+    user = await sync_to_async(_authenticated_user)(scope)
+    if user is None:
+        await _send_plain(send, 403, 'Authentication required')
+        return
+
+    if path == PREFIX + 'progress/':
+        topic = PROGRESS_TOPIC
+    elif path == PREFIX + 'ranking/':
+        query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+        exam_type = query.get('exam_type', ['quarterly'])[0]
+        if exam_type not in dict(Exam.EXAM_TYPES):
+            await _send_plain(send, 400, 'Unknown exam type')
+            return
+        topic = ranking_topic(exam_type)
+    else:
+        await _send_plain(send, 404, 'Not found')
+        return
+
+    subscription = broker.subscribe(topic)
+    if topic != PROGRESS_TOPIC:
+        await sync_to_async(broker.ensure_rank_snapshot)(exam_type)
+    stream = asyncio.ensure_future(_stream(subscription, send))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await asyncio.wait([stream, disconnect], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        subscription.close()
+        for task in (stream, disconnect):
+            task.cancel()
@@ -1,3 +1,1734 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.conf import settings
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Student, Subject, Exam, ProgressSheet, ArchivedProgressSheet, ExamResult, academic_year_for
+from . import reference, versioning
+from .admin import EstimatedCountPaginator
+from .analytics import ExamMarks, exam_statistics
+from .archival import archive_term
+from .grading import GradingScheme
+from .matrix import MISSING, MarksMatrix, marks_matrix
+from . import signals, writebuffer
+from .enrollment import import_roster, read_roster
+from .ranking import exam_leaders, partitioned_ranking, top_students
+from .retention import purge_archived_students
+from .seeding import DEFAULT_DATA, seed_reference_data, yaml
+
+# The tests keep the cache in memory, apart from the site's shared one.
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class DashboardTestCase(TestCase):
+    """
+    Shared fixtures: two exams, two subjects and three students with marks
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('teacher', 'teacher@example.com', 'secret-pass-123')
+        cls.maths = Subject.objects.create(name='Mathematics')
+        cls.science = Subject.objects.create(name='Science')
+        cls.quarterly = Exam.objects.create(exam_type='quarterly', name='Quarterly Exam', date=datetime.date(2026, 3, 15))
+        cls.midterm = Exam.objects.create(exam_type='midterm', name='Midterm Exam', date=datetime.date(2026, 6, 15))
+        cls.students = []
+        for i, (name, batch) in enumerate([('Asha', '10A'), ('Bilal', '10A'), ('Chen', '10B')]):
+            cls.students.append(Student.objects.create(
+                full_name=name,
+                email=f'{name.lower()}@example.com',
+                roll_number=f'R{i:03d}',
+                class_batch=batch,
+                date_of_birth=datetime.date(2010, 1, i + 1),
+                is_verified=True,
+            ))
+        marks = {
+            'quarterly': [(70, 80), (90, 85), (60, 65)],
+            'midterm': [(75, 85), (80, 80), (70, 75)],
+        }
+        for exam in (cls.quarterly, cls.midterm):
+            for student, (maths_marks, science_marks) in zip(cls.students, marks[exam.exam_type]):
+                ProgressSheet.objects.create(student=student, exam=exam, subject=cls.maths, marks=maths_marks)
+                ProgressSheet.objects.create(student=student, exam=exam, subject=cls.science, marks=science_marks)
+
+    def setUp(self):
+        cache.clear()
+        reference.local.clear()
+        self.client.force_login(self.user)
+
+
+class ConditionalGetTests(DashboardTestCase):
+
+    def assert_revalidates(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        # Session, user and the single validator aggregate.
+        with self.assertNumQueries(3):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        return response
+
+    def test_ranking_not_modified(self):
+        self.assert_revalidates(reverse('ranking') + '?exam_type=midterm')
+
+    def test_progress_sheet_not_modified(self):
+        self.assert_revalidates(reverse('progress_sheet') + '?exam_type=quarterly&sort_by=marks')
+
+    def test_student_list_not_modified(self):
+        self.assert_revalidates(reverse('student_list') + '?search=a')
+
+    def test_filter_parameters_change_etag(self):
+        url = reverse('ranking')
+        first = self.client.get(url + '?exam_type=quarterly')
+        second = self.client.get(url + '?exam_type=midterm')
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_mark_update_invalidates(self):
+        url = reverse('ranking') + '?exam_type=quarterly'
+        response = self.client.get(url)
+        sheet = ProgressSheet.objects.filter(exam=self.quarterly).first()
+        sheet.marks = 99
+        sheet.save()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+
+    def test_deletion_invalidates(self):
+        url = reverse('progress_sheet')
+        response = self.client.get(url)
+        ProgressSheet.objects.filter(exam=self.midterm).first().delete()
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+
+    def test_new_exam_invalidates(self):
+        url = reverse('progress_sheet')
+        response = self.client.get(url)
+        Exam.objects.create(exam_type='model', name='Model Exam', date=datetime.date(2026, 9, 15))
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+
+    def test_queued_messages_are_shown(self):
+        url = reverse('progress_sheet')
+        response = self.client.get(url)
+        # Only the message tells the pages apart.
+        with mock.patch.object(reference, 'invalidate'):
+            self.client.post(reverse('add_subject'), {'name': 'History'})
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(fresh, 'Subject added successfully!')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_gpa_ranking_depends_on_the_grading_scheme(self):
+        url = reverse('ranking') + '?score=gpa'
+        response = self.client.get(url)
+        grading = {**settings.DASHBOARD_GRADING, 'WEIGHTS': {'Science': 2}}
+        with override_settings(DASHBOARD_GRADING=grading):
+            fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+
+
+class APITests(DashboardTestCase):
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get(reverse('api_students'))
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('error', response.json())
+
+    def test_sparse_fieldset(self):
+        response = self.client.get(reverse('api_students'), {'fields': 'full_name,roll_number'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0], {'full_name': 'Asha', 'roll_number': 'R000'})
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api_students'), {'fields': 'otp'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        url = reverse('api_progress')
+        seen = []
+        params = {'limit': 5, 'fields': 'marks'}
+        while True:
+            data = self.client.get(url, params).json()
+            seen.extend(row['marks'] for row in data['results'])
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(len(seen), ProgressSheet.objects.count())
+
+    def test_invalid_cursors(self):
+        from .api import encode_cursor
+
+        for cursor in ('not-base64!', encode_cursor(-5)):
+            response = self.client.get(reverse('api_rankings'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400)
+
+    def test_query_count_independent_of_page_size(self):
+        # Session, user and one .values() query per endpoint.
+        for name in ('api_students', 'api_subjects', 'api_exams', 'api_progress', 'api_rankings'):
+            for limit in (1, 500):
+                with self.assertNumQueries(3):
+                    response = self.client.get(reverse(name), {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+
+    def test_rankings(self):
+        data = self.client.get(reverse('api_rankings'), {'exam_type': 'quarterly'}).json()
+        self.assertEqual([row['full_name'] for row in data['results']], ['Bilal', 'Asha', 'Chen'])
+        self.assertEqual(data['results'][0]['rank'], 1)
+        self.assertEqual(data['results'][0]['total_marks'], 175)
+
+    def test_gzip(self):
+        response = self.client.get(reverse('api_progress'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+@override_settings(DASHBOARD_CONCURRENT_QUERIES=False)
+class AsyncViewTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.async_client.force_login(self.user)
+
+    async def test_dashboard(self):
+        response = await self.async_client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_students'], 3)
+        self.assertEqual(len(response.context['recent_progress']), 5)
+
+    async def test_ranking(self):
+        url = reverse('ranking') + '?exam_type=quarterly'
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        ranked = [item['student__full_name'] for item in response.context['rankings']]
+        self.assertEqual(ranked, ['Bilal', 'Asha', 'Chen'])
+        # AsyncClient takes raw ASGI header names.
+        cached = await self.async_client.get(url, **{'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+
+    async def test_progress_sheet(self):
+        response = await self.async_client.get(reverse('progress_sheet') + '?exam_type=midterm')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['progress_sheets']), 6)
+
+    async def test_login_required(self):
+        response = await AsyncClient().get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+
+class WarmupTests(DashboardTestCase):
+
+    def test_warm_caches(self):
+        from .matrix import marks_matrix, statistics_for
+        from .warmup import warm_caches
+
+        timings = warm_caches(threads=1)
+        self.assertEqual([timing['artifact'] for timing in timings], ['exam:quarterly', 'exam:midterm', 'trends'])
+        self.assertFalse(any(timing['error'] for timing in timings))
+        with self.assertNumQueries(0):
+            marks_matrix(self.quarterly)
+            statistics_for(self.midterm)
+        # Session and user; no exams or marks.
+        with self.assertNumQueries(2):
+            self.client.get(reverse('trends'))
+        self.assertEqual([timing['artifact'] for timing in warm_caches(['midterm'], threads=1)], ['exam:midterm'])
+        output = io.StringIO()
+        call_command('warm_caches', '--threads', '1', stdout=output)
+        self.assertIn('Warmed 3 cached artifacts', output.getvalue())
+
+    def test_bulk_changes_trigger_the_scheduler(self):
+        import time
+        from . import warmup
+
+        signals.marks_bulk_changed([self.midterm.pk])
+        self.assertIn(warmup.trigger, [func for _, func in connection.run_on_commit])
+
+        def wait_for(runs):
+            deadline = time.monotonic() + 5
+            while scheduler.runs < runs and time.monotonic() < deadline:
+                time.sleep(0.01)
+            return scheduler.runs
+
+        with mock.patch.object(warmup, 'warm_caches', return_value=[]):
+            scheduler = warmup.WarmupScheduler(delay=0.1).start()
+            self.addCleanup(scheduler.stop)
+            self.assertEqual(wait_for(1), 1)
+            with mock.patch.object(warmup, '_scheduler', scheduler):
+                # A burst of changes is warmed once.
+                warmup.trigger()
+                warmup.trigger()
+                self.assertEqual(wait_for(2), 2)
+                time.sleep(0.2)
+            self.assertEqual(scheduler.runs, 2)
+
+    def test_scheduler_starts_with_the_first_request(self):
+        from django.core.signals import request_started
+        from . import warmup
+
+        warmup.start_with_requests()
+        self.addCleanup(request_started.disconnect, dispatch_uid='dashboard_warmup')
+        with mock.patch.object(warmup, 'start_scheduler') as start_scheduler:
+            self.client.get(reverse('dashboard'))
+        start_scheduler.assert_called()
+
+
+class ReferenceTests(DashboardTestCase):
+
+    def test_hot_paths_skip_exams_and_subjects(self):
+        pages = [
+            reverse('dashboard'),
+            reverse('progress_sheet'),
+            reverse('add_progress_sheet'),
+            reverse('ranking') + '?exam_type=midterm',
+            reverse('analytics'),
+            reverse('completeness'),
+        ]
+        for url in pages:
+            self.client.get(url)
+        for url in pages:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            for query in context.captured_queries:
+                self.assertNotIn('FROM "dashboard_exam"', query['sql'])
+                self.assertNotIn('FROM "dashboard_subject"', query['sql'])
+        response = self.client.get(reverse('add_progress_sheet'))
+        self.assertContains(response, f'<option value="{self.science.pk}">Science</option>', html=True)
+
+    def test_changes_invalidate(self):
+        from .archival import archive_exam
+
+        self.assertEqual([exam.exam_type for exam in reference.exams()], ['quarterly', 'midterm'])
+        Exam.objects.create(exam_type='model', name='Model Exam', date=datetime.date(2026, 9, 15))
+        self.assertEqual(reference.exam_types(), ['quarterly', 'midterm', 'model'])
+        self.assertEqual(reference.latest_exam().exam_type, 'model')
+        archive_exam(self.quarterly)
+        self.assertIsNone(reference.exam_of_type('quarterly'))
+        self.science.name = 'Physics'
+        self.science.save()
+        self.assertEqual([subject.name for subject in reference.subjects()], ['Mathematics', 'Physics'])
+
+    def test_other_processes_changes_after_the_ttl(self):
+        reference.exams()
+        # Another process bumped the version; this one keeps its entry for
+        # the TTL, then checks.
+        versioning.bump_version(versioning.REFERENCE)
+        with self.assertNumQueries(0):
+            reference.exams()
+        with override_settings(DASHBOARD_REFERENCE_CACHE={'TTL': 0}), self.assertNumQueries(1):
+            reference.exams()
+            reference.exams()
+        with override_settings(DASHBOARD_REFERENCE_CACHE={'SIZE': 1}):
+            reference.subjects()
+        self.assertEqual(list(reference.local._entries), ['subjects'])
+
+    def test_local_entries_have_a_max_age(self):
+        reference.exams()
+        # A change this process cannot see the version of, with a
+        # per-process cache backend.
+        Exam.objects.filter(exam_type='midterm').update(name='Mid-Term')
+        with override_settings(DASHBOARD_REFERENCE_CACHE={'TTL': 0}):
+            self.assertEqual(reference.exam_of_type('midterm').name, 'Midterm Exam')
+        cache.clear()
+        with override_settings(DASHBOARD_REFERENCE_CACHE={'TTL': 0, 'MAX_AGE': 0}):
+            self.assertEqual(reference.exam_of_type('midterm').name, 'Mid-Term')
+        # The shared tier still has the exams.
+        with self.assertNumQueries(0):
+            reference.exams()
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class ConcurrentQueryTests(TransactionTestCase):
+
+    def test_warm_caches_on_a_thread_pool(self):
+        from .warmup import warm_caches
+
+        subject = Subject.objects.create(name='English')
+        student = Student.objects.create(
+            full_name='Dara', email='dara@example.com', roll_number='R100', class_batch='10C',
+            date_of_birth=datetime.date(2010, 1, 1),
+        )
+        for exam_type, month in (('quarterly', 3), ('midterm', 6)):
+            exam = Exam.objects.create(exam_type=exam_type, name=exam_type, date=datetime.date(2026, month, 1))
+            ProgressSheet.objects.create(student=student, exam=exam, subject=subject, marks=70)
+        timings = warm_caches(threads=3)
+        self.assertEqual(len(timings), 3)
+        self.assertEqual([timing['error'] for timing in timings], [None] * 3)
+
+
+    def test_queries_run_on_worker_threads(self):
+        from asgiref.sync import async_to_sync
+        from .async_views import run_queries
+
+        Subject.objects.create(name='English')
+        Subject.objects.create(name='History')
+        total_subjects, names = async_to_sync(run_queries)(
+            (Subject.objects.count,),
+            (lambda: sorted(Subject.objects.values_list('name', flat=True)),),
+        )
+        self.assertEqual(total_subjects, 2)
+        self.assertEqual(names, ['English', 'History'])
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class EventFeedTests(TransactionTestCase):
+
+    def setUp(self):
+        self.exam = Exam.objects.create(exam_type='quarterly', name='Quarterly Exam', date=datetime.date(2026, 3, 15))
+        self.subject = Subject.objects.create(name='Mathematics')
+        self.students = [
+            Student.objects.create(
+                full_name=name, email=f'{name.lower()}@example.com', roll_number=name[:3],
+                class_batch='10A', date_of_birth=datetime.date(2010, 1, 1),
+            )
+            for name in ('Asha', 'Bilal')
+        ]
+        ProgressSheet.objects.create(student=self.students[0], exam=self.exam, subject=self.subject, marks=60)
+
+    def test_one_change_fans_out_to_every_subscriber(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+        from .events import PROGRESS_TOPIC, broker, ranking_topic
+
+        async def scenario():
+            progress = [broker.subscribe(PROGRESS_TOPIC) for _ in range(3)]
+            ranks = [broker.subscribe(ranking_topic('quarterly')) for _ in range(3)]
+            await sync_to_async(broker.ensure_rank_snapshot)('quarterly')
+
+            def add_mark():
+                with self.assertNumQueries(7):
+                    # INSERT, the completeness counter, the student's result
+                    # (read marks, UPDATE, INSERT), the exam type lookup and
+                    # one ranking query shared by all clients.
+                    ProgressSheet.objects.create(student=self.students[1], exam=self.exam, subject=self.subject, marks=90)
+            await sync_to_async(add_mark)()
+
+            received = []
+            for subscription in progress + ranks:
+                received.append(await asyncio.wait_for(subscription.__anext__(), 1))
+                subscription.close()
+            return received
+
+        received = async_to_sync(scenario)()
+        self.assertEqual([event for event, data in received], ['progress'] * 3 + ['ranks'] * 3)
+        self.assertEqual(received[0][1]['student'], 'Bilal')
+        changed = received[3][1]['changed']
+        self.assertEqual([(row['full_name'], row['rank']) for row in changed], [('Bilal', 1), ('Asha', 2)])
+        self.assertFalse(broker.has_any_subscribers())
+
+    def test_sse_requires_login(self):
+        from asgiref.sync import async_to_sync
+        from asgiref.testing import ApplicationCommunicator
+        from .sse import sse_application
+
+        async def request():
+            communicator = ApplicationCommunicator(sse_application, {
+                'type': 'http', 'method': 'GET', 'path': '/events/progress/',
+                'query_string': b'', 'headers': [],
+            })
+            await communicator.send_input({'type': 'http.request'})
+            return await communicator.receive_output(1)
+
+        start = async_to_sync(request)()
+        self.assertEqual(start['status'], 403)
+
+    def test_rank_changes_publish_once_per_commit(self):
+        from django.db import transaction
+        from .events import broker
+
+        with mock.patch.object(broker, 'publish_rank_changes') as publish, \
+                mock.patch.object(broker, 'has_any_subscribers', return_value=True):
+            with transaction.atomic():
+                ProgressSheet.objects.create(student=self.students[1], exam=self.exam, subject=self.subject, marks=70)
+                ProgressSheet.objects.filter(student=self.students[0]).get().delete()
+                self.assertFalse(publish.called)
+            publish.assert_called_once_with('quarterly')
+            try:
+                with transaction.atomic():
+                    ProgressSheet.objects.create(student=self.students[0], exam=self.exam, subject=self.subject, marks=50)
+                    raise ValueError
+            except ValueError:
+                pass
+            ProgressSheet.objects.get(student=self.students[1]).delete()
+            self.assertEqual(publish.call_count, 2)
+
+
+class AnalyticsTests(DashboardTestCase):
+
+    def test_exam_statistics(self):
+        from .analytics import ExamMarks, exam_statistics
+
+        with self.assertNumQueries(1):
+            marks = ExamMarks.for_exam(self.quarterly)
+        statistics = exam_statistics(marks, include_z_scores=True)
+        self.assertEqual(statistics['overall']['count'], 6)
+        maths = next(row for row in statistics['by_subject'] if row['group'] == 'Mathematics')
+        self.assertEqual(maths['mean'], 73.33)
+        self.assertEqual(maths['median'], 70)
+        self.assertEqual((maths['min'], maths['max']), (60, 90))
+        batches = {row['group']: row['count'] for row in statistics['by_class_batch']}
+        self.assertEqual(batches, {'10A': 4, '10B': 2})
+        self.assertEqual(len(statistics['by_class_batch_subject']), 4)
+        z_scores = statistics['student_z_scores']
+        self.assertGreater(z_scores[str(self.students[1].id)], 0)
+        self.assertLess(z_scores[str(self.students[2].id)], 0)
+
+    def test_empty_exam(self):
+        from .analytics import ExamMarks, exam_statistics
+
+        exam = Exam.objects.create(exam_type='model', name='Model Exam', date=datetime.date(2026, 9, 15))
+        statistics = exam_statistics(ExamMarks.for_exam(exam))
+        self.assertIsNone(statistics['overall'])
+        self.assertEqual(statistics['by_subject'], [])
+
+    def test_analytics_page_and_json(self):
+        response = self.client.get(reverse('analytics'), {'exam_type': 'midterm'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['exam'], self.midterm)
+        data = self.client.get(reverse('api_analytics'), {'exam_type': 'midterm'}).json()
+        self.assertEqual(data['exam']['exam_type'], 'midterm')
+        self.assertEqual(data['overall']['count'], 6)
+
+
+class CompletenessTests(DashboardTestCase):
+
+    def overview(self):
+        from .completeness import completeness_overview
+
+        return {row['exam'].exam_type: row for row in completeness_overview()}
+
+    def test_counters_follow_saves_and_deletes(self):
+        self.assertEqual(self.overview()['quarterly']['missing'], 0)
+        ProgressSheet.objects.get(exam=self.quarterly, student=self.students[0], subject=self.maths).delete()
+        row = self.overview()['quarterly']
+        self.assertEqual((row['entered'], row['expected'], row['missing']), (5, 6, 1))
+        ProgressSheet.objects.create(exam=self.quarterly, student=self.students[0], subject=self.maths, marks=70)
+        self.assertEqual(self.overview()['quarterly']['missing'], 0)
+
+    def test_overview_reads_counters_only(self):
+        self.overview()
+        # Counters and students, however many marks; exams and subjects
+        # come from the reference cache.
+        with self.assertNumQueries(2):
+            self.overview()
+
+    def test_bulk_changes_recount(self):
+        ProgressSheet.objects.filter(exam=self.midterm, subject=self.science).delete()
+        signals.marks_bulk_changed([self.midterm.pk])
+        self.assertEqual(self.overview()['midterm']['missing'], 3)
+        Student.objects.get(pk=self.students[2].pk).archive()
+        row = self.overview()['midterm']
+        self.assertEqual((row['entered'], row['expected'], row['missing']), (2, 4, 2))
+
+    def test_missing_cells_for_one_class_batch(self):
+        from .completeness import missing_cells
+
+        ProgressSheet.objects.filter(exam=self.midterm, subject=self.science).delete()
+        with self.assertNumQueries(1):
+            missing = missing_cells(self.midterm, '10A')
+        self.assertEqual([(cell['full_name'], cell['subject']) for cell in missing],
+                         [('Asha', 'Science'), ('Bilal', 'Science')])
+        self.assertEqual(len(missing_cells(self.midterm)), 3)
+        self.assertEqual(missing_cells(self.quarterly), [])
+
+    def test_completeness_page(self):
+        ProgressSheet.objects.filter(exam=self.midterm, student=self.students[2]).delete()
+        response = self.client.get(reverse('completeness'), {'exam_type': 'midterm', 'class_batch': '10B'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['exam'], self.midterm)
+        self.assertEqual(len(response.context['missing']), 2)
+
+
+class GradingTests(DashboardTestCase):
+
+    def gpas(self, exam):
+        return dict(ExamResult.objects.filter(exam=exam).values_list('student__full_name', 'gpa'))
+
+    def test_vectorised_grades_and_weighted_gpa(self):
+        scheme = GradingScheme(
+            subject_bands={'Science': [(85, 'Distinction', 10), (0, 'Pass', 4)]},
+            weights={'Mathematics': 3},
+        )
+        self.assertEqual(scheme.grade('Mathematics', 80), ('A', 9))
+        self.assertEqual(scheme.grade('Science', 80), ('Pass', 4))
+        matrix = MarksMatrix.for_exam(self.quarterly)
+        gpas = dict(zip(matrix.student_ids.tolist(), scheme.gpas(matrix)))
+        # Bilal: (3 x A+ 10 + 1 x Distinction 10) / 4.
+        self.assertEqual(gpas[self.students[1].pk], 10)
+        # Asha: (3 x B+ 8 + 1 x Pass 4) / 4.
+        self.assertEqual(gpas[self.students[0].pk], 7)
+        with self.assertRaises(ValueError):
+            GradingScheme(bands=[(40, 'Pass', 1)])
+
+    def test_results_follow_saved_and_deleted_marks(self):
+        self.assertEqual(self.gpas(self.quarterly), {'Asha': 8.5, 'Bilal': 9.5, 'Chen': 7})
+        mark = ProgressSheet.objects.get(exam=self.quarterly, student=self.students[2], subject=self.maths)
+        mark.marks = 95
+        mark.save()
+        result = ExamResult.objects.get(exam=self.quarterly, student=self.students[2])
+        self.assertEqual((result.gpa, result.total_marks, result.num_subjects), (8.5, 160, 2))
+        ProgressSheet.objects.filter(exam=self.quarterly, student=self.students[2]).delete()
+        self.assertNotIn('Chen', self.gpas(self.quarterly))
+
+    def test_bulk_changes_refresh_whole_exams(self):
+        ProgressSheet.objects.filter(exam=self.midterm).update(marks=40)
+        signals.marks_bulk_changed([self.midterm.pk])
+        self.assertEqual(self.gpas(self.midterm), {'Asha': 5, 'Bilal': 5, 'Chen': 5})
+        Student.objects.get(pk=self.students[0].pk).archive()
+        self.assertEqual(set(self.gpas(self.quarterly)), {'Bilal', 'Chen'})
+        # Hidden, not rebuilt; a whole-exam rebuild meanwhile drops them
+        # and the restore brings them back.
+        self.assertEqual(ExamResult.all_objects.filter(student=self.students[0]).count(), 2)
+        signals.marks_bulk_changed([self.midterm.pk])
+        Student.all_objects.get(pk=self.students[0].pk).restore()
+        self.assertEqual(self.gpas(self.midterm), {'Asha': 5, 'Bilal': 5, 'Chen': 5})
+
+    def test_small_bulk_changes_refresh_their_students_only(self):
+        from .grading import refresh_exams
+
+        cohort = Student.objects.bulk_create([
+            Student(full_name=f'Student {i}', email=f'student{i}@example.com', roll_number=f'S{i:04d}',
+                    class_batch='10C', date_of_birth=datetime.date(2010, 1, 1))
+            for i in range(600)
+        ])
+        ProgressSheet.objects.bulk_create([
+            ProgressSheet(student=student, exam=self.midterm, subject=subject, marks=60)
+            for student in Student.objects.filter(class_batch='10C') for subject in (self.maths, self.science)
+        ])
+        refresh_exams([self.midterm.pk])
+        untouched = ExamResult.objects.get(exam=self.midterm, student=self.students[1])
+        changed = ProgressSheet.objects.filter(exam=self.midterm, student=self.students[0])
+        changed.update(marks=40)
+        # The counter's recount, then the student's marks, and DELETE and
+        # INSERT in a savepoint, however large the exam.
+        with self.assertNumQueries(7):
+            signals.marks_bulk_changed([self.midterm.pk], {(self.midterm.pk, self.students[0].pk)})
+        self.assertEqual(self.gpas(self.midterm)['Asha'], 5)
+        self.assertEqual(ExamResult.objects.get(exam=self.midterm, student=self.students[1]).pk, untouched.pk)
+        self.assertEqual(ExamResult.objects.filter(exam=self.midterm).count(), len(cohort) + 3)
+
+    def test_refresh_grades_command(self):
+        with override_settings(DASHBOARD_GRADING={'WEIGHTS': {'Science': 3}}):
+            call_command('refresh_grades', stdout=io.StringIO())
+        # Asha: (B+ 8 + 3 x A 9) / 4.
+        self.assertEqual(self.gpas(self.quarterly)['Asha'], 8.75)
+
+    def test_rank_by_gpa_in_one_query(self):
+        with self.assertNumQueries(1):
+            rows = list(partitioned_ranking('quarterly', score='gpa'))
+        self.assertEqual([(row['student__full_name'], row['rank'], row['gpa']) for row in rows],
+                         [('Bilal', 1, 9.5), ('Asha', 2, 8.5), ('Chen', 3, 7)])
+        rows = list(partitioned_ranking('quarterly', partition='class_batch', score='gpa'))
+        self.assertEqual([(row['student__full_name'], row['rank']) for row in rows],
+                         [('Bilal', 1), ('Asha', 2), ('Chen', 1)])
+        top = top_students('quarterly', 1, score='gpa')
+        self.assertEqual([row['student__full_name'] for row in top], ['Bilal'])
+
+    def test_ranking_page_and_api_by_gpa(self):
+        response = self.client.get(reverse('ranking'), {'exam_type': 'quarterly', 'score': 'gpa'})
+        self.assertTrue(response.context['by_gpa'])
+        self.assertContains(response, '<th>GPA</th>', html=True)
+        data = self.client.get(reverse('api_rankings'), {'exam_type': 'quarterly', 'score': 'gpa'}).json()
+        self.assertEqual([row['gpa'] for row in data['results']], [9.5, 8.5, 7])
+        response = self.client.get(reverse('api_rankings'), {'score': 'median'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_progress_sheet_shows_grades(self):
+        response = self.client.get(reverse('progress_sheet'), {'exam_type': 'quarterly', 'sort_by': 'marks'})
+        grades = [(progress.marks, progress.grade) for progress in response.context['progress_sheets']]
+        self.assertEqual(grades[0], (60, 'B'))
+        self.assertEqual(grades[-1], (90, 'A+'))
+
+
+class ProfileViewsTests(DashboardTestCase):
+
+    def test_fingerprint_normalises_literals(self):
+        from .perf.sql import fingerprint
+
+        self.assertEqual(
+            fingerprint('SELECT "a"."id" FROM "t1" a WHERE a.x IN (1, 2, 3) AND a.y = \'O\'\'Hara\'  LIMIT 21'),
+            'SELECT "a"."id" FROM "t1" a WHERE a.x IN (...) AND a.y = ? LIMIT ?',
+        )
+        self.assertEqual(fingerprint('SELECT * FROM t WHERE a = %s'), 'SELECT * FROM t WHERE a = ?')
+
+    def test_read_urls_from_a_list_or_access_log(self):
+        from .perf.profiler import read_urls
+
+        lines = [
+            '# pages',
+            '/ranking/?exam_type=midterm',
+            '127.0.0.1 - - [19/Oct/2026:10:00:00] "GET /progress/?sort_by=marks HTTP/1.1" 200 5120',
+            '127.0.0.1 - - [19/Oct/2026:10:00:01] "POST /progress/add/ HTTP/1.1" 302 0',
+        ]
+        self.assertEqual(read_urls(lines), ['/ranking/?exam_type=midterm', '/progress/?sort_by=marks'])
+
+    def test_profile_reports_statements_duplicates_and_plans(self):
+        from .perf.profiler import profile_urls
+
+        report = profile_urls(['/ranking/?exam_type=quarterly', '/trends/'], user=self.user, top=100)
+        self.assertEqual([request['status'] for request in report['requests']], [200, 200])
+        self.assertTrue(report['functions'])
+        sessions = [statement for statement in report['statements'] if 'django_session' in statement['fingerprint']]
+        self.assertEqual(sessions[0]['count'], 2)
+        self.assertTrue(all(statement['plan'] for statement in report['statements']))
+        self.assertTrue(all(duplicate['count'] > 1 for duplicate in report['duplicates']))
+
+    def test_command_writes_json_and_html(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('profile_views', '--user', 'teacher', '--url', '/analytics/', '--output', path, stdout=io.StringIO())
+            with open(path) as file:
+                self.assertEqual(json.load(file)['requests'][0]['url'], '/analytics/')
+            path = os.path.join(directory, 'report.html')
+            call_command('profile_views', '--user', 'teacher', '--url', '/dashboard/', '--output', path, stdout=io.StringIO())
+            with open(path) as file:
+                self.assertIn('/dashboard/', file.read())
+        with self.assertRaises(CommandError):
+            call_command('profile_views', '--user', 'nobody', stdout=io.StringIO())
+
+    def test_replay_leaves_the_database_unchanged(self):
+        from django.contrib.sessions.models import Session
+
+        sessions = Session.objects.count()
+        last_login = User.objects.get(username='teacher').last_login
+        call_command('profile_views', '--user', 'teacher', '--url', '/dashboard/', '--no-explain', stdout=io.StringIO())
+        self.assertEqual(Session.objects.count(), sessions)
+        self.assertEqual(User.objects.get(username='teacher').last_login, last_login)
+
+
+class NPlusOneTests(DashboardTestCase):
+
+    def test_flags_queries_repeated_per_row(self):
+        from .perf.nplusone import NPlusOneError, nplusone
+
+        with nplusone() as detector:
+            labels = [str(progress) for progress in ProgressSheet.objects.all()]
+        self.assertEqual(len(labels), 12)
+        # __str__ follows student, exam and subject for every row.
+        self.assertEqual(sorted(count for shape, count in detector.offenders), [12, 12, 12])
+        self.assertIn('dashboard/models.py', detector.describe())
+        with self.assertRaises(NPlusOneError):
+            with nplusone(raise_error=True):
+                [str(progress) for progress in ProgressSheet.objects.all()]
+        with nplusone(raise_error=True):
+            [str(progress) for progress in ProgressSheet.objects.select_related('student', 'exam', 'subject')]
+
+    def test_middleware_logs_offending_requests(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .perf.nplusone import NPlusOneMiddleware
+
+        def view(request):
+            return HttpResponse(', '.join(str(progress) for progress in ProgressSheet.objects.all()))
+
+        with self.assertRaises(MiddlewareNotUsed):
+            NPlusOneMiddleware(view)
+        with override_settings(DEBUG=True, DASHBOARD_NPLUSONE_THRESHOLD=2):
+            middleware = NPlusOneMiddleware(view)
+        with self.assertLogs('dashboard.perf.nplusone', 'WARNING'):
+            response = middleware(RequestFactory().get('/progress/'))
+        self.assertEqual(response['X-Repeated-Queries'], '36')
+
+    def test_no_page_repeats_a_query(self):
+        from django.contrib.auth.tokens import default_token_generator
+        from django.utils.encoding import force_bytes
+        from django.utils.http import urlsafe_base64_encode
+        from .perf.nplusone import nplusone
+        from .urls import urlpatterns
+
+        student = self.students[0]
+        account = User.objects.create_user('asha', 'asha@example.com', 'secret-pass-456')
+        Student.objects.filter(pk=student.pk).update(user=account)
+        pages = {
+            'login': [{}],
+            'register': [{}],
+            # The account in the URL is loaded as well as the logged-in user.
+            'verify_otp': [{'args': [account.pk], 'threshold': 2}],
+            'resend_otp': [{'args': [account.pk], 'threshold': 2}],
+            'logout': [{}],
+            'password_reset_confirm': [{'args': [
+                urlsafe_base64_encode(force_bytes(account.pk)), default_token_generator.make_token(account),
+            ]}],
+            'password_reset_complete': [{}],
+            'dashboard': [{}],
+            'student_list': [{}, {'query': {'search': 'a', 'sort_by': 'class_batch'}}],
+            'add_student': [{}],
+            'import_students': [{}],
+            'student_detail': [{'args': [student.pk]}],
+            'edit_student': [{'args': [student.pk]}],
+            'delete_student': [{'args': [student.pk]}],
+            'progress_sheet': [{}, {'query': {'exam_type': 'quarterly', 'sort_by': 'marks'}}],
+            'add_progress_sheet': [{}],
+            'ranking': [
+                {}, {'query': {'partition': 'class_batch_subject'}}, {'query': {'top': 10, 'score': 'gpa'}},
+            ],
+            'analytics': [{'query': {'exam_type': 'midterm'}}],
+            'trends': [{}, {'query': {'class_batch': '10A'}}],
+            'completeness': [{}, {'query': {'exam_type': 'quarterly', 'class_batch': '10A'}}],
+            'add_exam': [{}],
+            'add_subject': [{}],
+            'api_students': [{}],
+            'api_subjects': [{}],
+            'api_exams': [{}],
+            'api_progress': [{}],
+            'api_rankings': [{}, {'query': {'partition': 'subject'}}],
+            'api_analytics': [{}],
+            'metrics': [{}],
+        }
+        self.assertEqual(set(pages), {pattern.name for pattern in urlpatterns})
+        for name, requests in pages.items():
+            for request in requests:
+                self.client.force_login(self.user)
+                url = reverse(name, args=request.get('args', []))
+                with self.subTest(url=url, query=request.get('query')):
+                    # No page runs the same query shape twice.
+                    with nplusone(threshold=request.get('threshold', 1), raise_error=True, label=url):
+                        response = self.client.get(url, request.get('query', {}))
+                    self.assertLess(response.status_code, 500)
+
+
+class TracingTests(DashboardTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'traces')
+
+    def traced_get(self, urls, **config):
+        # A new client loads the middleware with this configuration.
+        with override_settings(DASHBOARD_TRACING={'PATH': self.path, **config}):
+            client = self.client_class()
+            client.force_login(self.user)
+            for url in urls:
+                client.get(url)
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_spans_for_each_stage(self):
+        self.traced_get([reverse('student_detail', args=[self.students[0].pk])], SAMPLE_RATE=1)
+        spans = self.read()
+        self.assertEqual(len({span['trace_id'] for span in spans}), 1)
+        by_id = {span['span_id']: span for span in spans}
+        request, = [span for span in spans if span['parent_id'] is None]
+        self.assertEqual(request['name'], 'request')
+        self.assertEqual(request['attributes']['route'], '/students/<int:student_id>/')
+        self.assertEqual(request['attributes']['status'], 200)
+        parents = {span['name']: by_id[span['parent_id']]['name'] for span in spans if span['parent_id']}
+        self.assertEqual(parents['session.load'], 'request')
+        self.assertEqual(parents['auth.get_user'], 'request')
+        self.assertEqual(parents['render'], 'request')
+        queries = [span for span in spans if span['name'] == 'sql']
+        stages = {by_id[span['parent_id']]['name']: span['attributes']['statement'] for span in queries}
+        self.assertIn('django_session', stages['session.load'])
+        self.assertIn('auth_user', stages['auth.get_user'])
+        self.assertTrue(any('dashboard_student' in span['attributes']['statement'] for span in queries))
+        render, = [span for span in spans if span['name'] == 'render']
+        self.assertEqual(render['attributes']['template'], 'dashboard/student_detail.html')
+
+    def test_sampling_and_slow_requests(self):
+        from django.core.exceptions import MiddlewareNotUsed
+        from .perf.tracing import TracingMiddleware
+
+        with override_settings(DASHBOARD_TRACING={'SAMPLE_RATE': 0}):
+            with self.assertRaises(MiddlewareNotUsed):
+                TracingMiddleware(lambda request: None)
+        self.traced_get([reverse('dashboard')], SAMPLE_RATE=0, SLOW_REQUEST_MS=10 ** 6)
+        self.assertEqual(self.read(), [])
+        self.traced_get([reverse('dashboard')], SAMPLE_RATE=0, SLOW_REQUEST_MS=0)
+        self.assertIn('request', {span['name'] for span in self.read()})
+
+    def test_otlp(self):
+        self.traced_get([reverse('progress_sheet'), reverse('ranking')], SAMPLE_RATE=1, FORMAT='otlp')
+        exports = self.read()
+        self.assertEqual(len(exports), 2)
+        spans = exports[0]['resourceSpans'][0]['scopeSpans'][0]['spans']
+        root, = [span for span in spans if 'parentSpanId' not in span]
+        self.assertEqual(root['kind'], 2)
+        self.assertEqual(len(root['traceId']), 32)
+        self.assertIn({'key': 'status', 'value': {'intValue': '200'}}, root['attributes'])
+        self.assertGreater(int(root['endTimeUnixNano']), int(root['startTimeUnixNano']))
+
+
+class StartupTests(SimpleTestCase):
+
+    def run_python(self, code, settings_module):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module}
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.strip()
+
+    def test_setup_does_not_import_numpy(self):
+        code = 'import sys, django; django.setup(); print("numpy" in sys.modules)'
+        self.assertEqual(self.run_python(code, 'student_progress.settings'), 'False')
+
+    def test_setup_without_fcntl(self):
+        # As on Windows.
+        code = 'import sys; sys.modules["fcntl"] = None\nimport django; django.setup(); print("ok")'
+        self.assertEqual(self.run_python(code, 'student_progress.settings'), 'ok')
+
+    def test_lean_settings(self):
+        code = (
+            'import django; django.setup()\n'
+            'from django.apps import apps; from django.urls import reverse\n'
+            'print(apps.is_installed("django.contrib.admin"), reverse("ranking"))'
+        )
+        self.assertEqual(self.run_python(code, 'student_progress.settings_cli'), 'False /ranking/')
+
+
+class ServeTests(SimpleTestCase):
+
+    def get(self, port, path='/metrics'):
+        import urllib.request
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=10) as response:
+            return response.status
+
+    def wait_until_serving(self, port, timeout=30):
+        import time
+        import urllib.error
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                return self.get(port)
+            except (OSError, urllib.error.URLError):
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def test_serve_reload_and_stop(self):
+        import signal
+        import socket
+        import time
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Not the development database and cache.
+        env = {
+            **os.environ,
+            'STUDENT_PROGRESS_DB': os.path.join(directory.name, 'db.sqlite3'),
+            'DASHBOARD_CACHE_DIR': os.path.join(directory.name, 'cache'),
+        }
+        subprocess.run(
+            [sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+            cwd=settings.BASE_DIR, env=env, check=True,
+        )
+        stderr = tempfile.TemporaryFile()
+        self.addCleanup(stderr.close)
+        process = subprocess.Popen(
+            [sys.executable, 'manage.py', 'serve', '--bind', f'127.0.0.1:{port}', '--workers', '2',
+             '--threads', '2', '--max-requests', '3'],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=stderr,
+        )
+        self.addCleanup(process.kill)
+        self.assertEqual(self.wait_until_serving(port), 200)
+        # Workers are replaced after three requests each.
+        self.assertEqual([self.get(port) for _ in range(10)], [200] * 10)
+        # Requests keep being answered while the master reloads.
+        process.send_signal(signal.SIGHUP)
+        deadline = time.monotonic() + 3
+        while time.monotonic() < deadline:
+            self.assertEqual(self.get(port), 200)
+        process.send_signal(signal.SIGTERM)
+        status = process.wait(timeout=30)
+        stderr.seek(0)
+        self.assertEqual(status, 0, stderr.read().decode())
+
+
+class MetricsTests(DashboardTestCase):
+
+    def setUp(self):
+        from .metrics import registry
+        registry.clear()
+        super().setUp()
+
+    def sample(self, text, line):
+        """The value of an exposition line, e.g. 'name{label="x"}'"""
+        for row in text.splitlines():
+            if row.startswith(line + ' '):
+                return float(row.rsplit(' ', 1)[1])
+        return None
+
+    def test_requests_queries_and_cache_by_route(self):
+        from .metrics import CONTENT_TYPE
+
+        student = self.students[0]
+        self.client.get(reverse('student_detail', args=[student.pk]))
+        self.client.get(reverse('student_detail', args=[self.students[1].pk]))
+        self.client.get(reverse('trends'))
+        self.client.get(reverse('trends'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], CONTENT_TYPE)
+        text = response.content.decode()
+        route = 'route="/students/<int:student_id>/"'
+        self.assertEqual(self.sample(text, f'dashboard_requests_total{{{route},method="GET",status="200"}}'), 2)
+        self.assertEqual(
+            self.sample(text, f'dashboard_request_duration_seconds_bucket{{{route},method="GET",le="+Inf"}}'), 2,
+        )
+        self.assertGreater(self.sample(text, f'dashboard_db_queries_total{{{route}}}'), 0)
+        self.assertEqual(self.sample(text, 'dashboard_cache_requests_total{cache="trends",result="miss"}'), 1)
+        # The first student page fills the cache; the three later pages hit it.
+        self.assertEqual(self.sample(text, 'dashboard_cache_requests_total{cache="trends",result="hit"}'), 3)
+        self.assertIn('# TYPE dashboard_request_duration_seconds histogram', text)
+
+    def test_otp_and_invite_emails(self):
+        from .metrics import EMAIL_QUEUE, registry
+        from .views import send_otp_email
+
+        self.assertTrue(send_otp_email('asha@example.com', '123456'))
+        with mock.patch('dashboard.views.send_mail', side_effect=OSError('down')):
+            self.assertFalse(send_otp_email('asha@example.com', '123456'))
+        queued = []
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=lambda messages: queued.append(registry.collect()[EMAIL_QUEUE.name][()])):
+            import_roster(read_roster(io.StringIO(
+                'full_name,email,roll_number,class_batch,date_of_birth\n'
+                'Dara,dara@example.com,R100,10C,2010-04-01\nEve,eve@example.com,R101,10C,2010-04-01\n'
+            )))
+        self.assertEqual(queued, [2])
+        text = registry.exposition()
+        self.assertEqual(self.sample(text, 'dashboard_email_queue_depth'), 0)
+        self.assertEqual(self.sample(text, 'dashboard_otp_send_duration_seconds_count{result="sent"}'), 1)
+        self.assertEqual(self.sample(text, 'dashboard_otp_send_duration_seconds_count{result="failed"}'), 1)
+
+    def test_snapshots_of_other_processes_are_added(self):
+        from .metrics import ARCHIVE, REQUESTS, registry, snapshot_name, write_snapshot
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(DASHBOARD_METRICS_DIR=directory):
+            REQUESTS.inc(route='/ranking/', method='GET', status=200)
+            registry.flush(force=True)
+            self.assertTrue(os.path.exists(os.path.join(directory, snapshot_name(registry.snapshot()))))
+
+            def write(pid, token, depth):
+                write_snapshot(directory, {'pid': pid, 'token': token, 'values': {
+                    'dashboard_requests_total': [[['/ranking/', 'GET', '200'], 4]],
+                    'dashboard_email_queue_depth': [[[], depth]],
+                }})
+
+            # Another worker, one that has exited (above Linux's pid_max),
+            # and an earlier process with the other worker's pid.
+            exited = 2 ** 22 + 1
+            write(os.getppid(), 'old', 7)
+            os.utime(os.path.join(directory, f'metrics-{os.getppid()}-old.json'), (0, 0))
+            write(os.getppid(), 'new', 3)
+            write(exited, 'gone', 5)
+            text = registry.exposition()
+            self.assertEqual(sorted(os.listdir(directory)), sorted([
+                '.lock', ARCHIVE, snapshot_name(registry.snapshot()), f'metrics-{os.getppid()}-new.json',
+            ]))
+            self.assertEqual(self.sample(text, 'dashboard_requests_total{route="/ranking/",method="GET",status="200"}'), 13)
+            self.assertEqual(self.sample(text, 'dashboard_email_queue_depth'), 3)
+            # The archive keeps the totals of exited processes.
+            write(exited, 'again', 0)
+            text = registry.exposition()
+        self.assertEqual(self.sample(text, 'dashboard_requests_total{route="/ranking/",method="GET",status="200"}'), 17)
+
+    @override_settings(DASHBOARD_CONCURRENT_QUERIES=False)
+    async def test_async_views_record_queries(self):
+        from asgiref.sync import sync_to_async
+        from .metrics import registry
+
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(reverse('ranking'))
+        self.assertEqual(response.status_code, 200)
+        queries = registry.collect()['dashboard_db_queries_total']
+        self.assertGreater(queries[('/ranking/',)], 0)
+
+    @override_settings(DASHBOARD_METRICS_TOKEN='scrape-token')
+    def test_token(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+
+class TrendTests(DashboardTestCase):
+
+    def test_trends_are_computed_once_per_class_batch(self):
+        from .trends import get_trends
+
+        # Exam sequence, then one pivot query for every class/batch.
+        with self.assertNumQueries(2):
+            trends = get_trends()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_trends(), trends)
+        self.assertEqual([exam['exam_type'] for exam in trends['exams']], ['quarterly', 'midterm'])
+        asha = trends['students'][self.students[0].id]
+        self.assertEqual(asha['averages'], [75.0, 80.0])
+        self.assertEqual(asha['change'], 5.0)
+        maths = next(subject for subject in asha['subjects'] if subject['name'] == 'Mathematics')
+        self.assertEqual(maths['marks'], [70.0, 75.0])
+        self.assertEqual(maths['slope'], 5.0)
+
+    def test_mark_change_invalidates_trends(self):
+        from .trends import get_trends
+
+        get_trends()
+        sheet = ProgressSheet.objects.get(student=self.students[0], exam=self.midterm, subject=self.maths)
+        sheet.marks = 95
+        sheet.save()
+        self.assertEqual(get_trends()['students'][self.students[0].id]['averages'], [75.0, 90.0])
+
+    def test_leaderboard_page(self):
+        response = self.client.get(reverse('trends'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([trend['full_name'] for trend in response.context['most_improved']], ['Chen', 'Asha', 'Bilal'])
+        self.assertEqual(response.context['most_declined'][0]['full_name'], 'Bilal')
+        response = self.client.get(reverse('trends'), {'class_batch': '10A'})
+        self.assertEqual([trend['full_name'] for trend in response.context['most_improved']], ['Asha', 'Bilal'])
+
+    def test_student_detail_page(self):
+        response = self.client.get(reverse('student_detail', args=[self.students[2].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['trend']['change'], 10.0)
+
+
+class RankingTests(DashboardTestCase):
+
+    def ranks(self, *args, **kwargs):
+        return [
+            (row['student__full_name'], row.get('subject__name'), row['rank'])
+            for row in partitioned_ranking('quarterly', *args, **kwargs)
+        ]
+
+    def test_partitions(self):
+        self.assertEqual(self.ranks(), [('Bilal', None, 1), ('Asha', None, 2), ('Chen', None, 3)])
+        self.assertEqual(self.ranks('class_batch'), [('Bilal', None, 1), ('Asha', None, 2), ('Chen', None, 1)])
+        self.assertEqual(self.ranks('subject'), [
+            ('Bilal', 'Mathematics', 1), ('Asha', 'Mathematics', 2), ('Chen', 'Mathematics', 3),
+            ('Bilal', 'Science', 1), ('Asha', 'Science', 2), ('Chen', 'Science', 3),
+        ])
+        self.assertEqual(self.ranks('class_batch_subject', subject=self.maths.id), [
+            ('Bilal', 'Mathematics', 1), ('Asha', 'Mathematics', 2), ('Chen', 'Mathematics', 1),
+        ])
+        self.assertEqual(self.ranks(class_batch='10A'), [('Bilal', None, 1), ('Asha', None, 2)])
+
+    def test_ties(self):
+        ProgressSheet.objects.filter(student=self.students[0], exam=self.quarterly).update(marks=85)
+        maths = {'subject': self.maths.id}
+        self.assertEqual([rank for _, _, rank in self.ranks(**maths)], [1, 2, 3])
+        ProgressSheet.objects.filter(student=self.students[0], exam=self.quarterly).update(marks=90)
+        self.assertEqual([rank for _, _, rank in self.ranks(**maths)], [1, 1, 3])
+        self.assertEqual([rank for _, _, rank in self.ranks(method='dense', **maths)], [1, 1, 2])
+        self.assertEqual([rank for _, _, rank in self.ranks(method='row', **maths)], [1, 2, 3])
+
+    def test_query_count_is_constant(self):
+        url = reverse('ranking')
+        with self.assertNumQueries(7) as context:
+            self.client.get(url, {'exam_type': 'quarterly'})
+        for i in range(20):
+            student = Student.objects.create(
+                full_name=f'Student {i}', email=f'student{i}@example.com', roll_number=f'S{i:03d}',
+                class_batch=f'10{"ABC"[i % 3]}', date_of_birth=datetime.date(2010, 2, 1),
+            )
+            for subject in (self.maths, self.science):
+                ProgressSheet.objects.create(student=student, exam=self.quarterly, subject=subject, marks=50 + i)
+        for partition in ('', 'class_batch', 'subject', 'class_batch_subject'):
+            for extra in ({}, {'class_batch': '10A'}, {'subject': self.science.id}):
+                # Session, user, validator, rankings and the class/batch
+                # dropdown; exam types and subjects are cached.
+                with self.assertNumQueries(5):
+                    response = self.client.get(url, {'exam_type': 'quarterly', 'partition': partition, **extra})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['rankings'])
+
+    def test_ranking_page_by_subject(self):
+        response = self.client.get(reverse('ranking'), {'partition': 'subject', 'subject': self.science.id})
+        self.assertTrue(response.context['by_subject'])
+        self.assertContains(response, '<th>Marks</th>', html=True)
+        self.assertEqual([row['marks'] for row in response.context['rankings']], [85, 80, 65])
+
+    def test_top_students_keeps_ties_at_cutoff(self):
+        # Midterm averages: Asha 80, Bilal 80, Chen 72.5.
+        with self.assertNumQueries(2):
+            top = top_students('midterm', 1)
+        self.assertEqual([(row['student__full_name'], row['rank']) for row in top], [('Asha', 1), ('Bilal', 1)])
+        top = top_students('midterm', 1, with_ties=False)
+        self.assertEqual([row['student__full_name'] for row in top], ['Asha'])
+        top = top_students('quarterly', 2, subject=self.science.id)
+        self.assertEqual([(row['marks'], row['rank']) for row in top], [(85, 1), (80, 2)])
+        with self.assertNumQueries(1):
+            self.assertEqual(len(top_students('quarterly', 5)), 3)
+
+    def test_top_students_match_full_ranking(self):
+        full = list(partitioned_ranking('midterm'))
+        top = top_students('midterm', 2)
+        self.assertEqual([(row['student_id'], row['rank']) for row in top],
+                         [(row['student_id'], row['rank']) for row in full[:2]])
+
+    def test_top_ranking_page_and_dashboard(self):
+        response = self.client.get(reverse('ranking'), {'exam_type': 'quarterly', 'top': 2})
+        self.assertEqual([row['student__full_name'] for row in response.context['rankings']], ['Bilal', 'Asha'])
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['leaders_exam'], self.midterm)
+        self.assertEqual([row['rank'] for row in response.context['leaders']], [1, 1, 3])
+
+    def test_ranking_page_ignores_unusable_numbers(self):
+        from .views import MAX_TOP
+
+        for params in ({'subject': '\u00b2'}, {'top': '\u00b2'}, {'top': '0'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('ranking'), {'exam_type': 'quarterly', **params})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.context['rankings']), 3)
+        response = self.client.get(reverse('ranking'), {'exam_type': 'quarterly', 'top': '99999999'})
+        self.assertEqual(response.context['selected_top'], MAX_TOP)
+
+    def test_api_partition(self):
+        data = self.client.get(reverse('api_rankings'), {'partition': 'class_batch', 'fields': 'full_name,rank'}).json()
+        self.assertEqual(data['results'], [
+            {'full_name': 'Bilal', 'rank': 1}, {'full_name': 'Asha', 'rank': 2}, {'full_name': 'Chen', 'rank': 1},
+        ])
+        data = self.client.get(reverse('api_rankings'), {'subject': self.maths.id}).json()
+        self.assertEqual([row['marks'] for row in data['results']], [90, 70, 60])
+        response = self.client.get(reverse('api_rankings'), {'partition': 'school'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_api_rejects_non_ascii_ids(self):
+        for url, params in ((reverse('api_rankings'), {'subject': '\u00b2'}), (reverse('api_progress'), {'student': '\u00b2'})):
+            with self.subTest(url=url):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('must be', response.json()['error'])
+
+
+class EnrollmentTests(DashboardTestCase):
+
+    header = 'full_name,email,roll_number,class_batch,date_of_birth\n'
+
+    def roster(self, count, start=100):
+        return self.header + ''.join(
+            f'Student {i},student{i}@example.com,R{i},10C,2010-05-{i % 28 + 1:02d}\n' for i in range(start, start + count)
+        )
+
+    def test_import_skips_invalid_and_duplicate_rows(self):
+        roster = self.header + (
+            'Dara,dara@example.com,R100,10C,2010-04-01\n'
+            'Asha Again,asha2@example.com,R000,10A,2010-04-01\n'
+            'Eve,ASHA@example.com,R101,10C,2010-04-01\n'
+            'Dara Twin,dara.twin@example.com,R100,10C,2010-04-01\n'
+            'Finn,finn@example.com,R102,10C,01/04/2010\n'
+            ',gia@example.com,R103,10C,2010-04-01\n'
+        )
+        report = import_roster(read_roster(io.StringIO(roster)))
+        self.assertEqual((report.created, report.skipped), (1, 5))
+        self.assertEqual([line for line, _ in report.errors], [3, 4, 5, 6, 7])
+        student = Student.objects.get(roll_number='R100')
+        self.assertEqual(student.user.username, 'R100')
+        self.assertFalse(student.user.has_usable_password())
+        self.assertTrue(student.is_verified)
+        self.assertEqual(report.invites_sent, 1)
+        self.assertEqual(mail.outbox[0].to, ['dara@example.com'])
+
+    def test_query_count_independent_of_roster_size(self):
+        # Two existing-key queries, then per chunk: savepoint, two INSERTs
+        # (rows stay under SQLite's parameter limit), the user id lookup
+        # and savepoint release.
+        for start, size in ((100, 5), (200, 60)):
+            with self.assertNumQueries(7):
+                report = import_roster(read_roster(io.StringIO(self.roster(size, start))), invite=False)
+            self.assertEqual(report.created, size)
+
+    def test_missing_columns(self):
+        report = import_roster(read_roster(io.StringIO('full_name,email\nDara,dara@example.com\n')))
+        self.assertEqual(report.created, 0)
+        self.assertIn('roll_number', report.aborted)
+
+    def test_invite_link_sets_password(self):
+        import_roster(read_roster(io.StringIO(self.roster(1))))
+        link = next(line for line in mail.outbox[0].body.splitlines() if 'http' in line).split(': ', 1)[1]
+        self.client.logout()
+        response = self.client.get(link, follow=True)
+        self.assertTrue(response.context['validlink'])
+        self.client.post(response.redirect_chain[-1][0], {'new_password1': 'fresh-pass-789', 'new_password2': 'fresh-pass-789'})
+        self.assertTrue(User.objects.get(username='R100').check_password('fresh-pass-789'))
+
+    def test_command_and_upload_view(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'roster.csv')
+            with open(path, 'w', encoding='utf-8') as roster:
+                roster.write(self.roster(3))
+            out = io.StringIO()
+            call_command('import_students', path, '--no-invites', '--batch-size', '2', stdout=out)
+        self.assertIn('Enrolled 3 students, skipped 0', out.getvalue())
+        self.assertEqual(len(mail.outbox), 0)
+
+        upload = SimpleUploadedFile('roster.csv', ('\ufeff' + self.roster(2, start=200)).encode('utf-8'))
+        response = self.client.post(reverse('import_students'), {'roster': upload, 'send_invites': 'on'})
+        self.assertEqual(response.context['report'].created, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(Student.objects.count(), 8)
+
+
+class SeedingTests(DashboardTestCase):
+
+    def setup_initial_data(self, content=None, suffix='.json'):
+        out = io.StringIO()
+        if content is None:
+            call_command('setup_initial_data', stdout=out)
+            return out.getvalue()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fixture' + suffix)
+            with open(path, 'w', encoding='utf-8') as fixture:
+                fixture.write(content)
+            call_command('setup_initial_data', path, stdout=out)
+        return out.getvalue()
+
+    def test_defaults_diff_with_one_query_per_model(self):
+        # Savepoint, then a SELECT and a bulk INSERT per model, then release.
+        with self.assertNumQueries(6):
+            report = seed_reference_data(DEFAULT_DATA)
+        self.assertEqual([section[:3] for section in report.sections], [('subjects', 8, 6), ('exams', 4, 2)])
+        self.assertEqual(Subject.objects.count(), 8)
+        # Nothing left to insert on a second run.
+        with self.assertNumQueries(4):
+            seed_reference_data(DEFAULT_DATA)
+        output = self.setup_initial_data()
+        self.assertIn('Subjects: 0 created, 8 already present', output)
+        self.assertIn('Successfully set up initial data in', output)
+
+    def test_json_fixture_with_students(self):
+        fixture = {
+            'subjects': ['Mathematics', 'Art'],
+            'class_batches': ['10A', '11A'],
+            'students': [
+                {'full_name': 'Dara', 'email': 'dara@example.com', 'roll_number': 'R100', 'class_batch': '11A', 'date_of_birth': '2009-02-01'},
+                {'full_name': 'Asha', 'email': 'asha@example.com', 'roll_number': 'R000', 'class_batch': '10A', 'date_of_birth': '2010-01-01'},
+            ],
+        }
+        output = self.setup_initial_data(json.dumps(fixture))
+        self.assertIn('Subjects: 1 created, 1 already present', output)
+        self.assertIn('Students: 1 created, 1 already present', output)
+        self.assertEqual(Student.objects.get(roll_number='R100').date_of_birth, datetime.date(2009, 2, 1))
+
+    def test_invalid_fixture_inserts_nothing(self):
+        fixture = {
+            'subjects': ['Art'],
+            'class_batches': ['10A'],
+            'students': [{'full_name': 'Dara', 'email': 'dara@example.com', 'roll_number': 'R100', 'class_batch': '12Z', 'date_of_birth': '2009-02-01'}],
+        }
+        with self.assertRaisesMessage(CommandError, "class_batch '12Z' is not listed"):
+            self.setup_initial_data(json.dumps(fixture))
+        self.assertFalse(Subject.objects.filter(name='Art').exists())
+        with self.assertRaisesMessage(CommandError, 'Cannot parse fixture'):
+            self.setup_initial_data('{"subjects": [')
+
+    def test_invalid_entries_name_their_index(self):
+        from .seeding import SeedDataError
+
+        with self.assertRaisesMessage(SeedDataError, 'subjects[1]: missing name.'):
+            seed_reference_data({'subjects': [{'name': 'Art'}, {'title': 'Music'}]})
+        student = {'full_name': 'Dara', 'email': 'dara@', 'roll_number': 'R100', 'class_batch': '10A', 'date_of_birth': '2009-02-01'}
+        with self.assertRaisesMessage(SeedDataError, "students[0]: invalid email 'dara@'."):
+            seed_reference_data({'students': [student]})
+        seed_reference_data({'subjects': ['  Art ']})
+        self.assertTrue(Subject.objects.filter(name='Art').exists())
+
+    @unittest.skipIf(yaml is None, 'PyYAML is not installed')
+    def test_yaml_fixture(self):
+        output = self.setup_initial_data(
+            'exams:\n'
+            '  - {exam_type: model, name: Model Exam, date: 2026-09-15}\n'
+            '  - {exam_type: quarterly, name: Quarterly Exam, date: 2026-03-15}\n',
+            suffix='.yaml',
+        )
+        self.assertIn('Exams: 1 created, 1 already present', output)
+        self.assertEqual(Exam.objects.get(exam_type='model').date, datetime.date(2026, 9, 15))
+
+
+class AdminTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser('principal', 'principal@example.com', 'secret-pass-123')
+        self.client.force_login(self.admin)
+        self.changelist = reverse('admin:dashboard_progresssheet_changelist')
+
+    def run_action(self, action, queryset, **fields):
+        return self.client.post(self.changelist, {
+            'action': action,
+            '_selected_action': [str(pk) for pk in queryset.values_list('pk', flat=True)],
+            **fields,
+        }, follow=True)
+
+    def test_changelist_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as before:
+            self.assertEqual(self.client.get(self.changelist).status_code, 200)
+        for i in range(10):
+            student = Student.objects.create(
+                full_name=f'Student {i}', email=f'student{i}@example.com', roll_number=f'S{i:03d}',
+                class_batch='10C', date_of_birth=datetime.date(2010, 2, 1),
+            )
+            ProgressSheet.objects.create(student=student, exam=self.quarterly, subject=self.maths, marks=50)
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(self.changelist)
+        self.assertEqual(len(before), len(after))
+
+    def test_marks_band_filter(self):
+        response = self.client.get(self.changelist, {'marks_band': '80'})
+        self.assertEqual(response.context['cl'].result_count, 5)
+        # Unfiltered rather than a 500.
+        response = self.client.get(self.changelist, {'marks_band': '\u00b2'})
+        self.assertEqual(response.context['cl'].result_count, 12)
+
+    def test_set_and_adjust_marks(self):
+        quarterly = ProgressSheet.objects.filter(exam=self.quarterly)
+        version = versioning.get_version(versioning.MARKS)
+        before = set(quarterly.values_list('updated_at', flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            self.run_action('set_marks', quarterly, marks=55)
+        writes = [query['sql'] for query in queries
+                  if not query['sql'].startswith('SELECT') and 'dashboard_progresssheet' in query['sql']]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertEqual(set(quarterly.values_list('marks', flat=True)), {55})
+        self.assertFalse(before & set(quarterly.values_list('updated_at', flat=True)))
+        self.assertGreater(versioning.get_version(versioning.MARKS), version)
+        self.run_action('adjust_marks', quarterly.filter(student=self.students[0]), marks=60)
+        self.assertEqual(set(quarterly.filter(student=self.students[0]).values_list('marks', flat=True)), {100})
+        response = self.run_action('set_marks', quarterly, marks=150)
+        self.assertContains(response, 'Marks must be between 0 and 100.')
+
+    def test_move_to_exam_skips_clashes(self):
+        model = Exam.objects.create(exam_type='model', name='Model Exam', date=datetime.date(2026, 9, 15))
+        ProgressSheet.objects.create(student=self.students[0], exam=model, subject=self.maths, marks=40)
+        quarterly = ProgressSheet.objects.filter(exam=self.quarterly)
+        response = self.run_action('move_to_exam', quarterly, exam=model.pk)
+        self.assertContains(response, 'Moved 5 entries to Model Exam. Skipped 1')
+        self.assertEqual(ProgressSheet.objects.filter(exam=model).count(), 6)
+        response = self.run_action('move_to_exam', ProgressSheet.objects.filter(student=self.students[1]), exam=model.pk)
+        self.assertContains(response, 'several entries for the same student and subject')
+
+    def test_export_csv_streams(self):
+        response = self.run_action('export_csv', ProgressSheet.objects.filter(exam=self.midterm))
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'roll_number,student,class_batch,exam_type,exam,subject,marks,updated_at')
+        self.assertEqual(len(lines), 7)
+        self.assertTrue(lines[1].startswith('R000,Asha,10A,midterm,Midterm Exam,Mathematics,75,'))
+
+    def test_estimated_count_for_unfiltered_lists(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        ProgressSheet.objects.create(
+            student=self.students[0], subject=self.maths, marks=50,
+            exam=Exam.objects.create(exam_type='model', name='Model Exam', date=datetime.date(2026, 9, 15)),
+        )
+        with mock.patch.object(EstimatedCountPaginator, 'threshold', 1):
+            self.assertEqual(EstimatedCountPaginator(ProgressSheet.all_objects.order_by('pk'), 10).count, 12)
+            self.assertEqual(EstimatedCountPaginator(ProgressSheet.all_objects.filter(marks__gte=0).order_by('pk'), 10).count, 13)
+        self.assertEqual(EstimatedCountPaginator(ProgressSheet.all_objects.order_by('pk'), 10).count, 13)
+
+
+class ArchiveTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.asha = Student.objects.get(pk=self.students[0].pk)
+        self.asha.user = User.objects.create_user('asha', 'asha@example.com', 'secret-pass-123')
+        self.asha.save()
+
+    def test_archive_hides_student_and_marks(self):
+        version = versioning.get_version(versioning.MARKS)
+        # However many marks the student has: no rows are loaded to cascade,
+        # the student's marks are counted per exam in one query to move the
+        # two exams' completeness counters, and results are left as they are.
+        with self.assertNumQueries(8):
+            self.asha.archive()
+        self.assertFalse(self.asha.is_active)
+        self.assertIsNotNone(self.asha.archived_at)
+        self.assertFalse(User.objects.get(username='asha').is_active)
+        self.assertGreater(versioning.get_version(versioning.MARKS), version)
+        self.assertEqual(Student.objects.count(), 2)
+        self.assertEqual(ProgressSheet.objects.count(), 8)
+        self.assertEqual(ProgressSheet.all_objects.count(), 12)
+        ranked = [row['student_id'] for row in partitioned_ranking('midterm')]
+        self.assertNotIn(self.asha.pk, ranked)
+        self.assertEqual(self.client.get(reverse('student_detail', args=[self.asha.pk])).status_code, 404)
+        data = json.loads(self.client.get(reverse('api_rankings'), {'exam_type': 'midterm'}).content)
+        self.assertEqual([row['full_name'] for row in data['results']], ['Bilal', 'Chen'])
+
+    def test_archive_cost_does_not_depend_on_the_cohort(self):
+        def archive_queries(student):
+            with CaptureQueriesContext(connection) as context:
+                student.archive()
+            return len(context.captured_queries)
+
+        small = archive_queries(self.asha)
+        Student.objects.bulk_create([
+            Student(full_name=f'Student {i}', email=f'student{i}@example.com', roll_number=f'S{i:04d}',
+                    class_batch='10C', date_of_birth=datetime.date(2010, 1, 1))
+            for i in range(500)
+        ])
+        ProgressSheet.objects.bulk_create([
+            ProgressSheet(student=student, exam=exam, subject=subject, marks=60)
+            for student in Student.objects.filter(class_batch='10C')
+            for exam in (self.quarterly, self.midterm) for subject in (self.maths, self.science)
+        ])
+        signals.marks_bulk_changed([self.quarterly.pk, self.midterm.pk])
+        chen = Student.objects.get(pk=self.students[2].pk)
+        self.assertEqual(archive_queries(chen), small)
+        from .completeness import completeness_overview
+        # Bilal's marks and the new cohort's.
+        self.assertEqual([row['entered'] for row in completeness_overview()], [2 * 501] * 2)
+
+    def test_delete_view_archives_and_restore(self):
+        response = self.client.post(reverse('delete_student', args=[self.asha.pk]))
+        self.assertRedirects(response, reverse('student_list'))
+        self.asha.refresh_from_db()
+        self.assertFalse(self.asha.is_active)
+        self.assertEqual(ProgressSheet.all_objects.filter(student=self.asha).count(), 4)
+        self.asha.restore()
+        self.assertTrue(self.asha.is_active)
+        self.assertIsNone(self.asha.archived_at)
+        self.assertTrue(User.objects.get(username='asha').is_active)
+        self.assertEqual(ProgressSheet.objects.count(), 12)
+
+    def test_archived_roll_number_stays_taken(self):
+        self.asha.archive()
+        rows = [(2, {
+            'full_name': 'Asha Again', 'email': 'asha.again@example.com', 'roll_number': 'R000',
+            'class_batch': '10A', 'date_of_birth': '2010-01-01',
+        })]
+        report = import_roster(rows, invite=False)
+        self.assertEqual(report.created, 0)
+        self.assertEqual(report.errors, [(2, 'Roll number R000 is already enrolled.')])
+
+    def test_purge_deletes_in_batches(self):
+        self.asha.archive()
+        Student.objects.get(pk=self.students[2].pk).archive()
+        self.assertEqual(purge_archived_students().students, 0)
+        with CaptureQueriesContext(connection) as queries:
+            report = purge_archived_students(older_than=datetime.timedelta(0), batch_size=3)
+        # Marks and results.
+        self.assertEqual((report.students, report.marks, report.users), (2, 12, 1))
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        # Marks in batches of at most three rows, then the students.
+        self.assertEqual(len([sql for sql in deletes if 'progresssheet' in sql]), 3)
+        self.assertEqual(list(Student.all_objects.values_list('full_name', flat=True)), ['Bilal'])
+        self.assertEqual(ProgressSheet.all_objects.count(), 4)
+        self.assertFalse(User.objects.filter(username='asha').exists())
+
+    def test_purge_command(self):
+        self.asha.archive()
+        out = io.StringIO()
+        call_command('purge_archived_students', '--older-than', '0', stdout=out)
+        self.assertIn('Purged 1 students, 6 marks and 1 accounts', out.getvalue())
+
+
+class TermArchivalTests(DashboardTestCase):
+
+    def test_academic_year_labels(self):
+        self.assertEqual(self.quarterly.academic_year, '2026')
+        with override_settings(DASHBOARD_ACADEMIC_YEAR_START_MONTH=6):
+            self.assertEqual(academic_year_for(datetime.date(2026, 3, 15)), '2025-26')
+            self.assertEqual(academic_year_for(datetime.date(2026, 6, 15)), '2026-27')
+
+    def test_archive_term_moves_marks_in_batches(self):
+        version = versioning.get_version(versioning.MARKS)
+        report = archive_term('2026', batch_size=5)
+        self.assertEqual((report.exams, report.moved, report.batches), (2, 12, 4))
+        self.assertFalse(ProgressSheet.all_objects.exists())
+        self.assertEqual(ArchivedProgressSheet.objects.filter(exam=self.midterm).count(), 6)
+        self.assertEqual(
+            ArchivedProgressSheet.objects.get(student=self.students[1], exam=self.quarterly, subject=self.maths).marks, 90,
+        )
+        self.assertFalse(Exam.objects.exists())
+        self.assertGreater(versioning.get_version(versioning.MARKS), version)
+        # Running it again finds nothing left to move.
+        self.assertEqual(archive_term('2026').moved, 0)
+
+    def test_hot_paths_only_see_the_current_term(self):
+        archive_term('2026', exam_types=['quarterly'])
+        quarterly = Exam.objects.create(exam_type='quarterly', name='Quarterly Exam', date=datetime.date(2027, 3, 15))
+        ProgressSheet.objects.create(student=self.students[2], exam=quarterly, subject=self.maths, marks=88)
+        rankings = partitioned_ranking('quarterly')
+        self.assertEqual([(row['student__full_name'], row['avg_score']) for row in rankings], [('Chen', 88)])
+        response = self.client.get(reverse('progress_sheet'), {'exam_type': 'quarterly'})
+        self.assertEqual(len(response.context['progress_sheets']), 1)
+        self.assertEqual(response.context['academic_years'], ['2026'])
+        response = self.client.get(reverse('progress_sheet'), {'exam_type': 'quarterly', 'academic_year': '2026'})
+        self.assertEqual(len(response.context['progress_sheets']), 6)
+        self.assertContains(response, 'Quarterly Exam')
+
+    def test_only_one_open_exam_per_type(self):
+        response = self.client.post(reverse('add_exam'), {
+            'exam_type': 'quarterly', 'name': 'Quarterly Exam', 'date': '2027-03-15', 'academic_year': '',
+        })
+        self.assertContains(response, 'Archive the previous academic year first.')
+        # Checked by the model too, where a conditional constraint is not.
+        with self.assertRaises(ValidationError):
+            Exam(exam_type='midterm', name='Midterm Exam', date=datetime.date(2027, 6, 15)).full_clean()
+        archive_term('2026')
+        response = self.client.post(reverse('add_exam'), {
+            'exam_type': 'quarterly', 'name': 'Quarterly Exam', 'date': '2027-03-15', 'academic_year': '',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Exam.objects.get().academic_year, '2027')
+
+    def test_purge_removes_archived_marks(self):
+        archive_term('2026')
+        Student.objects.get(pk=self.students[0].pk).archive()
+        report = purge_archived_students(older_than=datetime.timedelta(0))
+        self.assertEqual((report.students, report.marks), (1, 4))
+        self.assertEqual(ArchivedProgressSheet.objects.count(), 8)
+
+    def test_archive_term_command(self):
+        out = io.StringIO()
+        call_command('archive_term', '2026', '--exam-type', 'midterm', stdout=out)
+        self.assertIn('Archived 1 exams, moving 6 marks', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('archive_term', '1999', stdout=out)
+
+
+class MarksMatrixTests(DashboardTestCase):
+
+    def test_matrix_layout(self):
+        matrix = MarksMatrix.for_exam(self.quarterly)
+        self.assertEqual(matrix.marks.dtype.name, 'uint8')
+        self.assertEqual(matrix.marks.shape, (3, 2))
+        self.assertEqual(matrix.subjects, ['Mathematics', 'Science'])
+        self.assertEqual(len(matrix), 6)
+        bilal = matrix.row(self.students[1].pk)
+        self.assertEqual(matrix.marks[bilal].tolist(), [90, 85])
+        self.assertEqual(matrix.class_batches[matrix.batch_codes[bilal]], '10A')
+        self.assertIsNone(matrix.row(0))
+        ProgressSheet.objects.filter(student=self.students[2], exam=self.quarterly, subject=self.science).delete()
+        matrix = MarksMatrix.for_exam(self.quarterly)
+        self.assertEqual(matrix.marks[matrix.row(self.students[2].pk)].tolist(), [60, MISSING])
+        self.assertEqual(matrix.student_scores()[2].tolist(), [75.0, 87.5, 60.0])
+
+    def test_statistics_match_exam_marks(self):
+        expected = exam_statistics(ExamMarks.for_exam(self.midterm), include_z_scores=True)
+        actual = exam_statistics(marks_matrix(self.midterm).exam_marks(), include_z_scores=True)
+        self.assertEqual(actual, expected)
+
+    def test_cached_until_marks_change(self):
+        marks_matrix(self.midterm)
+        with self.assertNumQueries(0):
+            marks_matrix(self.midterm)
+        ProgressSheet.objects.filter(student=self.students[2], exam=self.midterm, subject=self.maths).update(marks=100)
+        ProgressSheet.objects.get(student=self.students[2], exam=self.midterm, subject=self.science).save()
+        self.assertEqual(marks_matrix(self.midterm).student_scores()[0].tolist(), [160, 160, 175])
+
+    def test_local_caches_expire_soon(self):
+        from .matrix import CACHE_TIMEOUT
+
+        self.assertEqual(versioning.cache_timeout(CACHE_TIMEOUT), 10)
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+        }}):
+            self.assertEqual(versioning.cache_timeout(CACHE_TIMEOUT), CACHE_TIMEOUT)
+
+    def test_exam_leaders_match_top_students(self):
+        for k in (1, 2, 3, 10):
+            self.assertEqual(exam_leaders(self.midterm, k), top_students('midterm', k))
+        marks_matrix(self.midterm)
+        # Only the names of the students shown are read.
+        with self.assertNumQueries(1):
+            exam_leaders(self.midterm, 1)
+
+
+class WriteBufferTests(DashboardTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.model = Exam.objects.create(exam_type='model', name='Model Exam', date=datetime.date(2026, 9, 15))
+
+    def tearDown(self):
+        if writebuffer._buffer is not None:
+            writebuffer._buffer.flush()
+            writebuffer._buffer = None
+
+    def test_flush_coalesces_into_one_upsert(self):
+        buffer = writebuffer.MarkWriteBuffer(window=60)
+        buffer.add(self.students[0].pk, self.model.pk, self.maths.pk, 40)
+        buffer.add(self.students[0].pk, self.model.pk, self.maths.pk, 45)
+        buffer.add(self.students[1].pk, self.quarterly.pk, self.maths.pk, 99)
+        self.assertEqual(len(buffer), 2)
+        version = versioning.get_version(versioning.MARKS)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(buffer.flush(), 2)
+        writes = [query['sql'] for query in queries if query['sql'].startswith('INSERT INTO "dashboard_progresssheet"')]
+        self.assertEqual(len(writes), 1)
+        self.assertGreater(versioning.get_version(versioning.MARKS), version)
+        created = ProgressSheet.objects.get(student=self.students[0], exam=self.model, subject=self.maths)
+        updated = ProgressSheet.objects.get(student=self.students[1], exam=self.quarterly, subject=self.maths)
+        self.assertEqual((created.marks, updated.marks), (45, 99))
+        self.assertEqual(created.updated_at, updated.updated_at)
+        self.assertEqual(ProgressSheet.objects.count(), 13)
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_failed_flush_keeps_writes(self):
+        from django.db import OperationalError
+
+        buffer = writebuffer.MarkWriteBuffer(window=60)
+        buffer.add(self.students[0].pk, self.model.pk, self.maths.pk, 40)
+        with mock.patch.object(writebuffer, 'upsert_marks', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('dashboard.writebuffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+        # Retried a window later.
+        self.assertIsNotNone(buffer._timer)
+        with mock.patch.object(writebuffer, 'upsert_marks', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        buffer.add(self.students[1].pk, self.model.pk, self.maths.pk, 50)
+        self.assertEqual(buffer.flush(), 2)
+
+    def test_rejected_rows_are_dropped(self):
+        from .archival import archive_exam
+
+        buffer = writebuffer.MarkWriteBuffer(window=60)
+        buffer.add(self.students[0].pk, self.model.pk, self.maths.pk, None)
+        buffer.add(self.students[1].pk, self.model.pk, self.maths.pk, 50)
+        buffer.add(self.students[2].pk, self.midterm.pk, self.maths.pk, 55)
+        archive_exam(self.midterm)
+        with self.assertLogs('dashboard.writebuffer', 'ERROR') as logs:
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(ProgressSheet.objects.get(exam=self.model).marks, 50)
+
+    @override_settings(DASHBOARD_WRITE_BUFFER_WINDOW=60)
+    def test_failing_flush_does_not_fail_reads(self):
+        data = {'student': self.students[2].pk, 'exam': self.model.pk, 'subject': self.science.pk, 'marks': 77}
+        self.client.post(reverse('add_progress_sheet'), data)
+        with mock.patch.object(writebuffer, 'upsert_marks', side_effect=RuntimeError), self.assertLogs('dashboard.writebuffer'):
+            response = self.client.get(reverse('progress_sheet'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(writebuffer.get_buffer()), 1)
+
+    @override_settings(DASHBOARD_WRITE_BUFFER_WINDOW=60)
+    def test_form_writes_are_buffered_with_read_your_writes(self):
+        data = {'student': self.students[2].pk, 'exam': self.model.pk, 'subject': self.science.pk, 'marks': 77}
+        response = self.client.post(reverse('add_progress_sheet'), data)
+        self.assertRedirects(response, reverse('progress_sheet'), fetch_redirect_response=False)
+        self.assertFalse(ProgressSheet.objects.filter(exam=self.model).exists())
+        self.assertEqual(len(writebuffer.get_buffer()), 1)
+        response = self.client.get(reverse('progress_sheet'), {'exam_type': 'model'})
+        self.assertEqual([progress.marks for progress in response.context['progress_sheets']], [77])
+        self.assertEqual(len(writebuffer.get_buffer()), 0)
@@ -0,0 +1,184 @@
+"""
+Student progress trends across the exam term sequence.
+
+Exams are ordered by Exam.EXAM_TYPES (quarterly, midterm, model, end-term).
+One pivoted query returns a row per (student, subject) with a column per
+exam, streamed a class/batch at a time; for each class/batch, deltas,
+least-squares slopes and per-student overall averages are then computed
+with NumPy. The result is cached per exam set and data version, and pages
+read the cached trends instead of raw marks.
+"""
+import hashlib
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Max, Q
+
+from . import metrics, reference, versioning
+from .models import Exam, ProgressSheet
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def exam_sequence():
+    """Existing exams in term order"""
+    order = {exam_type: i for i, (exam_type, _) in enumerate(Exam.EXAM_TYPES)}
+    return sorted(reference.exams(), key=lambda exam: (order.get(exam.exam_type, len(order)), exam.date))
+
+
+def pivot_marks(exams):
+    """
+    One query, streamed: a row per (student, subject) with one mark column
+    per exam (None when missing), ordered by class/batch
+    """
+    columns = {f'exam_{exam.id}': Max('marks', filter=Q(exam_id=exam.id)) for exam in exams}
+    return (
+        ProgressSheet.objects.filter(exam__in=exams)
+        .values(
+            'student_id', 'student__full_name', 'student__roll_number', 'student__class_batch',
+            'subject_id', 'subject__name',
+        )
+        .annotate(**columns)
+        .order_by('student__class_batch', 'student__full_name', 'student_id', 'subject__name')
+        .iterator(chunk_size=2000)
+    )
+
+
+def slopes(matrix):
+    """
+    Least-squares slope of each row of `matrix` (NaN = missing) against the
+    column index; NaN for rows with fewer than two values
+    """
+    present = ~np.isnan(matrix)
+    x = np.broadcast_to(np.arange(matrix.shape[1], dtype=np.float64), matrix.shape)
+    n = present.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_mean = np.where(present, x, 0).sum(axis=1) / n
+        y_mean = np.where(present, matrix, 0).sum(axis=1) / n
+        dx = np.where(present, x - x_mean[:, None], 0)
+        dy = np.where(present, matrix - y_mean[:, None], 0)
+        result = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+    return np.where(n >= 2, result, np.nan)
+
+
+def first_last_change(matrix):
+    """Last available value minus first available value per row"""
+    present = ~np.isnan(matrix)
+    has_two = present.sum(axis=1) >= 2
+    first = np.argmax(present, axis=1)
+    last = matrix.shape[1] - 1 - np.argmax(present[:, ::-1], axis=1)
+    rows = np.arange(matrix.shape[0])
+    return np.where(has_two, matrix[rows, last] - matrix[rows, first], np.nan)
+
+
+def _number(value, digits=2):
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def _series(values):
+    return [_number(value) for value in values]
+
+
+def compute_batch_trends(rows, exams):
+    """
+    Trends for the rows of one pivot_marks() query, keyed by student id
+    """
+    if not rows:
+        return {}
+    keys = [f'exam_{exam.id}' for exam in exams]
+    matrix = np.array(
+        [[np.nan if row[key] is None else row[key] for key in keys] for row in rows],
+        dtype=np.float64,
+    )
+    deltas = np.diff(matrix, axis=1)
+    subject_slopes = slopes(matrix)
+    subject_changes = first_last_change(matrix)
+
+    # Overall trajectory: each student's average over subjects, per exam.
+    student_ids, student_codes = np.unique([row['student_id'] for row in rows], return_inverse=True)
+    present = ~np.isnan(matrix)
+    totals = np.zeros((len(student_ids), len(exams)))
+    counts = np.zeros((len(student_ids), len(exams)))
+    np.add.at(totals, student_codes, np.where(present, matrix, 0))
+    np.add.at(counts, student_codes, present)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        averages = totals / counts
+    overall_deltas = np.diff(averages, axis=1)
+    overall_slopes = slopes(averages)
+    overall_changes = first_last_change(averages)
+
+    trends = {}
+    for code, student_id in enumerate(student_ids.tolist()):
+        trends[student_id] = {
+            'student': student_id,
+            'averages': _series(averages[code]),
+            'deltas': _series(overall_deltas[code]),
+            'slope': _number(overall_slopes[code], 3),
+            'change': _number(overall_changes[code]),
+            'subjects': [],
+        }
+    for i, row in enumerate(rows):
+        trend = trends[row['student_id']]
+        trend['full_name'] = row['student__full_name']
+        trend['roll_number'] = row['student__roll_number']
+        trend['subjects'].append({
+            'subject': row['subject_id'],
+            'name': row['subject__name'],
+            'marks': _series(matrix[i]),
+            'deltas': _series(deltas[i]),
+            'slope': _number(subject_slopes[i], 3),
+            'change': _number(subject_changes[i]),
+        })
+    return trends
+
+
+def _cache_key(exams):
+    versions = versioning.get_versions(versioning.MARKS, versioning.STUDENTS)
+    exam_set = ','.join(str(exam.id) for exam in exams)
+    digest = hashlib.md5(exam_set.encode('ascii')).hexdigest()
+    return f"dashboard:trends:{digest}:{versions['marks']}:{versions['students']}"
+
+
+def get_trends(exams=None):
+    """
+    Trends for every student over the exam sequence, computed in bulk (one
+    pivot query, a class/batch at a time) and cached until marks or
+    students change
+    """
+    if exams is None:
+        exams = exam_sequence()
+    key = _cache_key(exams)
+    trends = metrics.cache_lookup('trends', cache.get(key))
+    if trends is None:
+        trends = build_trends(exams)
+        cache.set(key, trends, versioning.cache_timeout(CACHE_TIMEOUT))
+    return trends
+
+
+def build_trends(exams):
+    students = {}
+    # Only one class/batch's rows are held at a time.
+    for class_batch, rows in groupby(pivot_marks(exams), key=itemgetter('student__class_batch')):
+        for student_id, trend in compute_batch_trends(list(rows), exams).items():
+            trend['class_batch'] = class_batch
+            students[student_id] = trend
+    return {
+        'exams': [{'id': exam.id, 'exam_type': exam.exam_type, 'name': exam.name} for exam in exams],
+        'students': students,
+    }
+
+
+def leaderboard(trends, limit=10, class_batch=None, declined=False):
+    """
+    Students with the largest overall improvement (or decline) from their
+    first to their last exam; ties broken by slope
+    """
+    ranked = [
+        trend for trend in trends['students'].values()
+        if trend['change'] is not None and (class_batch is None or trend['class_batch'] == class_batch)
+    ]
+    sign = 1 if declined else -1
+    ranked.sort(key=lambda trend: (sign * trend['change'], sign * (trend['slope'] or 0), trend['full_name']))
+    return ranked[:limit]
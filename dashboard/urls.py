@@ -1,5 +1,6 @@
+from django.contrib.auth import views as auth_views
 from django.urls import path
-from . import views
+from . import api, metrics, views
 
 urlpatterns = [
     # Authentication URLs
@@ -8,6 +9,8 @@ urlpatterns = [
     path('verify-otp/<int:user_id>/', views.verify_otp_view, name='verify_otp'),
     path('resend-otp/<int:user_id>/', views.resend_otp_view, name='resend_otp'),
     path('logout/', views.logout_view, name='logout'),
+    path('password/set/<uidb64>/<token>/', auth_views.PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
+    path('password/set/done/', auth_views.PasswordResetCompleteView.as_view(), name='password_reset_complete'),
     
     # Dashboard URLs
     path('dashboard/', views.dashboard_view, name='dashboard'),
@@ -15,6 +18,8 @@ urlpatterns = [
     # Student Management URLs
     path('students/', views.student_list_view, name='student_list'),
     path('students/add/', views.add_student_view, name='add_student'),
+    path('students/import/', views.import_students_view, name='import_students'),
+    path('students/<int:student_id>/', views.student_detail_view, name='student_detail'),
     path('students/edit/<int:student_id>/', views.edit_student_view, name='edit_student'),
     path('students/delete/<int:student_id>/', views.delete_student_view, name='delete_student'),
     
@@ -25,7 +30,23 @@ urlpatterns = [
     # Ranking URLs
     path('ranking/', views.ranking_view, name='ranking'),
     
+    # Analytics URLs
+    path('analytics/', views.analytics_view, name='analytics'),
+    path('trends/', views.trends_view, name='trends'),
+    path('completeness/', views.completeness_view, name='completeness'),
+    
     # Admin URLs for adding exams and subjects
     path('exams/add/', views.add_exam_view, name='add_exam'),
     path('subjects/add/', views.add_subject_view, name='add_subject'),
+
+    # Read-only JSON API
+    path('api/v1/students/', api.student_list_api, name='api_students'),
+    path('api/v1/subjects/', api.subject_list_api, name='api_subjects'),
+    path('api/v1/exams/', api.exam_list_api, name='api_exams'),
+    path('api/v1/progress/', api.progress_list_api, name='api_progress'),
+    path('api/v1/rankings/', api.ranking_api, name='api_rankings'),
+    path('api/v1/analytics/', api.analytics_api, name='api_analytics'),
+
+    # Prometheus scrape endpoint
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
\ No newline at end of file
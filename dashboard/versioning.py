@@ -0,0 +1,60 @@
+"""
+Data version counters kept in the cache backend.
+
+Cached artifacts include the version of the data they were built from in
+their cache key. Signal receivers bump the version when the data changes,
+so stale entries are never read again and simply expire.
+
+The counters only reach every process through a shared cache backend (see
+CACHES in settings.py). With a per-process one (locmem), a process never
+sees other processes' bumps, so cache_timeout() caps how long entries are
+kept to DASHBOARD_LOCAL_CACHE_TIMEOUT seconds.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+MARKS = 'marks'
+STUDENTS = 'students'
+# Open exams and subjects, see reference.py.
+REFERENCE = 'reference'
+
+
+def _key(name):
+    return f'dashboard:version:{name}'
+
+
+def get_version(name):
+    version = cache.get(_key(name))
+    if version is None:
+        # Seed from the clock so a counter that was evicted never restarts
+        # at a value older cache entries were keyed with.
+        cache.add(_key(name), time.time_ns() // 1000, timeout=None)
+        version = cache.get(_key(name))
+    return version
+
+
+def get_versions(*names):
+    keys = {_key(name): name for name in names}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, name in keys.items():
+        versions[name] = found[key] if key in found else get_version(name)
+    return versions
+
+
+def cache_timeout(seconds):
+    """The timeout for a versioned entry: seconds, or less if the cache is per process"""
+    if isinstance(caches['default'], LocMemCache):
+        return min(seconds, getattr(settings, 'DASHBOARD_LOCAL_CACHE_TIMEOUT', 10))
+    return seconds
+
+
+def bump_version(name):
+    try:
+        return cache.incr(_key(name))
+    except ValueError:
+        # Not set yet, or evicted.
+        return get_version(name)
@@ -6,10 +6,23 @@ from django.contrib import messages
 from django.core.mail import send_mail
 from django.conf import settings
 from django.db.models import Q
-from .models import Student, Subject, Exam, ProgressSheet
-from .forms import StudentRegistrationForm, StudentProfileForm, LoginForm, OTPVerificationForm, ProgressSheetForm, ExamForm, SubjectForm
+from .models import Student, ProgressSheet
+from .metrics import OTP_SEND_LATENCY
+from . import reference
+from .forms import StudentRegistrationForm, StudentProfileForm, LoginForm, OTPVerificationForm, ProgressSheetForm, ExamForm, SubjectForm, StudentImportForm
+from .conditional import conditional_page, progress_validator, ranking_validator, student_validator
+from .completeness import completeness_overview, missing_cells
+from .grading import GradingScheme
+from .matrix import statistics_for
+from .writebuffer import save_marks
+from .trends import get_trends, leaderboard
+from .enrollment import import_roster, read_roster
+from .archival import archived_years, progress_history
+from .ranking import PARTITIONS, PARTITION_CHOICES, SCORES, SCORE_CHOICES, exam_leaders, partitioned_ranking, top_students
+import io
 import random
 import string
+import time
 
 
 def generate_otp():
@@ -19,6 +32,7 @@ def generate_otp():
 
 def send_otp_email(email, otp):
     """Send OTP to user's email"""
+    start = time.perf_counter()
     try:
         send_mail(
             'Email Verification OTP',
@@ -27,8 +41,10 @@ def send_otp_email(email, otp):
             [email],
             fail_silently=False,
         )
+        OTP_SEND_LATENCY.observe(time.perf_counter() - start, result='sent')
         return True
     except Exception as e:
+        OTP_SEND_LATENCY.observe(time.perf_counter() - start, result='failed')
         print(f"Error sending email: {e}")
         return False
 
@@ -129,27 +145,46 @@ def login_view(request):
     return render(request, 'registration/login.html', {'form': form})
 
 
+def recent_progress_entries(limit=5):
+    """Latest progress entries with their student, exam and subject"""
+    return list(
+        ProgressSheet.objects.select_related('student', 'exam', 'subject').order_by('-created_at')[:limit]
+    )
+
+
+def latest_exam_leaders(limit=10):
+    """The most recent exam and its top students (with ties), for the dashboard widget"""
+    exam = reference.latest_exam()
+    if exam is None:
+        return None, []
+    return exam, exam_leaders(exam, limit)
+
+
 @login_required
 def dashboard_view(request):
     """Main dashboard view"""
     # Get statistics for the dashboard
     total_students = Student.objects.count()
-    total_exams = Exam.objects.count()
-    total_subjects = Subject.objects.count()
+    total_exams = len(reference.exams())
+    total_subjects = len(reference.subjects())
     
     # Get recent activities (last 5 progress entries)
-    recent_progress = ProgressSheet.objects.select_related('student', 'exam', 'subject').order_by('-created_at')[:5]
+    recent_progress = recent_progress_entries()
+    leaders_exam, leaders = latest_exam_leaders()
     
     context = {
         'total_students': total_students,
         'total_exams': total_exams,
         'total_subjects': total_subjects,
         'recent_progress': recent_progress,
+        'leaders_exam': leaders_exam,
+        'leaders': leaders,
     }
     return render(request, 'dashboard/dashboard.html', context)
 
 
 @login_required
+@conditional_page(student_validator)
 def student_list_view(request):
     """View to list all students with search and filter capabilities"""
     students = Student.objects.all().order_by('full_name')
@@ -190,10 +225,33 @@ def add_student_view(request):
     return render(request, 'dashboard/add_student.html', {'form': form})
 
 
+@login_required
+def import_students_view(request):
+    """View to enroll students in bulk from a roster CSV"""
+    report = None
+    if request.method == 'POST':
+        form = StudentImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            roster = io.TextIOWrapper(form.cleaned_data['roster'].file, encoding='utf-8-sig', newline='')
+            report = import_roster(
+                read_roster(roster),
+                invite=form.cleaned_data['send_invites'],
+                base_url=request.build_absolute_uri('/').rstrip('/'),
+            )
+            if report.aborted:
+                messages.error(request, f'Import stopped: {report.aborted}')
+            if report.created:
+                messages.success(request, f'Enrolled {report.created} students.')
+    else:
+        form = StudentImportForm()
+    
+    return render(request, 'dashboard/import_students.html', {'form': form, 'report': report})
+
+
 @login_required
 def edit_student_view(request, student_id):
     """View to edit student details"""
-    student = get_object_or_404(Student, id=student_id)
+    student = get_object_or_404(Student.objects, id=student_id)
     
     if request.method == 'POST':
         form = StudentProfileForm(request.POST, instance=student)
@@ -209,40 +267,60 @@ def edit_student_view(request, student_id):
 
 @login_required
 def delete_student_view(request, student_id):
-    """View to delete a student"""
-    student = get_object_or_404(Student, id=student_id)
+    """View to archive a student; their marks are purged later"""
+    student = get_object_or_404(Student.objects, id=student_id)
     
     if request.method == 'POST':
-        student.delete()
-        messages.success(request, 'Student deleted successfully!')
+        student.archive()
+        messages.success(request, 'Student archived successfully!')
         return redirect('student_list')
     
     return render(request, 'dashboard/delete_student.html', {'student': student})
 
 
-@login_required
-def progress_sheet_view(request):
-    """View to manage student progress sheets"""
-    # Get all progress sheets with related data
-    progress_sheets = ProgressSheet.objects.select_related('student', 'exam', 'subject').all()
+def progress_sheets_for(exam_type, sort_by, academic_year=''):
+    """
+    Progress sheets with related data and letter grades, filtered by exam
+    type and sorted; an academic year reads the archived marks of that
+    year instead of the current term's
+    """
+    if academic_year:
+        progress_sheets = progress_history(academic_year)
+    else:
+        progress_sheets = ProgressSheet.objects.select_related('student', 'exam', 'subject').all()
     
     # Filter by exam type if specified
-    exam_type = request.GET.get('exam_type', '')
     if exam_type:
         progress_sheets = progress_sheets.filter(exam__exam_type=exam_type)
     
+    progress_sheets = progress_sheets.annotate(grade=GradingScheme.from_settings().grade_expression())
+    
     # Sorting by exam type
-    sort_by = request.GET.get('sort_by', 'student__full_name')
     if sort_by in ['student__full_name', 'marks', 'exam__date']:
         progress_sheets = progress_sheets.order_by(sort_by)
+    return progress_sheets
+
+
+@login_required
+@conditional_page(progress_validator)
+def progress_sheet_view(request):
+    """View to manage student progress sheets"""
+    exam_type = request.GET.get('exam_type', '')
+    sort_by = request.GET.get('sort_by', 'student__full_name')
+    academic_year = request.GET.get('academic_year', '')
+    
+    # Get all progress sheets with related data
+    progress_sheets = progress_sheets_for(exam_type, sort_by, academic_year)
     
     # Get all exams for filter dropdown
-    exams = Exam.objects.all()
+    exams = reference.exams()
     
     context = {
         'progress_sheets': progress_sheets,
         'exams': exams,
+        'academic_years': archived_years(),
         'selected_exam_type': exam_type,
+        'selected_academic_year': academic_year,
         'sort_by': sort_by,
     }
     return render(request, 'dashboard/progress_sheet.html', context)
@@ -254,7 +332,9 @@ def add_progress_sheet_view(request):
     if request.method == 'POST':
         form = ProgressSheetForm(request.POST)
         if form.is_valid():
-            form.save()
+            data = form.cleaned_data
+            if not save_marks(request, data['student'].pk, data['exam'].pk, data['subject'].pk, data['marks']):
+                form.save()
             messages.success(request, 'Progress sheet entry added successfully!')
             return redirect('progress_sheet')
     else:
@@ -263,46 +343,169 @@ def add_progress_sheet_view(request):
     return render(request, 'dashboard/add_progress_sheet.html', {'form': form})
 
 
+TOP_CHOICES = (10, 50)
+
+# Larger ?top= values are clamped, so the LIMIT stays bounded.
+MAX_TOP = 1000
+
+
+def query_int(value):
+    """A query-string value as an int, or None unless it is ASCII digits"""
+    # str.isdigit() also accepts digits int() rejects, such as '²'.
+    return int(value) if value.isascii() and value.isdecimal() else None
+
+
+def ranking_filters(request):
+    """Ranking options from the query string; unknown values are ignored"""
+    partition = request.GET.get('partition', '')
+    subject = query_int(request.GET.get('subject', ''))
+    top = query_int(request.GET.get('top', ''))
+    score = request.GET.get('score', '')
+    return {
+        'exam_type': request.GET.get('exam_type', 'quarterly'),
+        'partition': partition if partition in PARTITIONS else '',
+        'class_batch': request.GET.get('class_batch', ''),
+        'subject': subject,
+        'top': min(top, MAX_TOP) if top else None,
+        'score': score if score in SCORES else 'avg_score',
+    }
+
+
+def ranking_rows(filters):
+    """
+    Ranked rows for the ranking page: one query for any partitioning, or
+    only the top students (plus ties) with ?top= and no partition
+    """
+    filters = dict(filters)
+    top = filters.pop('top')
+    if top and not filters['partition']:
+        return top_students(
+            filters['exam_type'], top, class_batch=filters['class_batch'], subject=filters['subject'], score=filters['score'],
+        )
+    return list(partitioned_ranking(**filters))
+
+
+def ranking_context(filters, rankings, exam_types, class_batches, subjects):
+    """Template context for the ranking page"""
+    by_subject = bool(filters['subject']) or 'subject' in filters['partition']
+    return {
+        'rankings': rankings,
+        'by_subject': by_subject,
+        'by_gpa': filters['score'] == 'gpa' and not by_subject,
+        'partitioned': bool(filters['partition']),
+        'selected_exam_type': filters['exam_type'],
+        'selected_partition': filters['partition'],
+        'selected_class_batch': filters['class_batch'],
+        'selected_subject': filters['subject'],
+        'selected_top': filters['top'],
+        'selected_score': filters['score'],
+        'top_choices': TOP_CHOICES,
+        'score_choices': SCORE_CHOICES,
+        'exam_types': exam_types,
+        'partition_choices': PARTITION_CHOICES,
+        'class_batches': class_batches,
+        'subjects': subjects,
+    }
+
+
+def exam_type_choices():
+    """Distinct exam types, for filter dropdowns"""
+    return reference.exam_types()
+
+
+def class_batch_choices():
+    """Distinct classes/batches, for filter dropdowns"""
+    return list(Student.objects.order_by('class_batch').values_list('class_batch', flat=True).distinct())
+
+
+def subject_choices():
+    """Subjects by name, for filter dropdowns"""
+    return reference.subjects()
+
+
 @login_required
+@conditional_page(ranking_validator)
 def ranking_view(request):
-    """View to display student rankings based on exam performance"""
-    exam_type = request.GET.get('exam_type', 'quarterly')
-    
-    # Get all students who have progress sheets for the selected exam type
-    students_with_scores = []
-    
-    # Get all unique students who have scores for the selected exam type
-    students = Student.objects.filter(progresssheet__exam__exam_type=exam_type).distinct()
-    
-    for student in students:
-        # Calculate average score for the selected exam type
-        scores = ProgressSheet.objects.filter(
-            student=student,
-            exam__exam_type=exam_type
-        ).values_list('marks', flat=True)
-        
-        if scores:
-            avg_score = sum(scores) / len(scores)
-            total_marks = sum(scores)
-            students_with_scores.append({
-                'student': student,
-                'avg_score': avg_score,
-                'total_marks': total_marks,
-                'num_subjects': len(scores)
-            })
-    
-    # Sort by average score (descending)
-    students_with_scores.sort(key=lambda x: x['avg_score'], reverse=True)
-    
-    # Get all exam types for filter
-    exam_types = Exam.objects.values_list('exam_type', flat=True).distinct()
+    """View to display student rankings, overall or within class/batch and subject"""
+    filters = ranking_filters(request)
+    context = ranking_context(
+        filters,
+        ranking_rows(filters),
+        exam_type_choices(),
+        class_batch_choices(),
+        subject_choices(),
+    )
+    return render(request, 'dashboard/ranking.html', context)
+
+
+@login_required
+def analytics_view(request):
+    """View to display mark statistics for one exam"""
+    exams = reference.exams()
+    exam_type = request.GET.get('exam_type', exams[0].exam_type if exams else '')
+    exam = next((exam for exam in exams if exam.exam_type == exam_type), None)
+    
+    statistics = statistics_for(exam) if exam else None
     
     context = {
-        'students_with_scores': students_with_scores,
+        'exams': exams,
+        'exam': exam,
         'selected_exam_type': exam_type,
-        'exam_types': exam_types,
+        'statistics': statistics,
     }
-    return render(request, 'dashboard/ranking.html', context)
+    return render(request, 'dashboard/analytics.html', context)
+
+
+@login_required
+def completeness_view(request):
+    """View to display how many marks are still missing for each open exam"""
+    overview = completeness_overview()
+    exam_type = request.GET.get('exam_type', '')
+    class_batch = request.GET.get('class_batch', '')
+    exam = next((row['exam'] for row in overview if row['exam'].exam_type == exam_type), None)
+    class_batches = Student.objects.order_by('class_batch').values_list('class_batch', flat=True).distinct()
+    
+    context = {
+        'overview': overview,
+        'exam': exam,
+        'selected_exam_type': exam_type,
+        'class_batches': class_batches,
+        'selected_class_batch': class_batch,
+        # One exam and class/batch at a time: the full list can be long.
+        'missing': missing_cells(exam, class_batch) if exam and class_batch else None,
+    }
+    return render(request, 'dashboard/completeness.html', context)
+
+
+@login_required
+def student_detail_view(request, student_id):
+    """View to display a student's progress across the exam terms"""
+    student = get_object_or_404(Student.objects, id=student_id)
+    trends = get_trends()
+    
+    context = {
+        'student': student,
+        'exams': trends['exams'],
+        'trend': trends['students'].get(student.id),
+    }
+    return render(request, 'dashboard/student_detail.html', context)
+
+
+@login_required
+def trends_view(request):
+    """View to display the most improved and most declined students"""
+    class_batch = request.GET.get('class_batch', '') or None
+    trends = get_trends()
+    class_batches = sorted({trend['class_batch'] for trend in trends['students'].values()})
+    
+    context = {
+        'exams': trends['exams'],
+        'most_improved': leaderboard(trends, class_batch=class_batch),
+        'most_declined': leaderboard(trends, class_batch=class_batch, declined=True),
+        'class_batches': class_batches,
+        'selected_class_batch': class_batch or '',
+    }
+    return render(request, 'dashboard/trends.html', context)
 
 
 @login_required
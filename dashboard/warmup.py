@@ -0,0 +1,200 @@
+"""
+Cache warm-up.
+
+After a deploy or a bulk mark change, the first requests would each build
+the cached artifacts: the MarksMatrix and statistics of every open exam
+(behind rankings, the dashboard leaders, analytics and the API) and the
+trends. warm_caches() builds them ahead, one task per exam plus one for the
+trends, across a thread pool, and reports how long each took; the times
+are also recorded in the dashboard_cache_warmup_seconds metric.
+
+The cache is per process unless CACHES names a shared backend, so web
+processes warm their own on a WarmupScheduler thread, configured by:
+
+    DASHBOARD_WARMUP = {
+        'ON_START': True,   # warm when the process starts serving
+        'INTERVAL': None,   # and then every so many seconds
+        'DELAY': 2,         # seconds from a bulk mark change to the warm-up
+        'THREADS': 4,
+    }
+
+Bulk mark changes (signals.marks_bulk_changed) trigger the scheduler after
+they commit; the delay lets a burst of them share one warm-up.
+`manage.py warm_caches` warms once or periodically from its own process,
+which serves the others only with a shared cache backend.
+"""
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+
+from . import metrics, reference
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {'ON_START': True, 'INTERVAL': None, 'DELAY': 2, 'THREADS': 4}
+
+
+def config():
+    return {**DEFAULTS, **(getattr(settings, 'DASHBOARD_WARMUP', None) or {})}
+
+
+def _warm_exam(exam):
+    # Imported here: signals imports this module at every start.
+    from .matrix import marks_matrix, statistics_for
+
+    marks_matrix(exam)
+    statistics_for(exam)
+
+
+def _warm_trends():
+    from .trends import get_trends
+
+    get_trends()
+
+
+def warmup_tasks(exam_types=None):
+    """(artifact, callable) pairs; the trends only when warming every exam"""
+    exams = reference.exams()
+    if exam_types:
+        exams = [exam for exam in exams if exam.exam_type in exam_types]
+    tasks = [(f'exam:{exam.exam_type}', functools.partial(_warm_exam, exam)) for exam in exams]
+    if not exam_types:
+        tasks.append(('trends', _warm_trends))
+    return tasks
+
+
+def _timed(artifact, task, pooled):
+    start = time.perf_counter()
+    error = None
+    try:
+        task()
+    except Exception as e:
+        logger.exception('Warming %s failed', artifact)
+        error = str(e)
+    finally:
+        if pooled:
+            connections.close_all()
+    seconds = time.perf_counter() - start
+    metrics.WARMUP_SECONDS.observe(seconds, artifact=artifact.split(':')[0])
+    return {'artifact': artifact, 'seconds': seconds, 'error': error}
+
+
+def warm_caches(exam_types=None, threads=None):
+    """
+    Build the cached artifacts, in parallel unless threads is 1; returns
+    {'artifact', 'seconds', 'error'} for each
+    """
+    tasks = warmup_tasks(exam_types)
+    threads = threads or config()['THREADS']
+    if threads <= 1:
+        return [_timed(artifact, task, pooled=False) for artifact, task in tasks]
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='warmup') as pool:
+        return list(pool.map(lambda item: _timed(*item, pooled=True), tasks))
+
+
+class WarmupScheduler:
+    """
+    A daemon thread running warm_caches() when triggered, and every
+    interval seconds if set
+    """
+
+    def __init__(self, interval=None, delay=2, threads=4):
+        self.interval = interval
+        self.delay = delay
+        self.threads = threads
+        self.runs = 0
+        self.last = []
+        self._due = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self.thread = None
+
+    def start(self, warm_now=True):
+        if warm_now:
+            self._due = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name='cache-warmup', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def trigger(self, delay=None):
+        """Warm in delay seconds, unless a warm-up is due sooner already"""
+        due = time.monotonic() + (self.delay if delay is None else delay)
+        with self._lock:
+            if self._due is None or due < self._due:
+                self._due = due
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            with self._lock:
+                if self._due is None and self.interval:
+                    self._due = time.monotonic() + self.interval
+                due = self._due
+            if due is None or due > time.monotonic():
+                self._wake.wait(None if due is None else due - time.monotonic())
+                self._wake.clear()
+                continue
+            with self._lock:
+                self._due = None
+            started = time.perf_counter()
+            self.last = warm_caches(threads=self.threads)
+            self.runs += 1
+            logger.info('Warmed %d cached artifacts in %.2fs', len(self.last), time.perf_counter() - started)
+
+
+_scheduler = None
+
+
+def start_scheduler():
+    """
+    Start this process's scheduler as DASHBOARD_WARMUP configures it, once;
+    called where a process starts serving (serve workers, and through
+    start_with_requests() wsgi.py and asgi.py)
+    """
+    global _scheduler
+    options = getattr(settings, 'DASHBOARD_WARMUP', None)
+    if not options:
+        return None
+    if _scheduler is None or not _scheduler.thread.is_alive():
+        options = config()
+        _scheduler = WarmupScheduler(options['INTERVAL'], options['DELAY'], options['THREADS'])
+        _scheduler.start(warm_now=options['ON_START'])
+    return _scheduler
+
+
+def _start_on_request(**kwargs):
+    if _scheduler is None or not _scheduler.thread.is_alive():
+        start_scheduler()
+
+
+def start_with_requests():
+    """
+    Start the scheduler with the first request of each process. A server
+    preloading the application before forking (gunicorn --preload) imports
+    wsgi.py in its master, and a thread started there does not survive the
+    fork into the workers.
+    """
+    request_started.connect(_start_on_request, dispatch_uid='dashboard_warmup')
+
+
+def stop_scheduler():
+    """Stop this process's scheduler, if it runs one"""
+    if _scheduler is not None:
+        _scheduler.stop()
+
+
+def trigger():
+    """Schedule a warm-up in this process, if it runs a scheduler"""
+    if _scheduler is not None and _scheduler.thread.is_alive():
+        _scheduler.trigger()
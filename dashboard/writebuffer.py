@@ -0,0 +1,261 @@
+"""
+Write-behind buffer for mark entry.
+
+With DASHBOARD_WRITE_BUFFER_WINDOW set to a number of seconds, marks
+entered through the progress form are queued here instead of being saved
+one statement at a time. Writes to the same (student, exam, subject) cell
+within the window coalesce, last write wins, and each window is flushed
+as one transaction of multi-row upserts, followed by a single round of
+cache invalidation and live events. Pending writes are flushed on
+interpreter exit.
+
+When the upsert fails, the rows are written one at a time: rows the
+database rejects (a student deleted since, a missing mark) are logged and
+dropped, and rows failing for other reasons (a locked database) are kept
+for a retry a window later. Writes to exams archived or deleted meanwhile
+are dropped before the upsert.
+
+The buffer lives in one process. A session that has just written gets
+read-your-writes from WriteBufferMiddleware, which flushes the local
+buffer, or waits out the window when the write went to another worker.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .events import PROGRESS_TOPIC, broker
+from .models import Exam, ProgressSheet
+from .signals import marks_bulk_changed, progress_event
+
+logger = logging.getLogger(__name__)
+
+# Session key holding the process that buffered the session's last write
+# and the time.time() by which it is flushed.
+PENDING_WRITES = 'dashboard_pending_writes'
+
+# Rows per INSERT: 6 parameters each, below SQLite's historical 999 limit.
+UPSERT_ROWS = 150
+
+# Flush early rather than let a burst grow the buffer without bound.
+MAX_PENDING = 5000
+
+COLUMNS = ('student_id', 'exam_id', 'subject_id', 'marks', 'created_at', 'updated_at')
+
+
+def upsert_marks(pending, using=DEFAULT_DB_ALIAS):
+    """
+    Insert or update marks given as {(student_id, exam_id, subject_id):
+    marks} with multi-row upserts in one transaction; every row written
+    gets the same updated_at, which is returned
+    """
+    connection = connections[using]
+    now = timezone.now()
+    stamp = connection.ops.adapt_datetimefield_value(now)
+    quote = connection.ops.quote_name
+    table = quote(ProgressSheet._meta.db_table)
+    columns = ', '.join(quote(column) for column in COLUMNS)
+    if connection.vendor in ('sqlite', 'postgresql'):
+        conflict = (
+            f"ON CONFLICT ({quote('student_id')}, {quote('exam_id')}, {quote('subject_id')}) DO UPDATE SET "
+            f"{quote('marks')} = excluded.{quote('marks')}, {quote('updated_at')} = excluded.{quote('updated_at')}"
+        )
+    elif connection.vendor == 'mysql':
+        conflict = (
+            f"ON DUPLICATE KEY UPDATE {quote('marks')} = VALUES({quote('marks')}), "
+            f"{quote('updated_at')} = VALUES({quote('updated_at')})"
+        )
+    else:
+        conflict = None
+    items = list(pending.items())
+    with transaction.atomic(using=using):
+        if conflict is None:
+            for (student_id, exam_id, subject_id), marks in items:
+                ProgressSheet.all_objects.using(using).update_or_create(
+                    student_id=student_id, exam_id=exam_id, subject_id=subject_id, defaults={'marks': marks},
+                )
+            return now
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), UPSERT_ROWS):
+                chunk = items[start:start + UPSERT_ROWS]
+                values = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(chunk))
+                params = []
+                for (student_id, exam_id, subject_id), marks in chunk:
+                    params.extend((student_id, exam_id, subject_id, marks, stamp, stamp))
+                cursor.execute(f'INSERT INTO {table} ({columns}) VALUES {values} {conflict}', params)
+    return now
+
+
+class MarkWriteBuffer:
+    """
+    Pending mark writes keyed by (student_id, exam_id, subject_id), flushed
+    `window` seconds after the first write of a batch
+    """
+
+    def __init__(self, window, max_pending=MAX_PENDING, using=DEFAULT_DB_ALIAS):
+        self.window = window
+        self.max_pending = max_pending
+        self.using = using
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, student_id, exam_id, subject_id, marks):
+        """Queue a write; returns the time.time() by which it is flushed"""
+        with self._lock:
+            self._pending[(student_id, exam_id, subject_id)] = marks
+            full = len(self._pending) >= self.max_pending
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+        return time.time() + self.window
+
+    def _schedule(self):
+        # With self._lock held.
+        if self._timer is None:
+            self._timer = threading.Timer(self.window, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _requeue(self, pending):
+        with self._lock:
+            # Newer writes win.
+            self._pending = {**pending, **self._pending}
+            self._schedule()
+
+    def flush(self):
+        """Write everything pending, in one transaction if possible; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not pending:
+                return 0
+            try:
+                pending = self._open_exams_only(pending)
+                stamps = {upsert_marks(pending, self.using)} if pending else set()
+                written = pending
+            except DatabaseError:
+                logger.warning('Upserting %d buffered mark writes failed; writing them one at a time', len(pending))
+                written, stamps = self._write_each(pending)
+            except Exception:
+                self._requeue(pending)
+                raise
+        if written:
+            self._notify(written, stamps)
+        return len(written)
+
+    def _open_exams_only(self, pending):
+        exam_ids = {exam_id for student_id, exam_id, subject_id in pending}
+        open_ids = set(Exam.objects.using(self.using).filter(pk__in=exam_ids).values_list('pk', flat=True))
+        if open_ids == exam_ids:
+            return pending
+        dropped = [key for key in pending if key[1] not in open_ids]
+        logger.error('Dropping %d buffered mark writes to exams archived or deleted since: %s', len(dropped), dropped)
+        return {key: marks for key, marks in pending.items() if key[1] in open_ids}
+
+    def _write_each(self, pending):
+        """Upsert rows one by one; returns the written rows and their updated_at stamps"""
+        written, stamps, retry = {}, set(), {}
+        for key, marks in pending.items():
+            try:
+                stamps.add(upsert_marks({key: marks}, self.using))
+            except IntegrityError:
+                logger.exception('Dropping the buffered mark %r for (student, exam, subject) %s', marks, key)
+            except DatabaseError:
+                retry[key] = marks
+            else:
+                written[key] = marks
+        if retry:
+            logger.error('Writing %d buffered marks failed; retrying in %s seconds', len(retry), self.window)
+            self._requeue(retry)
+        return written, stamps
+
+    def _notify(self, written, stamps):
+        # What the post_save receivers would have done, once per flush.
+        exam_ids = {exam_id for student_id, exam_id, subject_id in written}
+        marks_bulk_changed(exam_ids, {(exam_id, student_id) for student_id, exam_id, subject_id in written})
+        if broker.has_subscribers(PROGRESS_TOPIC):
+            rows = ProgressSheet.objects.using(self.using).select_related('student', 'exam', 'subject').filter(
+                exam_id__in=exam_ids, updated_at__in=stamps,
+            )
+            for progress in rows:
+                broker.publish(PROGRESS_TOPIC, 'progress', progress_event(progress))
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing %d buffered mark writes failed; retrying in %s seconds', len(self), self.window)
+        finally:
+            # The timer thread's own connection.
+            connections[self.using].close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process's MarkWriteBuffer, or None when buffering is off"""
+    global _buffer
+    window = getattr(settings, 'DASHBOARD_WRITE_BUFFER_WINDOW', 0)
+    if not window:
+        return None
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = MarkWriteBuffer(window)
+            atexit.register(_buffer.flush)
+        _buffer.window = window
+        return _buffer
+
+
+def flush_buffer():
+    """Write what this process's buffer holds, if it has one"""
+    if _buffer is not None:
+        _buffer.flush()
+
+
+def save_marks(request, student_id, exam_id, subject_id, marks):
+    """
+    Queue a mark write through the buffer, remembering in the session when
+    it will be visible; returns False when buffering is off
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        return False
+    request.session[PENDING_WRITES] = [os.getpid(), buffer.add(student_id, exam_id, subject_id, marks)]
+    return True
+
+
+def await_own_writes(request):
+    """Make the session's buffered writes visible before a read"""
+    pending = request.session.pop(PENDING_WRITES, None)
+    if pending is None:
+        return
+    pid, flushed_by = pending
+    buffer = get_buffer()
+    if pid == os.getpid() and buffer is not None:
+        # Also waits for a background flush that is still committing. A
+        # failing flush is retried later; the read goes ahead.
+        try:
+            buffer.flush()
+        except Exception:
+            logger.exception('Flushing buffered mark writes before a read failed')
+    else:
+        # Buffered by another worker process, which flushes by then.
+        remaining = flushed_by - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_progress.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from dashboard.sse import PREFIX as SSE_PREFIX, sse_application  # noqa: E402
+from dashboard.warmup import start_with_requests  # noqa: E402
+
+start_with_requests()
+
+
+async def application(scope, receive, send):
+    # Server-sent events are served outside Django's request cycle so a
+    # connection can stay open without holding a worker thread.
+    if scope['type'] == 'http' and scope['path'].startswith(SSE_PREFIX):
+        await sse_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
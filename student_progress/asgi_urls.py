@@ -0,0 +1,16 @@
+"""student_progress URL Configuration for the ASGI application
+
+Same routes as urls.py, with the read-heavy dashboard views replaced by
+their async variants. Selected per request by ASGIURLConfMiddleware.
+"""
+from django.urls import path
+
+from dashboard import async_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('dashboard/', async_views.dashboard_view, name='dashboard'),
+    path('progress/', async_views.progress_sheet_view, name='progress_sheet'),
+    path('ranking/', async_views.ranking_view, name='ranking'),
+] + sync_urlpatterns
@@ -38,10 +38,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'dashboard',
+    'dashboard.apps.DashboardConfig',
 ]
 
 MIDDLEWARE = [
+    'dashboard.perf.tracing.TracingMiddleware',
+    'dashboard.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,10 +51,90 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'dashboard.middleware.ASGIURLConfMiddleware',
+    'dashboard.middleware.WriteBufferMiddleware',
+    'dashboard.perf.nplusone.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'student_progress.urls'
 
+# Used instead of ROOT_URLCONF for requests served by asgi.py
+ASYNC_ROOT_URLCONF = 'student_progress.asgi_urls'
+
+# Run a page's independent queries on parallel threads in the async views
+DASHBOARD_CONCURRENT_QUERIES = True
+
+# Month (1-12) in which the academic year starts. Exams are grouped into
+# academic years (2026, or 2026-27 for a year starting after January) and
+# archived a year at a time.
+DASHBOARD_ACADEMIC_YEAR_START_MONTH = 1
+
+# Seconds to buffer marks entered through the progress form, coalescing
+# writes into one bulk upsert per window; 0 saves each entry immediately
+DASHBOARD_WRITE_BUFFER_WINDOW = 0
+
+# With DEBUG on, log requests that run one query shape more than this many
+# times (an N+1 loop), with the stack frames that issued it; raise instead
+# with DASHBOARD_NPLUSONE_RAISE. None turns the check off.
+DASHBOARD_NPLUSONE_THRESHOLD = 2
+DASHBOARD_NPLUSONE_RAISE = False
+
+# Directory shared by the worker processes for their metrics snapshots, so
+# /metrics reports every worker; None keeps metrics per process. With
+# DASHBOARD_METRICS_TOKEN set, scrapes must send "Authorization: Bearer
+# <token>".
+DASHBOARD_METRICS_DIR = os.environ.get('DASHBOARD_METRICS_DIR') or None
+DASHBOARD_METRICS_TOKEN = os.environ.get('DASHBOARD_METRICS_TOKEN') or None
+
+# Request tracing (see dashboard/perf/tracing.py): the share of requests
+# traced, and a duration in ms from which every request is. Off unless one
+# is set.
+DASHBOARD_TRACING = {
+    'SAMPLE_RATE': float(os.environ.get('DASHBOARD_TRACE_SAMPLE_RATE', 0)),
+    'SLOW_REQUEST_MS': None,
+    'FORMAT': 'jsonl',
+    'PATH': BASE_DIR / 'traces.jsonl',
+}
+
+# Cache warm-up in each web process (see dashboard/warmup.py): on start,
+# every INTERVAL seconds (None: never) and DELAY seconds after a bulk mark
+# change, on THREADS threads. None turns it off.
+DASHBOARD_WARMUP = {
+    'ON_START': True,
+    'INTERVAL': None,
+    'DELAY': 2,
+    'THREADS': 4,
+}
+
+# Open exams, subjects and archived years are held in each process for up
+# to TTL seconds before it checks their version in the cache, and reloaded
+# after MAX_AGE seconds whatever the version (see dashboard/reference.py);
+# SIZE caps the entries. Other processes only see the version through a
+# shared cache backend (CACHES below).
+DASHBOARD_REFERENCE_CACHE = {
+    'TTL': 5,
+    'MAX_AGE': 60,
+    'SIZE': 32,
+}
+
+# Letter grades and GPAs (see dashboard/grading.py). Bands are (lowest
+# mark, grade, grade points); SUBJECT_BANDS replaces them for a subject
+# and WEIGHTS gives subjects other than 1 credit. Run
+# `manage.py refresh_grades` after changing them.
+DASHBOARD_GRADING = {
+    'BANDS': [
+        (90, 'A+', 10),
+        (80, 'A', 9),
+        (70, 'B+', 8),
+        (60, 'B', 7),
+        (50, 'C', 6),
+        (40, 'D', 5),
+        (0, 'F', 0),
+    ],
+    'SUBJECT_BANDS': {},
+    'WEIGHTS': {},
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -86,9 +168,30 @@ DEFAULT_FROM_EMAIL = 'noreply@studentprogress.com'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.environ.get('STUDENT_PROGRESS_DB', os.path.join(BASE_DIR, 'db.sqlite3')),
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+#
+# Cached marks matrices, statistics, trends and reference data are keyed by
+# data version counters kept in this cache (see dashboard/versioning.py), so
+# every process serving the site must share it: the file-based cache covers
+# the workers of one host (`manage.py serve`, gunicorn); use memcached or
+# redis with several hosts. With a per-process backend (locmem), entries
+# only live DASHBOARD_LOCAL_CACHE_TIMEOUT seconds, as other processes'
+# changes are not seen.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DASHBOARD_CACHE_DIR', os.path.join(BASE_DIR, '.cache')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
     }
 }
+DASHBOARD_LOCAL_CACHE_TIMEOUT = 10
 
 
 # Password validation
@@ -0,0 +1,31 @@
+"""
+Settings for management commands and background workers.
+
+The same as settings.py without what only the web pages use: the admin,
+messages and staticfiles apps and the request middleware. Cron jobs and
+workers start faster with them, and faster still skipping the system
+checks, which import every view through the URLconf:
+
+    DJANGO_SETTINGS_MODULE=student_progress.settings_cli python manage.py refresh_grades --skip-checks
+
+Run the web server, migrate and profile_views with student_progress.settings.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, TEMPLATES
+
+WEB_ONLY_APPS = ('django.contrib.admin', 'django.contrib.messages', 'django.contrib.staticfiles')
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in WEB_ONLY_APPS]
+
+MIDDLEWARE = []
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if not processor.startswith('django.contrib.messages.')
+        ],
+    },
+}]
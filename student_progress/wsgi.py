@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'student_progress.settings')
 
 application = get_wsgi_application()
+
+from dashboard.warmup import start_with_requests  # noqa: E402
+
+start_with_requests()